@@ -0,0 +1,414 @@
+"""HTTP API for the extraction pipeline, alongside the Streamlit UI.
+
+    python api.py --port 8000
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Endpoints (uploads are multipart/form-data):
+    GET  /health       Pool and queue status
+    GET  /metrics      Prometheus metrics (set METRICS_ENABLED=1)
+    POST /v1/image     One image in field "file" -> JSON {"text": ...}
+    POST /v1/images    Many images in field "files" -> NDJSON, one line per
+                       image as soon as it is done (completion order)
+    POST /v1/pdf       A PDF in field "file" -> NDJSON, one line per page
+                       in page order
+    POST /v1/speech    Audio or video in field "file" -> NDJSON, one line
+                       per recognized chunk
+    GET  /v1/search    ?q=words "phrases"&limit=20 -> JSON {"hits": [...]},
+                       pages from earlier uploads (set SEARCH_INDEX_PATH)
+
+Optional form fields: lang (OCR language, default eng), preprocess and
+regions (1 to enable), language and engine for /v1/speech.
+
+Uploads are parsed as they stream in and spooled to temporary files, so a
+large batch is not held in memory. All requests share one worker pool. A
+request that would take the number of queued plus running items past
+API_MAX_QUEUE gets 503 with Retry-After. With SEARCH_INDEX_PATH set,
+every extracted image and PDF is added to the search index.
+"""
+import argparse
+import asyncio
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from metrics import metrics
+from uploads import SpooledUpload
+
+API_WORKERS = int(os.environ.get('API_WORKERS', os.cpu_count() or 2))
+API_MAX_QUEUE = int(os.environ.get('API_MAX_QUEUE', 64))
+API_MAX_FILES = int(os.environ.get('API_MAX_FILES', 100))
+API_MAX_REQUEST_BYTES = int(os.environ.get('API_MAX_REQUEST_BYTES', 512 * 1024 * 1024))
+# Checked here so search_index (and NumPy) is only imported when it is used
+SEARCH_INDEX_PATH = os.environ.get('SEARCH_INDEX_PATH') or None
+
+NDJSON = 'application/x-ndjson'
+MEDIA_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.mp3', '.m4a', '.ogg', '.webm'}
+
+
+class WorkerPool:
+    """Thread pool shared by all requests, with a bound on queued plus running items.
+
+    Args:
+        max_workers: Items processed at the same time
+        max_queue: Items admitted (queued or running) before reserve() refuses
+    """
+
+    def __init__(self, max_workers=API_WORKERS, max_queue=API_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, count=1):
+        """Admit count items, or return False if the queue is full."""
+        with self._lock:
+            if self._pending + count > self.max_queue:
+                return False
+            self._pending += count
+            return True
+
+    def release(self, count=1):
+        with self._lock:
+            self._pending -= count
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn in the pool. The caller reserves and releases its slot."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def iterate(self, iterator):
+        """Drive a blocking iterator from the pool, one item per call."""
+        loop = asyncio.get_running_loop()
+        done = object()
+        while True:
+            item = await loop.run_in_executor(self._executor, next, iterator, done)
+            if item is done:
+                break
+            yield item
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.max_workers, 'pending': self._pending, 'max_queue': self.max_queue}
+
+
+pool = WorkerPool()
+
+
+def _ocr_upload(upload, lang, preprocess, regions):
+    """OCR one uploaded image. Runs in a pool thread."""
+    from ocr_backend import extract_text_from_image
+
+    start = time.perf_counter()
+    upload.file.seek(0)
+    data = upload.file.read()
+    text = extract_text_from_image(data, lang=lang, preprocess=preprocess, regions=regions)
+    if SEARCH_INDEX_PATH:
+        from search_index import index_document
+
+        index_document(hashlib.sha256(data).hexdigest(), upload.filename or "image", [text or ""])
+    return {'text': text or "", 'seconds': round(time.perf_counter() - start, 3)}
+
+
+def _pdf_pages(upload, lang):
+    """Start extracting an uploaded PDF. Runs in a pool thread."""
+    from ocr_backend import iter_pdf_pages
+
+    # Scanned pages are OCR'd one at a time in this thread, so the request uses only its one reserved slot
+    return iter_pdf_pages(upload.file, lang=lang, max_workers=1)
+
+
+def _index_pdf(upload, pages):
+    """Add an extracted PDF upload to the search index. Runs in a pool thread."""
+    from search_index import index_document
+
+    digest = hashlib.sha256()
+    upload.file.seek(0)
+    for chunk in iter(lambda: upload.file.read(1024 * 1024), b''):
+        digest.update(chunk)
+    index_document(digest.hexdigest(), upload.filename or "document.pdf", pages)
+
+
+def _transcribe_upload(upload, language, engine):
+    """Transcribe an uploaded audio or video file, yielding (index, text)."""
+    from speech import transcribe_file, transcribe_media
+
+    suffix = os.path.splitext(upload.filename or '')[1].lower()
+    # The decoders need a path with the right extension; the copy is removed on close
+    with SpooledUpload(upload.file, suffix=suffix) as spooled:
+        transcribe = transcribe_media if suffix in MEDIA_EXTENSIONS else transcribe_file
+        yield from transcribe(spooled.path, language=language, recognizer=engine)
+
+
+def _close(iterator):
+    try:
+        iterator.close()
+    except ValueError:
+        # Still running a step in the pool (client went away); it is closed when collected
+        pass
+
+
+def _error(e):
+    return {'error': f"{type(e).__name__}: {e}"}
+
+
+def _line(record):
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def _flag(form, name):
+    return form.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+class _TooLarge(Exception):
+    pass
+
+
+async def _read_form(request):
+    """Parse a multipart request, streaming file parts to spooled temp files.
+
+    Returns:
+        (form, None) or (None, error response)
+    """
+    too_large = JSONResponse({'error': f"Request larger than {API_MAX_REQUEST_BYTES} bytes"}, status_code=413)
+    length = request.headers.get('content-length')
+    if length is not None:
+        try:
+            length = int(length)
+        except ValueError:
+            return None, JSONResponse({'error': "Invalid Content-Length header"}, status_code=400)
+        if length > API_MAX_REQUEST_BYTES:
+            return None, too_large
+    received = 0
+
+    async def receive():
+        # Counted as the body arrives: a chunked request has no Content-Length to check
+        nonlocal received
+        message = await request.receive()
+        received += len(message.get('body', b''))
+        if received > API_MAX_REQUEST_BYTES:
+            raise _TooLarge()
+        return message
+
+    try:
+        form = await Request(request.scope, receive).form(max_files=API_MAX_FILES, max_fields=32)
+    except _TooLarge:
+        return None, too_large
+    except Exception as e:
+        return None, JSONResponse(_error(e), status_code=400)
+    return form, None
+
+
+def _queue_full():
+    return JSONResponse({'error': "Server busy, try again shortly", **pool.stats()},
+                        status_code=503, headers={'Retry-After': '5'})
+
+
+async def health(request):
+    return JSONResponse({'status': 'ok', **pool.stats()})
+
+
+async def prometheus_metrics(request):
+    # Empty unless METRICS_ENABLED is set
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+
+async def ocr_image(request):
+    form, failure = await _read_form(request)
+    if failure:
+        return failure
+    try:
+        upload = form.get('file')
+        if upload is None or isinstance(upload, str):
+            return JSONResponse({'error': "Missing file field 'file'"}, status_code=400)
+        if not pool.reserve():
+            return _queue_full()
+        try:
+            result = await pool.run(_ocr_upload, upload, form.get('lang', 'eng'),
+                                    _flag(form, 'preprocess') or None, _flag(form, 'regions'))
+        except Exception as e:
+            return JSONResponse(_error(e), status_code=422)
+        finally:
+            pool.release()
+        return JSONResponse({'file': upload.filename, **result})
+    finally:
+        await form.close()
+
+
+async def ocr_images(request):
+    form, failure = await _read_form(request)
+    if failure:
+        return failure
+    uploads = [upload for upload in form.getlist('files') if not isinstance(upload, str)]
+    if not uploads:
+        await form.close()
+        return JSONResponse({'error': "Missing file field 'files'"}, status_code=400)
+    if not pool.reserve(len(uploads)):
+        await form.close()
+        return _queue_full()
+
+    lang = form.get('lang', 'eng')
+    preprocess = _flag(form, 'preprocess') or None
+    regions = _flag(form, 'regions')
+
+    # Slots still held; tasks cancelled before they start never reach their finally
+    unreleased = set(range(len(uploads)))
+
+    async def one(index, upload):
+        try:
+            result = await pool.run(_ocr_upload, upload, lang, preprocess, regions)
+        except Exception as e:
+            result = _error(e)
+        finally:
+            unreleased.discard(index)
+            pool.release()
+        return {'index': index, 'file': upload.filename, **result}
+
+    async def results():
+        # Every image is queued on the shared pool at once; lines go out as they finish
+        tasks = [asyncio.ensure_future(one(index, upload)) for index, upload in enumerate(uploads)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield _line(await task)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            pool.release(len(unreleased))
+            await form.close()
+
+    return StreamingResponse(results(), media_type=NDJSON)
+
+
+async def ocr_pdf(request):
+    form, failure = await _read_form(request)
+    if failure:
+        return failure
+    upload = form.get('file')
+    if upload is None or isinstance(upload, str):
+        await form.close()
+        return JSONResponse({'error': "Missing file field 'file'"}, status_code=400)
+    if not pool.reserve():
+        await form.close()
+        return _queue_full()
+
+    async def results():
+        texts = []
+        pages = None
+        try:
+            # The first call imports ocr_backend, so keep it off the event loop
+            pages = await pool.run(_pdf_pages, upload, form.get('lang', 'eng'))
+            async for page_num, text in pool.iterate(pages):
+                texts.append(text)
+                yield _line({'page': page_num, 'text': text})
+            if SEARCH_INDEX_PATH:
+                await pool.run(_index_pdf, upload, texts)
+        except Exception as e:
+            yield _line(_error(e))
+        finally:
+            if pages is not None:
+                _close(pages)
+            pool.release()
+            await form.close()
+
+    return StreamingResponse(results(), media_type=NDJSON)
+
+
+async def speech_to_text(request):
+    form, failure = await _read_form(request)
+    if failure:
+        return failure
+    upload = form.get('file')
+    if upload is None or isinstance(upload, str):
+        await form.close()
+        return JSONResponse({'error': "Missing file field 'file'"}, status_code=400)
+    if not pool.reserve():
+        await form.close()
+        return _queue_full()
+
+    async def results():
+        chunks = _transcribe_upload(upload, form.get('language', 'en-US'), form.get('engine', 'google'))
+        try:
+            async for index, text in pool.iterate(chunks):
+                yield _line({'chunk': index, 'text': text})
+        except Exception as e:
+            yield _line(_error(e))
+        finally:
+            _close(chunks)
+            pool.release()
+            await form.close()
+
+    return StreamingResponse(results(), media_type=NDJSON)
+
+
+async def search(request):
+    if not SEARCH_INDEX_PATH:
+        return JSONResponse({'error': "Search is not enabled; set SEARCH_INDEX_PATH"}, status_code=404)
+    query = request.query_params.get('q', '')
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 20)), 1000))
+    except ValueError:
+        return JSONResponse({'error': "limit must be a number"}, status_code=400)
+    if not pool.reserve():
+        return _queue_full()
+    start = time.perf_counter()
+    try:
+        hits = await pool.run(_search, query, limit)
+    finally:
+        pool.release()
+    return JSONResponse({'query': query, 'hits': hits, 'seconds': round(time.perf_counter() - start, 4)})
+
+
+def _search(query, limit):
+    from search_index import shared_index
+
+    return shared_index().search(query, limit=limit)
+
+
+def _prefetch_models():
+    from ocr_backend import prefetch_models
+
+    prefetch_models()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # TESSDATA_PREFETCH models install and warm up while the server already takes requests
+    if os.environ.get('TESSDATA_PREFETCH'):
+        threading.Thread(target=_prefetch_models, name="tessdata-prefetch", daemon=True).start()
+    yield
+
+
+app = Starlette(lifespan=lifespan, routes=[
+    Route('/health', health),
+    Route('/metrics', prometheus_metrics),
+    Route('/v1/image', ocr_image, methods=['POST']),
+    Route('/v1/images', ocr_images, methods=['POST']),
+    Route('/v1/pdf', ocr_pdf, methods=['POST']),
+    Route('/v1/speech', speech_to_text, methods=['POST']),
+    Route('/v1/search', search),
+])
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="HTTP API for image, PDF and speech text extraction.")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8000, help="Port to listen on (default: 8000)")
+    args = parser.parse_args(argv)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
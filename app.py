@@ -1,16 +1,17 @@
 import streamlit as st
-import numpy as np
-import cv2
-from PIL import Image
-from ocr_backend import extract_text, extract_text_from_pdf  # Importing OCR functions from backend
-from deep_translator import GoogleTranslator
-import speech_recognition as sr
-import tempfile
+from translation import translate_text  # Light: the translator client loads on first use
+from jobs import (CANCELLED, DONE, ERROR, QUEUED, RUNNING, batch_jsonl, batch_zip, format_batch, format_pages,
+                  install_languages_job, job_queue, live_ocr_job, live_queue, ocr_batch_job, ocr_image_job,
+                  pdf_job, transcribe_job, translate_job)
 import os
-from moviepy.editor import VideoFileClip
 import re
-import requests
-from pathlib import Path
+import sys
+import threading
+
+# Heavy dependencies (OpenCV, Tesseract, PyPDF2, speech_recognition, requests)
+# are imported inside the code path that needs them, so the first render
+# doesn't pay for features the user hasn't touched.
+# Profile with: python benchmarks/importtime.py
 
 # Page configuration
 st.set_page_config(
@@ -266,6 +267,281 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Job IDs kept in the page URL, so a browser refresh can find them again
+MAX_TRACKED_JOBS = 8
+
+# Choices for how many PDF pages are rendered at once
+PDF_PAGES_PER_VIEW = [1, 5, 10, 25]
+
+
+@st.cache_resource(show_spinner=False)
+def start_model_prefetch():
+    """Install and warm up the TESSDATA_PREFETCH models once per server process, off the render path."""
+    def prefetch():
+        from ocr_backend import prefetch_models
+
+        prefetch_models()
+
+    thread = threading.Thread(target=prefetch, name="tessdata-prefetch", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_job(fn, *args, label, key, replace=False, **kwargs):
+    """Submit work to the shared job queue and remember its ID in the URL.
+
+    A job already queued, running or finished for the same key is reused,
+    so reruns re-attach to it instead of starting the work again.
+    """
+    job_id = job_queue.submit(fn, *args, label=label, key=key, replace=replace, **kwargs)
+    job_ids = st.query_params.get_all("job")
+    if job_id not in job_ids:
+        st.query_params["job"] = job_ids[-(MAX_TRACKED_JOBS - 1):] + [job_id]
+    return job_id
+
+
+def job_result(job_id, preview=None):
+    """Return a finished job's result, or show its progress and return None.
+
+    A failed job re-raises its error, so callers handle it as if the work
+    had run inline.
+
+    Args:
+        job_id: ID from start_job
+        preview: Separator for showing partial results while running (default: hidden)
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return None
+    if job.status == DONE:
+        return job.result
+    if job.status == ERROR:
+        raise job.error
+    if job.status == CANCELLED:
+        st.warning(f"⏹️ {job.label} was cancelled.")
+        return None
+    show_job_progress(job_id, preview)
+    return None
+
+
+@st.fragment(run_every=1.0)
+def show_job_progress(job_id, preview=None):
+    """Poll a running job once a second; rerun the whole page when it finishes."""
+    job = job_queue.get(job_id)
+    if job is None or not job.active:
+        st.rerun()
+    if job.status == QUEUED:
+        st.info(f"⏳ {job.label}: waiting for a free worker...")
+    else:
+        progress = job.progress
+        counter = f"{job.done}/{job.total}" if job.total else f"{job.done} done"
+        st.progress(progress or 0.0, text=f"🔍 {job.label}: {counter} · {job.elapsed:.0f}s")
+    if preview is not None:
+        partial = job.partial_results()
+        if partial:
+            st.info("📝 " + preview.join(partial))
+    if st.button("⏹️ Cancel", key=f"cancel_job_{job_id}"):
+        job.cancel()
+        st.rerun()
+
+
+def _running_job_controls(job, unit):
+    """Progress bar and cancel button for a job that reports one partial result per unit."""
+    ready = job.partial_count
+    counter = f"{ready}/{job.total} {unit}" if job.total else f"{ready} {unit}"
+    st.progress(job.progress or 0.0, text=f"🔍 {job.label}: {counter} · {job.elapsed:.0f}s")
+    if st.button("⏹️ Cancel", key=f"cancel_job_{job.id}"):
+        job.cancel()
+        st.rerun()
+
+
+def show_batch_results(job_id):
+    """Show a batch OCR job's files as they finish, polling while it runs."""
+    job = job_queue.get(job_id)
+    if job is not None:
+        st.fragment(_batch_results_view, run_every=1.0 if job.active else None)(job_id, job.active)
+
+
+def _batch_results_view(job_id, polling):
+    job = job_queue.get(job_id)
+    if job is None or (polling and not job.active):
+        # Finished or failed: rerun the page once, which also stops the polling
+        st.rerun()
+    records = job.partial_results()
+    errors = sum(1 for record in records if record.get('error'))
+    if job.active:
+        _running_job_controls(job, "files")
+    elif job.status == CANCELLED:
+        st.warning(f"⏹️ {job.label} was cancelled after {len(records)} files.")
+    else:
+        st.success(f"✅ Batch completed! {len(records)} files, {errors} errors in {job.elapsed:.1f}s")
+    if not records:
+        return
+
+    # One small row per file, newest first; texts are sent only for the file picked below
+    st.dataframe(
+        [{"File": record['source'], "Characters": record['chars'],
+          "Seconds": round(record['timings'].get('extract', 0.0), 2),
+          "Status": "❌ " + record['error'] if record.get('error') else "✅"}
+         for record in reversed(records)],
+        hide_index=True, use_container_width=True,
+    )
+    done = sorted((record for record in records if not record.get('error')), key=lambda r: r['index'])
+    if done:
+        picked = st.selectbox("Show text for", range(len(done)), format_func=lambda i: done[i]['source'],
+                              key=f"batch_pick_{job_id}")
+        pages = done[picked]['pages']
+        text = format_pages(pages) if done[picked]['kind'] == 'pdf' else "".join(pages)
+        st.text_area("Text Output", text, height=300, label_visibility="collapsed")
+
+    # Downloads are built only when clicked
+    st.markdown("---")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("📥 Combined .txt", data=lambda: format_batch(job.partial_results()),
+                           file_name="batch_ocr.txt", mime="text/plain", use_container_width=True)
+    with col2:
+        st.download_button("📦 Per-file .zip", data=lambda: batch_zip(job.partial_results()),
+                           file_name="batch_ocr.zip", mime="application/zip", use_container_width=True)
+    with col3:
+        st.download_button("🧾 JSONL", data=lambda: batch_jsonl(job.partial_results()),
+                           file_name="batch_ocr.jsonl", mime="application/x-ndjson", use_container_width=True)
+
+
+def show_live_text(job_id):
+    """Show the latest text from a live OCR job, polling while the camera runs."""
+    job = live_queue.get(job_id)
+    if job is not None:
+        st.fragment(_live_text_view, run_every=1.0 if job.active else None)(job_id, job.active)
+
+
+def _live_text_view(job_id, polling):
+    job = live_queue.get(job_id)
+    if job is None or (polling and not job.active):
+        st.rerun()
+    results = job.partial_results()
+    if job.active:
+        st.info(f"🔴 {job.label}: {len(results)} texts read · {job.elapsed:.0f}s")
+        if st.button("⏹️ Stop", key=f"cancel_job_{job.id}"):
+            job.cancel()
+            st.rerun()
+    elif job.status == ERROR:
+        st.error(f"❌ Live OCR stopped: {job.error}")
+    else:
+        st.success(f"✅ Live OCR stopped after {job.elapsed:.0f}s; {len(results)} texts read")
+    if not results:
+        return
+
+    latest = results[-1]
+    st.caption(f"🕘 Frame {latest['frame']} · {latest['seconds']:.1f}s")
+    st.text_area("Text Output", latest['text'], height=300, label_visibility="collapsed")
+    if len(results) > 1:
+        with st.expander(f"📜 Earlier texts ({len(results) - 1})"):
+            for result in reversed(results[:-1]):
+                st.markdown(f"**{result['seconds']:.1f}s**")
+                st.text(result['text'])
+    st.download_button(
+        "📥 Download all texts",
+        data=lambda: "\n\n".join(f"--- {r['seconds']:.1f}s ---\n{r['text']}" for r in job.partial_results()),
+        file_name="live_ocr.txt", mime="text/plain", use_container_width=True,
+    )
+
+
+def show_pdf_pages(job_id):
+    """Show a PDF job's pages while they are extracted, a few pages at a time.
+
+    Only the pages in view are sent to the browser, and paging reruns just
+    this fragment. The first page shows as soon as it is extracted, however
+    long the document is. The view polls once a second while the job runs.
+    """
+    job = job_queue.get(job_id)
+    if job is not None:
+        st.fragment(_pdf_pages_view, run_every=1.0 if job.active else None)(job_id, job.active)
+
+
+def _pdf_pages_view(job_id, polling):
+    job = job_queue.get(job_id)
+    if job is None or (polling and not job.active):
+        # Finished or failed: rerun the page once, which also stops the polling
+        st.rerun()
+    ready = job.partial_count
+    if job.active:
+        _running_job_controls(job, "pages")
+    elif job.status == CANCELLED:
+        st.warning(f"⏹️ {job.label} was cancelled after {ready} pages.")
+    else:
+        st.success(f"✅ Text extraction completed! ({ready} pages)")
+    if not ready:
+        return
+
+    col_size, col_page = st.columns([1, 2])
+    with col_size:
+        per_view = st.selectbox("Pages per view", PDF_PAGES_PER_VIEW, key=f"pdf_per_view_{job_id}")
+    with col_page:
+        first = st.number_input(f"First page ({ready} of {job.total or ready} ready)", min_value=1, max_value=ready,
+                                value=1, step=per_view, key=f"pdf_page_{job_id}")
+    last = min(first + per_view - 1, ready)
+    page_text = format_pages(job.partial_results(first - 1, last), first_page=first)
+
+    # Check if text contains code
+    code_indicators = ['def ', 'class ', 'import ', 'function ', 'var ', 'const ', 'let ', '<?php', '#!/', '{', '}', '()', '=>', 'public ', 'private ', 'return']
+    contains_code = any(indicator in page_text for indicator in code_indicators)
+
+    # Display options
+    display_option = st.radio(
+        "Display as:",
+        ["📝 Plain Text", "💻 Code Format"] if contains_code else ["📝 Plain Text"],
+        horizontal=True,
+        key="pdf_display_option"
+    )
+
+    pages_label = f"Page {first}" if first == last else f"Pages {first}–{last}"
+    if display_option == "💻 Code Format":
+        st.markdown(f"### 💻 Extracted Code ({pages_label})")
+        st.code(page_text, language=None, line_numbers=True)
+    else:
+        st.markdown(f"### 📝 Extracted Text ({pages_label})")
+        st.text_area("Text Output", page_text, height=300, label_visibility="collapsed")
+
+    # Translation, of the pages in view
+    if enable_translation and page_text.strip():
+        try:
+            translated_text = job_result(start_job(
+                translate_job, page_text, target_lang_code,
+                label=f"Translation to {target_language} ({pages_label.lower()})",
+                key=job_queue.make_key("translate", page_text, target_lang_code),
+            ))
+            if translated_text is not None:
+                st.success(f"✅ Translation to {target_language} completed!")
+                st.markdown(f"### 🔤 Translated Text ({target_language}, {pages_label.lower()})")
+                st.text_area("Translated Output", translated_text, height=300, label_visibility="collapsed")
+
+                # Download button for translated text
+                col1, col2, col3 = st.columns([1, 2, 1])
+                with col2:
+                    st.download_button(
+                        label=f"📥 Download Translated Text ({target_language})",
+                        data=translated_text,
+                        file_name=f"translated_pdf_text_{target_lang_code}_p{first}-{last}.txt",
+                        mime="text/plain",
+                        use_container_width=True
+                    )
+        except Exception as e:
+            st.error(f"❌ Translation error: {str(e)}")
+
+    # Download button for extracted text; the whole document is joined only when clicked
+    st.markdown("---")
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        st.download_button(
+            label="📥 Download Extracted Text" if not job.active else f"📥 Download Extracted Text ({ready} pages so far)",
+            data=lambda: format_pages(job.partial_results()),
+            file_name="extracted_pdf_text.txt",
+            mime="text/plain",
+            use_container_width=True
+        )
+
+
 # Header with animation
 st.markdown("# 📷 AI Text Extraction & Translation")
 st.markdown('<p class="subtitle">🚀 Extract text from images & PDFs, then translate to 15+ languages instantly</p>', unsafe_allow_html=True)
@@ -363,7 +639,8 @@ languages = {
     "Hindi": "hin",
     "Bengali": "ben",
     "Turkish": "tur",
-    "Dutch": "nld"
+    "Dutch": "nld",
+    "🔎 Auto-detect": "auto"
 }
 
 # Translation language codes (for Google Translate)
@@ -393,6 +670,17 @@ selected_language = st.sidebar.selectbox(
 )
 lang_code = languages[selected_language]
 
+enable_preprocessing = st.sidebar.checkbox(
+    "🧹 Clean up image before OCR",
+    value=True,
+    help="Grayscale, downscale, deskew, binarize and crop photos before text extraction"
+)
+detect_regions = st.sidebar.checkbox(
+    "🔎 Find text regions first",
+    value=False,
+    help="Faster on large photos where text covers only a small area"
+)
+
 st.sidebar.markdown("---")
 
 # Translation settings
@@ -410,17 +698,64 @@ if enable_translation:
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 📊 Quick Stats")
 st.sidebar.info("🎯 **15 Languages Supported**\n\n✅ OCR Accuracy: High\n\n⚡ Fast Processing")
+# Only report the cache once OCR has been used; don't load ocr_backend just for this
+if 'ocr_backend' in sys.modules:
+    cache_stats = sys.modules['ocr_backend'].ocr_cache.stats()
+    st.sidebar.caption(
+        f"🗄️ OCR cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"· {cache_stats['saved_seconds']:.1f}s of Tesseract saved"
+    )
+
+# Jobs from this page's URL, so results are still reachable after a refresh
+tracked_jobs = [job for job in map(job_queue.get, st.query_params.get_all("job")) if job is not None]
+if tracked_jobs:
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("### 🧵 Background Jobs")
+    job_icons = {QUEUED: "⏳", RUNNING: "🔄", DONE: "✅", ERROR: "❌", CANCELLED: "⏹️"}
+    for job in reversed(tracked_jobs):
+        st.sidebar.caption(f"{job_icons[job.status]} {job.label} · {job.status} · {job.elapsed:.0f}s")
+        if job.status == DONE and isinstance(job.result, (str, list)):
+            st.sidebar.download_button(
+                label="📥 Download result",
+                # Built only when clicked; PDF jobs return a list of pages
+                data=lambda result=job.result: result if isinstance(result, str) else format_pages(result),
+                file_name=f"job_{job.id}.txt",
+                mime="text/plain",
+                key=f"job_download_{job.id}"
+            )
+
+# Everything extracted so far, when SEARCH_INDEX_PATH is set; the index only loads on the first query
+if os.environ.get('SEARCH_INDEX_PATH'):
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("### 🔎 Search Documents")
+    search_query = st.sidebar.text_input("Words or \"quoted phrases\"", key="search_query", placeholder='invoice "net 30"')
+    if search_query:
+        from search_index import shared_index
+
+        try:
+            hits = shared_index().search(search_query, limit=10)
+        except Exception as e:
+            st.sidebar.error(f"❌ Search failed: {str(e)}")
+            hits = None
+        if hits == []:
+            st.sidebar.caption("No page contains all of these words.")
+        for hit in hits or []:
+            st.sidebar.markdown(f"**{hit['name']}** · page {hit['page']}")
+            st.sidebar.caption(hit['snippet'])
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 💡 Tips")
 st.sidebar.success("📌 Use clear, well-lit images\n\n📌 Higher resolution = better OCR\n\n📌 PDF text extraction is instant")
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 📥 Language Data")
-with st.sidebar.expander("Download Additional Languages"):
+if os.environ.get('TESSDATA_PREFETCH'):
+    start_model_prefetch()
+
+with st.sidebar.expander("📥 Language Data"):
     st.markdown("""
     **English** is pre-installed. For other languages:
     
-    Select a language below to download:
+    Select a language below to install it on the server. It can be used right away, no restart needed.
     """)
     
     # Language download helper
@@ -439,31 +774,31 @@ with st.sidebar.expander("Download Additional Languages"):
     selected_download = st.selectbox("Select language to download:", ["-- Select --"] + list(lang_files.keys()), key="lang_download")
     
     if selected_download != "-- Select --":
-        if st.button(f"📥 Download {selected_download}", key="download_lang_btn"):
-            lang_code = lang_files[selected_download]
-            url = f"https://github.com/tesseract-ocr/tessdata/raw/main/{lang_code}.traineddata"
-            tessdata_path = Path(r"C:\Program Files\Tesseract-OCR\tessdata")
-            
+        download_code = lang_files[selected_download]
+        install_key = job_queue.make_key("tessdata", download_code)
+        if st.button(f"📥 Install {selected_download}", key="download_lang_btn"):
+            # Downloads, sanity-checks and warms up the model in the background
+            start_job(install_languages_job, [download_code], label=f"Install {selected_download} language data",
+                      key=install_key, replace=True)
+        install_job = job_queue.find(install_key)
+        if install_job is not None:
             try:
-                with st.spinner(f"Downloading {selected_download} language data..."):
-                    response = requests.get(url, timeout=30)
-                    response.raise_for_status()
-                    
-                    # Save to tessdata folder
-                    file_path = tessdata_path / f"{lang_code}.traineddata"
-                    with open(file_path, 'wb') as f:
-                        f.write(response.content)
-                    
-                    st.success(f"✅ {selected_download} language downloaded successfully!")
-                    st.info("Please restart the app to use the new language.")
+                if job_result(install_job.id) is not None:
+                    st.success(f"✅ {selected_download} is installed and ready to use!")
             except PermissionError:
-                st.error("❌ Permission denied. Please run as Administrator or manually download to tessdata folder.")
+                st.error("❌ Permission denied. Set TESSDATA_DIR to a writable directory for language data.")
             except Exception as e:
-                st.error(f"❌ Download failed: {str(e)}")
-                st.info(f"Manual download: [Click here]({url})")
+                st.error(f"❌ Install failed: {str(e)}")
     
     st.markdown("---")
-    st.caption("💡 If auto-download fails, download manually from GitHub and place in tessdata folder.")
+    # Only list installed models once OCR has been used; don't load ocr_backend just for this
+    if 'ocr_backend' in sys.modules:
+        store = sys.modules['ocr_backend'].tessdata_store
+        try:
+            st.caption(f"📂 {store.directory}: {', '.join(store.installed()) or 'no models'}")
+        except RuntimeError as e:
+            st.caption(f"⚠️ {e}")
+    st.caption("💡 Models come from TESSDATA_MIRROR (GitHub by default) and go to TESSDATA_DIR, or Tesseract's own tessdata folder.")
 
 
 # Tabs for different input methods
@@ -471,15 +806,37 @@ tab1, tab2, tab3, tab4, tab5 = st.tabs(["📷 Camera Capture", "🖼️ Upload I
 
 with tab1:
     st.markdown("### 📸 Capture Image with Camera")
-    st.info("💡 Click the camera button below to take a picture")
-    # Camera Input for live capture
-    captured_image = st.camera_input("📷 Activate Camera")
+    # Live mode opens a camera on the server, so only the ones listed in LIVE_OCR_CAMERAS (e.g. "0,1")
+    live_cameras = [int(index) for index in os.environ.get('LIVE_OCR_CAMERAS', '').split(',') if index.strip().isdigit()]
+    live_mode = live_cameras and st.toggle(
+        "🔴 Live mode", help="Keep reading text from a camera attached to the machine running this app")
+    if live_mode:
+        st.info("💡 Text is read whenever a new page holds still under the camera, and shown when it changes")
+        live_source = st.selectbox("Camera", live_cameras, format_func=lambda index: f"Camera {index}")
+        captured_image = None
+    else:
+        st.info("💡 Click the camera button below to take a picture")
+        # Camera Input for live capture
+        captured_image = st.camera_input("📷 Activate Camera")
+        live_source = None
 
 with tab2:
     st.markdown("### 🖼️ Upload an Image File")
-    st.info("💡 Supported formats: JPG, PNG, JPEG")
-    # File Uploader for manual image upload
-    uploaded_file = st.file_uploader("Choose an image file", type=["jpg", "png", "jpeg"], help="Drag and drop or click to browse")
+    batch_mode = st.toggle("📚 Batch mode", help="OCR many images, or zip/tar archives of them, in parallel")
+    if batch_mode:
+        st.info("💡 Supported formats: JPG, PNG, JPEG, TIFF, BMP, WEBP, and ZIP/TAR archives of them")
+        batch_files = st.file_uploader(
+            "Choose image files or archives",
+            type=["jpg", "png", "jpeg", "tif", "tiff", "bmp", "webp", "zip", "tar", "tgz", "gz"],
+            accept_multiple_files=True,
+            help="Drag and drop a whole folder's worth of files"
+        )
+        uploaded_file = None
+    else:
+        st.info("💡 Supported formats: JPG, PNG, JPEG")
+        # File Uploader for manual image upload
+        uploaded_file = st.file_uploader("Choose an image file", type=["jpg", "png", "jpeg"], help="Drag and drop or click to browse")
+        batch_files = []
 
 with tab3:
     st.markdown("### 📄 Upload a PDF Document")
@@ -489,184 +846,180 @@ with tab3:
 
 # Process Image (either from camera or uploaded file)
 if captured_image or uploaded_file:
+    from PIL import Image
+
     # Load the image
-    if captured_image:
-        image = Image.open(captured_image)
-    else:
-        image = Image.open(uploaded_file)
+    image_file = captured_image or uploaded_file
+    image = Image.open(image_file)
 
     col_img, col_space = st.columns([2, 1])
     with col_img:
         st.image(image, caption="📷 Captured Image", use_container_width=True)
 
-    # Save image temporarily for OCR processing
-    image_np = np.array(image)
-    image_path = "temp_image.jpg"
-    cv2.imwrite(image_path, cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR))
+    # Extract text using OCR in the background; reruns re-attach to the same job
+    image_bytes = image_file.getvalue()
+    try:
+        image_job = start_job(
+            ocr_image_job, image_bytes, lang=lang_code, preprocess=enable_preprocessing or None, regions=detect_regions,
+            name=image_file.name,
+            label=f"Image OCR ({selected_language})",
+            key=job_queue.make_key("image", image_bytes, lang_code, enable_preprocessing, detect_regions),
+        )
+        extracted_text = job_result(image_job)
+    except Exception as e:
+        if "traineddata" in str(e):
+            st.error(f"❌ Language data file not found for {selected_language}!")
+            st.info(f"""
+            📥 **Install the Required Language Data:**
+            
+            Open **📥 Language Data** in the sidebar and install {selected_language},
+            or place `{lang_code}.traineddata` in the tessdata folder.
+            
+            Or try using **English** language which is already installed.
+            """)
+            st.stop()
+        else:
+            st.error(f"❌ Error extracting text: {str(e)}")
+            st.stop()
 
-    # Extract text using OCR
-    with st.spinner(f"🔍 Extracting text from image ({selected_language})..."):
-        try:
-            extracted_text = extract_text(image_path, lang=lang_code)
-        except Exception as e:
-            if "traineddata" in str(e):
-                st.error(f"❌ Language data file not found for {selected_language}!")
-                st.info(f"""
-                📥 **Download Required Language Data:**
-                
-                1. Visit: https://github.com/tesseract-ocr/tessdata
-                2. Download `{lang_code}.traineddata`
-                3. Place it in: `C:\\Program Files\\Tesseract-OCR\\tessdata\\`
-                4. Restart the app
-                
-                Or try using **English** language which is already installed.
-                """)
-                st.stop()
-            else:
-                st.error(f"❌ Error extracting text: {str(e)}")
-                st.stop()
-        
-        extracted_text = extracted_text if extracted_text else ""
+    if extracted_text is not None:
+        st.success("✅ Text extraction completed!")
+        if lang_code == "auto":
+            job = job_queue.get(image_job)
+            detection = job.partial_results()[-1] if job and job.partial_results() else None
+            if detection:
+                names = {code: name for name, code in languages.items()}
+                used = ", ".join(names.get(code, code) for code in detection.get('langs', [detection['lang']]))
+                script = detection['script'] or "unknown script"
+                st.caption(f"🔎 Detected {script} → OCR language: {used}"
+                           + (f" · rotated {detection['rotate']}°" if detection['rotate'] else ""))
     
-    st.success("✅ Text extraction completed!")
-    
-    # Check if text contains code
-    code_indicators = ['def ', 'class ', 'import ', 'function ', 'var ', 'const ', 'let ', '<?php', '#!/', '{', '}', '()', '=>', 'public ', 'private ', 'return']
-    contains_code = any(indicator in extracted_text for indicator in code_indicators)
+        # Check if text contains code
+        code_indicators = ['def ', 'class ', 'import ', 'function ', 'var ', 'const ', 'let ', '<?php', '#!/', '{', '}', '()', '=>', 'public ', 'private ', 'return']
+        contains_code = any(indicator in extracted_text for indicator in code_indicators)
     
-    # Display options
-    display_option = st.radio(
-        "Display as:",
-        ["📝 Plain Text", "💻 Code Format"] if contains_code else ["📝 Plain Text"],
-        horizontal=True,
-        key="img_display_option"
-    )
+        # Display options
+        display_option = st.radio(
+            "Display as:",
+            ["📝 Plain Text", "💻 Code Format"] if contains_code else ["📝 Plain Text"],
+            horizontal=True,
+            key="img_display_option"
+        )
     
-    if display_option == "💻 Code Format":
-        st.markdown("### 💻 Extracted Code")
-        st.code(extracted_text, language=None, line_numbers=True)
-    else:
-        st.markdown("### 📝 Extracted Text")
-        st.text_area("Text Output", extracted_text, height=300, label_visibility="collapsed")
+        if display_option == "💻 Code Format":
+            st.markdown("### 💻 Extracted Code")
+            st.code(extracted_text, language=None, line_numbers=True)
+        else:
+            st.markdown("### 📝 Extracted Text")
+            st.text_area("Text Output", extracted_text, height=300, label_visibility="collapsed")
     
-    # Translation
-    if enable_translation and extracted_text.strip():
-        with st.spinner(f"🔄 Translating to {target_language}..."):
+        # Translation
+        if enable_translation and extracted_text.strip():
             try:
-                translator = GoogleTranslator(source='auto', target=target_lang_code)
-                translated_text = translator.translate(extracted_text)
-                st.success(f"✅ Translation to {target_language} completed!")
-                st.markdown(f"### 🔤 Translated Text ({target_language})")
-                st.text_area("Translated Output", translated_text, height=300, label_visibility="collapsed")
+                translated_text = job_result(start_job(
+                    translate_job, extracted_text, target_lang_code,
+                    label=f"Translation to {target_language}",
+                    key=job_queue.make_key("translate", extracted_text, target_lang_code),
+                ))
+                if translated_text is not None:
+                    st.success(f"✅ Translation to {target_language} completed!")
+                    st.markdown(f"### 🔤 Translated Text ({target_language})")
+                    st.text_area("Translated Output", translated_text, height=300, label_visibility="collapsed")
                 
-                # Download button for translated text
-                col1, col2, col3 = st.columns([1, 2, 1])
-                with col2:
-                    st.download_button(
-                        label=f"📥 Download Translated Text ({target_language})",
-                        data=translated_text,
-                        file_name=f"translated_text_{target_lang_code}.txt",
-                        mime="text/plain",
-                        use_container_width=True
-                    )
+                    # Download button for translated text
+                    col1, col2, col3 = st.columns([1, 2, 1])
+                    with col2:
+                        st.download_button(
+                            label=f"📥 Download Translated Text ({target_language})",
+                            data=translated_text,
+                            file_name=f"translated_text_{target_lang_code}.txt",
+                            mime="text/plain",
+                            use_container_width=True
+                        )
             except Exception as e:
                 st.error(f"❌ Translation error: {str(e)}")
     
-    # Download button for extracted text
-    st.markdown("---")
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        st.download_button(
-            label="📥 Download Extracted Text",
-            data=extracted_text,
-            file_name="extracted_text.txt",
-            mime="text/plain",
-            use_container_width=True
+        # Download button for extracted text
+        st.markdown("---")
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            st.download_button(
+                label="📥 Download Extracted Text",
+                data=extracted_text,
+                file_name="extracted_text.txt",
+                mime="text/plain",
+                use_container_width=True
+            )
+
+# Live OCR runs until stopped; the page polls for the latest text
+if live_source is not None:
+    live_key = live_queue.make_key("live", live_source, lang_code, enable_preprocessing)
+    live_job = live_queue.find(live_key)
+    if live_job is None or not live_job.active:
+        if st.button("▶️ Start live OCR", type="primary"):
+            try:
+                # Its own queue: a session runs until stopped and must not hold a shared job worker
+                live_queue.submit(
+                    live_ocr_job, live_source,
+                    lang=lang_code, preprocess=enable_preprocessing or None,
+                    label=f"Live OCR ({selected_language})", key=live_key, replace=True,
+                )
+            except Exception as e:
+                st.error(f"❌ Error starting live OCR: {str(e)}")
+                st.stop()
+            live_job = live_queue.find(live_key)
+    if live_job is not None:
+        show_live_text(live_job.id)
+
+# Process a batch of images across a process pool; files show up as they finish
+if batch_files:
+    st.success(f"✅ {len(batch_files)} files uploaded")
+    try:
+        batch_job_id = start_job(
+            ocr_batch_job, batch_files, lang=lang_code, preprocess=enable_preprocessing or None, regions=detect_regions,
+            label=f"Batch OCR ({selected_language})",
+            key=job_queue.make_key("batch", *(f.file_id for f in batch_files), lang_code, enable_preprocessing,
+                                   detect_regions),
         )
+        if job_queue.get(batch_job_id).status == ERROR:
+            raise job_queue.get(batch_job_id).error
+    except Exception as e:
+        st.error(f"❌ Error extracting text: {str(e)}")
+        st.stop()
+
+    show_batch_results(batch_job_id)
 
 # Process PDF
 if uploaded_pdf:
     st.success(f"✅ PDF uploaded: **{uploaded_pdf.name}**")
     
-    # Extract text from PDF
-    with st.spinner(f"🔍 Extracting text from PDF ({selected_language})..."):
-        try:
-            extracted_text = extract_text_from_pdf(uploaded_pdf, lang=lang_code)
-        except Exception as e:
-            if "traineddata" in str(e):
-                st.error(f"❌ Language data file not found for {selected_language}!")
-                st.info(f"""
-                📥 **Download Required Language Data:**
-                
-                1. Visit: https://github.com/tesseract-ocr/tessdata
-                2. Download `{lang_code}.traineddata`
-                3. Place it in: `C:\\Program Files\\Tesseract-OCR\\tessdata\\`
-                4. Restart the app
-                
-                Or try using **English** language which is already installed.
-                """)
-                st.stop()
-        
-        try:
-            extracted_text = extract_text_from_pdf(uploaded_pdf, lang=lang_code)
-            
-            st.success("✅ Text extraction completed!")
-            
-            # Check if text contains code
-            code_indicators = ['def ', 'class ', 'import ', 'function ', 'var ', 'const ', 'let ', '<?php', '#!/', '{', '}', '()', '=>', 'public ', 'private ', 'return']
-            contains_code = any(indicator in extracted_text for indicator in code_indicators)
-            
-            # Display options
-            display_option = st.radio(
-                "Display as:",
-                ["📝 Plain Text", "💻 Code Format"] if contains_code else ["📝 Plain Text"],
-                horizontal=True,
-                key="pdf_display_option"
-            )
-            
-            if display_option == "💻 Code Format":
-                st.markdown("### 💻 Extracted Code")
-                st.code(extracted_text, language=None, line_numbers=True)
-            else:
-                st.markdown("### 📝 Extracted Text")
-                st.text_area("Text Output", extracted_text, height=300, label_visibility="collapsed")
+    # Extract text from PDF in the background; pages show up as soon as they are ready.
+    # The job spools the upload to disk itself; the key avoids hashing the whole file on every rerun.
+    try:
+        pdf_job_id = start_job(
+            pdf_job, uploaded_pdf, lang=lang_code,
+            label=f"PDF extraction ({selected_language})",
+            key=job_queue.make_key("pdf", uploaded_pdf.file_id, lang_code),
+        )
+        if job_queue.get(pdf_job_id).status == ERROR:
+            raise job_queue.get(pdf_job_id).error
+    except Exception as e:
+        if "traineddata" in str(e):
+            st.error(f"❌ Language data file not found for {selected_language}!")
+            st.info(f"""
+            📥 **Install the Required Language Data:**
             
-            # Translation
-            if enable_translation and extracted_text.strip():
-                with st.spinner(f"🔄 Translating to {target_language}..."):
-                    try:
-                        translator = GoogleTranslator(source='auto', target=target_lang_code)
-                        translated_text = translator.translate(extracted_text)
-                        st.success(f"✅ Translation to {target_language} completed!")
-                        st.markdown(f"### 🔤 Translated Text ({target_language})")
-                        st.text_area("Translated Output", translated_text, height=300, label_visibility="collapsed")
-                        
-                        # Download button for translated text
-                        col1, col2, col3 = st.columns([1, 2, 1])
-                        with col2:
-                            st.download_button(
-                                label=f"📥 Download Translated Text ({target_language})",
-                                data=translated_text,
-                                file_name=f"translated_pdf_text_{target_lang_code}.txt",
-                                mime="text/plain",
-                                use_container_width=True
-                            )
-                    except Exception as e:
-                        st.error(f"❌ Translation error: {str(e)}")
+            Open **📥 Language Data** in the sidebar and install {selected_language},
+            or place `{lang_code}.traineddata` in the tessdata folder.
             
-            # Download button for extracted text
-            st.markdown("---")
-            col1, col2, col3 = st.columns([1, 2, 1])
-            with col2:
-                st.download_button(
-                    label="📥 Download Extracted Text",
-                    data=extracted_text,
-                    file_name="extracted_pdf_text.txt",
-                    mime="text/plain",
-                    use_container_width=True
-                )
-        except Exception as e:
+            Or try using **English** language which is already installed.
+            """)
+            st.stop()
+        else:
             st.error(f"❌ Error extracting text from PDF: {str(e)}")
+            st.stop()
+
+    show_pdf_pages(pdf_job_id)
 
 # Voice to Text Tab
 with tab4:
@@ -714,42 +1067,54 @@ with tab4:
     )
     speech_lang_code = speech_languages[selected_speech_lang]
     
+    # Recognition engines for speech-to-text
+    speech_engines = {
+        "Google (online)": "google",
+        "CMU Sphinx (offline)": "sphinx"
+    }
+    
+    selected_speech_engine = st.selectbox(
+        "Select recognition engine",
+        options=list(speech_engines.keys()),
+        index=0,
+        help="Offline recognition requires the pocketsphinx package",
+        key="upload_audio_engine"
+    )
+    speech_engine = speech_engines[selected_speech_engine]
+    
     if voice_option == "📁 Upload Audio File" and audio_file is not None:
         st.success(f"✅ Audio file uploaded: **{audio_file.name}**")
         
         # Display audio player
         st.audio(audio_file, format=f'audio/{audio_file.name.split(".")[-1]}')
         
-        # Convert button
-        if st.button("🎙️ Convert Speech to Text", use_container_width=True):
-            with st.spinner(f"🔍 Converting speech to text ({selected_speech_lang})..."):
-                try:
-                    # Save uploaded file temporarily
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{audio_file.name.split('.')[-1]}") as tmp_file:
-                        tmp_file.write(audio_file.read())
-                        tmp_audio_path = tmp_file.name
-                    
-                    # Initialize recognizer
-                    recognizer = sr.Recognizer()
-                    
-                    # Convert audio to text
-                    with sr.AudioFile(tmp_audio_path) as source:
-                        audio_data = recognizer.record(source)
-                        text = recognizer.recognize_google(audio_data, language=speech_lang_code)
-                    
-                    # Clean up temp file
-                    os.unlink(tmp_audio_path)
-                    
+        # Convert button; the background job is picked up again on later reruns
+        audio_key = job_queue.make_key("audio", audio_file.file_id, speech_lang_code, speech_engine)
+        convert_clicked = st.button("🎙️ Convert Speech to Text", use_container_width=True)
+        if convert_clicked or job_queue.find(audio_key) is not None:
+            import speech_recognition as sr
+
+            try:
+                # Convert audio to text, chunk by chunk
+                text = job_result(start_job(
+                    transcribe_job, audio_file, f".{audio_file.name.split('.')[-1]}",
+                    language=speech_lang_code, recognizer=speech_engine,
+                    label=f"Speech to text ({selected_speech_lang})", key=audio_key, replace=convert_clicked,
+                ), preview=" ")
+                if text is not None:
                     st.success("✅ Speech to text conversion completed!")
                     st.markdown("### 📝 Converted Text")
                     st.text_area("Text Output", text, height=300, label_visibility="collapsed")
                     
                     # Translation option for voice text
                     if enable_translation and text.strip():
-                        with st.spinner(f"🔄 Translating to {target_language}..."):
-                            try:
-                                translator = GoogleTranslator(source='auto', target=target_lang_code)
-                                translated_text = translator.translate(text)
+                        try:
+                            translated_text = job_result(start_job(
+                                translate_job, text, target_lang_code,
+                                label=f"Translation to {target_language}",
+                                key=job_queue.make_key("translate", text, target_lang_code),
+                            ))
+                            if translated_text is not None:
                                 st.success(f"✅ Translation to {target_language} completed!")
                                 st.markdown(f"### 🔤 Translated Text ({target_language})")
                                 st.text_area("Translated Output", translated_text, height=300, label_visibility="collapsed")
@@ -764,8 +1129,8 @@ with tab4:
                                         mime="text/plain",
                                         use_container_width=True
                                     )
-                            except Exception as e:
-                                st.error(f"❌ Translation error: {str(e)}")
+                        except Exception as e:
+                            st.error(f"❌ Translation error: {str(e)}")
                     
                     # Download button for converted text
                     st.markdown("---")
@@ -779,12 +1144,12 @@ with tab4:
                             use_container_width=True
                         )
                         
-                except sr.UnknownValueError:
-                    st.error("❌ Could not understand the audio. Please try with a clearer recording.")
-                except sr.RequestError as e:
-                    st.error(f"❌ Could not request results from speech recognition service: {str(e)}")
-                except Exception as e:
-                    st.error(f"❌ Error converting speech to text: {str(e)}")
+            except sr.UnknownValueError:
+                st.error("❌ Could not understand the audio. Please try with a clearer recording.")
+            except sr.RequestError as e:
+                st.error(f"❌ Could not request results from speech recognition service: {str(e)}")
+            except Exception as e:
+                st.error(f"❌ Error converting speech to text: {str(e)}")
     
     elif voice_option == "📁 Upload Audio File":
         st.warning("⚠️ Please upload an audio file to begin conversion")
@@ -828,6 +1193,8 @@ with tab4:
         
         # Record button
         if st.button("🎙️ Start Recording", use_container_width=True):
+            import speech_recognition as sr
+
             with st.spinner(f"🔴 Recording for {duration} seconds... Please speak now!"):
                 try:
                     # Initialize recognizer
@@ -862,8 +1229,7 @@ with tab4:
                         if enable_translation and text.strip():
                             with st.spinner(f"🔄 Translating to {target_language}..."):
                                 try:
-                                    translator = GoogleTranslator(source='auto', target=target_lang_code)
-                                    translated_text = translator.translate(text)
+                                    translated_text = translate_text(text, target_lang_code)
                                     st.success(f"✅ Translation to {target_language} completed!")
                                     st.markdown(f"### 🔤 Translated Text ({target_language})")
                                     st.text_area("Translated Output", translated_text, height=300, label_visibility="collapsed", key="mic_translated_output")
@@ -924,6 +1290,15 @@ with tab5:
     )
     video_speech_lang_code = speech_languages[video_speech_lang]
     
+    video_speech_engine = st.selectbox(
+        "Select recognition engine",
+        options=list(speech_engines.keys()),
+        index=0,
+        help="Offline recognition requires the pocketsphinx package",
+        key="video_engine_select"
+    )
+    video_engine = speech_engines[video_speech_engine]
+    
     if video_file is not None:
         st.success(f"✅ Video file uploaded: **{video_file.name}**")
         
@@ -931,96 +1306,69 @@ with tab5:
         st.video(video_file)
         
         # Convert button
-        if st.button("🎬 Extract Audio & Convert to Text", use_container_width=True):
-            with st.spinner("🔍 Extracting audio from video..."):
-                try:
-                    # Save uploaded video temporarily
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{video_file.name.split('.')[-1]}") as tmp_video:
-                        tmp_video.write(video_file.read())
-                        tmp_video_path = tmp_video.name
-                    
-                    # Extract audio from video
-                    st.info("🎵 Extracting audio from video...")
-                    video_clip = VideoFileClip(tmp_video_path)
-                    
-                    # Save audio as WAV
-                    tmp_audio_path = tempfile.mktemp(suffix=".wav")
-                    video_clip.audio.write_audiofile(tmp_audio_path, codec='pcm_s16le', verbose=False, logger=None)
-                    video_clip.close()
-                    
-                    # Clean up video file
-                    os.unlink(tmp_video_path)
-                    
-                    st.success("✅ Audio extracted successfully!")
-                    
-                    # Convert audio to text
-                    with st.spinner(f"🔍 Converting speech to text ({video_speech_lang})..."):
-                        # Initialize recognizer
-                        recognizer = sr.Recognizer()
-                        
-                        # Convert audio to text
-                        with sr.AudioFile(tmp_audio_path) as source:
-                            audio_data = recognizer.record(source)
-                            text = recognizer.recognize_google(audio_data, language=video_speech_lang_code)
-                        
-                        # Clean up temp audio file
-                        os.unlink(tmp_audio_path)
-                        
-                        st.success("✅ Speech to text conversion completed!")
-                        st.markdown("### 📝 Converted Text from Video")
-                        st.text_area("Text Output", text, height=300, label_visibility="collapsed", key="video_text_output")
+        video_key = job_queue.make_key("video", video_file.file_id, video_speech_lang_code, video_engine)
+        convert_clicked = st.button("🎬 Extract Audio & Convert to Text", use_container_width=True)
+        if convert_clicked or job_queue.find(video_key) is not None:
+            import speech_recognition as sr
+
+            try:
+                # Decode the soundtrack window by window and transcribe as it streams
+                text = job_result(start_job(
+                    transcribe_job, video_file, f".{video_file.name.split('.')[-1]}",
+                    language=video_speech_lang_code, recognizer=video_engine, media=True,
+                    label=f"Video to text ({video_speech_lang})", key=video_key, replace=convert_clicked,
+                ), preview=" ")
+                if text is not None:
+                    st.success("✅ Speech to text conversion completed!")
+                    st.markdown("### 📝 Converted Text from Video")
+                    st.text_area("Text Output", text, height=300, label_visibility="collapsed", key="video_text_output")
                         
-                        # Translation option for video text
-                        if enable_translation and text.strip():
-                            with st.spinner(f"🔄 Translating to {target_language}..."):
-                                try:
-                                    translator = GoogleTranslator(source='auto', target=target_lang_code)
-                                    translated_text = translator.translate(text)
-                                    st.success(f"✅ Translation to {target_language} completed!")
-                                    st.markdown(f"### 🔤 Translated Text ({target_language})")
-                                    st.text_area("Translated Output", translated_text, height=300, label_visibility="collapsed", key="video_translated_output")
+                    # Translation option for video text
+                    if enable_translation and text.strip():
+                        try:
+                            translated_text = job_result(start_job(
+                                translate_job, text, target_lang_code,
+                                label=f"Translation to {target_language}",
+                                key=job_queue.make_key("translate", text, target_lang_code),
+                            ))
+                            if translated_text is not None:
+                                st.success(f"✅ Translation to {target_language} completed!")
+                                st.markdown(f"### 🔤 Translated Text ({target_language})")
+                                st.text_area("Translated Output", translated_text, height=300, label_visibility="collapsed", key="video_translated_output")
                                     
-                                    # Download button for translated text
-                                    col1, col2, col3 = st.columns([1, 2, 1])
-                                    with col2:
-                                        st.download_button(
-                                            label=f"📥 Download Translated Text ({target_language})",
-                                            data=translated_text,
-                                            file_name=f"translated_video_text_{target_lang_code}.txt",
-                                            mime="text/plain",
-                                            use_container_width=True,
-                                            key="video_translated_download"
-                                        )
-                                except Exception as e:
-                                    st.error(f"❌ Translation error: {str(e)}")
+                                # Download button for translated text
+                                col1, col2, col3 = st.columns([1, 2, 1])
+                                with col2:
+                                    st.download_button(
+                                        label=f"📥 Download Translated Text ({target_language})",
+                                        data=translated_text,
+                                        file_name=f"translated_video_text_{target_lang_code}.txt",
+                                        mime="text/plain",
+                                        use_container_width=True,
+                                        key="video_translated_download"
+                                    )
+                        except Exception as e:
+                            st.error(f"❌ Translation error: {str(e)}")
                         
-                        # Download button for converted text
-                        st.markdown("---")
-                        col1, col2, col3 = st.columns([1, 2, 1])
-                        with col2:
-                            st.download_button(
-                                label="📥 Download Converted Text",
-                                data=text,
-                                file_name="video_to_text.txt",
-                                mime="text/plain",
-                                use_container_width=True,
-                                key="video_text_download"
-                            )
+                    # Download button for converted text
+                    st.markdown("---")
+                    col1, col2, col3 = st.columns([1, 2, 1])
+                    with col2:
+                        st.download_button(
+                            label="📥 Download Converted Text",
+                            data=text,
+                            file_name="video_to_text.txt",
+                            mime="text/plain",
+                            use_container_width=True,
+                            key="video_text_download"
+                        )
                             
-                except sr.UnknownValueError:
-                    st.error("❌ Could not understand the audio from video. Please try with a clearer video.")
-                except sr.RequestError as e:
-                    st.error(f"❌ Could not request results from speech recognition service: {str(e)}")
-                except Exception as e:
-                    st.error(f"❌ Error processing video: {str(e)}")
-                    # Clean up temp files in case of error
-                    try:
-                        if 'tmp_video_path' in locals() and os.path.exists(tmp_video_path):
-                            os.unlink(tmp_video_path)
-                        if 'tmp_audio_path' in locals() and os.path.exists(tmp_audio_path):
-                            os.unlink(tmp_audio_path)
-                    except:
-                        pass
+            except sr.UnknownValueError:
+                st.error("❌ Could not understand the audio from video. Please try with a clearer video.")
+            except sr.RequestError as e:
+                st.error(f"❌ Could not request results from speech recognition service: {str(e)}")
+            except Exception as e:
+                st.error(f"❌ Error processing video: {str(e)}")
     else:
         st.warning("⚠️ Please upload a video file to begin conversion")
 
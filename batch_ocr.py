@@ -0,0 +1,347 @@
+"""Headless bulk OCR over directories and zip/tar archives.
+
+Examples:
+    python batch_ocr.py scans/ -o results.jsonl
+    python batch_ocr.py archive.zip more_scans/ -o out_dir --format text --workers 8 --lang deu
+    python batch_ocr.py scans/ -o results.jsonl --index index.db   # also make them searchable
+
+Every finished input is appended to the output manifest straight away, so
+an interrupted run can simply be started again: inputs already recorded
+are skipped.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.webp'}
+PDF_EXTENSIONS = {'.pdf'}
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def file_kind(name):
+    """Return 'image', 'pdf' or None for a file name."""
+    ext = os.path.splitext(name)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return 'image'
+    if ext in PDF_EXTENSIONS:
+        return 'pdf'
+    return None
+
+
+def iter_inputs(paths):
+    """Walk files, directories and archives.
+
+    Yields:
+        (source_id, kind, path, data) tuples. Plain files carry a path and
+        are read by the worker; archive members carry their bytes. An input
+        that cannot be walked, such as a corrupt archive, yields
+        (source_id, 'error', None, message) after any members read before
+        the failure.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    yield from _iter_file(os.path.join(root, name))
+        else:
+            yield from _iter_file(path)
+
+
+def iter_file_object(name, fileobj):
+    """Like iter_inputs, for one open binary file such as an upload.
+
+    Args:
+        name: File name; used for the source ids and to tell the kind
+        fileobj: Seekable binary file object
+
+    Yields:
+        (source_id, kind, None, data) tuples
+    """
+    try:
+        if _is_archive(fileobj):
+            yield from _iter_archive(name, fileobj)
+            return
+    except Exception as e:
+        yield name, 'error', None, f"{type(e).__name__}: {e}"
+        return
+    kind = file_kind(name)
+    if kind:
+        fileobj.seek(0)
+        yield name, kind, None, fileobj.read()
+
+
+def _iter_file(path):
+    # One bad archive (or a file gone since the walk) is recorded, not fatal to the run
+    try:
+        if zipfile.is_zipfile(path) or tarfile.is_tarfile(path):
+            with open(path, 'rb') as f:
+                yield from _iter_archive(path, f)
+            return
+    except Exception as e:
+        yield path, 'error', None, f"{type(e).__name__}: {e}"
+        return
+    kind = file_kind(path)
+    if kind:
+        yield path, kind, path, None
+
+
+def _is_archive(fileobj):
+    for test in (zipfile.is_zipfile, tarfile.is_tarfile):
+        fileobj.seek(0)
+        if test(fileobj):
+            return True
+    return False
+
+
+def _iter_archive(name, fileobj):
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                kind = file_kind(info.filename)
+                if kind and not info.is_dir():
+                    yield f"{name}!{info.filename}", kind, None, archive.read(info)
+        return
+    fileobj.seek(0)
+    with tarfile.open(fileobj=fileobj) as archive:
+        for member in archive:
+            kind = file_kind(member.name)
+            if kind and member.isfile():
+                yield f"{name}!{member.name}", kind, None, archive.extractfile(member).read()
+
+
+def process_input(source_id, kind, path, data, lang, preprocess=None, regions=False):
+    """Extract text from one input. Runs in a worker process.
+
+    preprocess and regions are passed to extract_text_from_image for images.
+    An 'error' input from iter_inputs becomes an error record with its message.
+    """
+    if kind == 'error':
+        # data is the message
+        return {"source": source_id, "kind": kind, "error": data, "page_count": 0, "chars": 0, "timings": {}}
+
+    from ocr_backend import extract_text_from_image, iter_pdf_pages
+
+    timings = {}
+    record = {"source": source_id, "kind": kind}
+    start = time.perf_counter()
+    try:
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        timings['read'] = time.perf_counter() - start
+        record["bytes"] = len(data)
+        record["sha256"] = hashlib.sha256(data).hexdigest()
+
+        start = time.perf_counter()
+        if kind == 'image':
+            pages = [extract_text_from_image(data, lang=lang, preprocess=preprocess, regions=regions)]
+        else:
+            # Already inside a pool worker, so OCR scanned pages in-process
+            pages = [text for _, text in iter_pdf_pages(io.BytesIO(data), lang=lang, max_workers=1)]
+        record["pages"] = pages
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        pages = []
+    timings['extract'] = time.perf_counter() - start
+
+    record["page_count"] = len(pages)
+    record["chars"] = sum(len(page) for page in pages)
+    record["timings"] = timings
+    return record
+
+
+def load_manifest(manifest_path, retry_errors=False):
+    """Return the source ids already recorded in a manifest."""
+    done = set()
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Last line may be cut short by a crash
+                continue
+            if retry_errors and record.get("error"):
+                continue
+            done.add(record["source"])
+    return done
+
+
+def text_file_name(source_id):
+    """Return a safe .txt file name for a source id."""
+    return re.sub(r'[^\w.-]+', '_', source_id).strip('_') + ".txt"
+
+
+class ResultWriter:
+    """Append results as JSONL, or as per-file text plus a JSONL manifest."""
+
+    def __init__(self, output, fmt):
+        self.fmt = fmt
+        if fmt == 'jsonl':
+            parent = os.path.dirname(os.path.abspath(output))
+            os.makedirs(parent, exist_ok=True)
+            self.text_dir = None
+            self.manifest_path = output
+        else:
+            os.makedirs(output, exist_ok=True)
+            self.text_dir = output
+            self.manifest_path = os.path.join(output, MANIFEST_NAME)
+        self._manifest = open(self.manifest_path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        """Append one record; the caller's dict is left as it is."""
+        if self.text_dir is not None:
+            record = dict(record)
+            pages = record.pop("pages", None)
+            if pages is not None:
+                name = text_file_name(record["source"])
+                path = os.path.join(self.text_dir, name)
+                with open(path, 'w', encoding='utf-8') as f:
+                    for page_num, text in enumerate(pages, start=1):
+                        f.write(f"\n--- Page {page_num} ---\n")
+                        f.write(text)
+                record["output"] = name
+        self._manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._manifest.flush()
+
+    def close(self):
+        self._manifest.close()
+
+
+class Progress:
+    """Track throughput and per-stage time for the run."""
+
+    def __init__(self, stream=sys.stderr, every=50):
+        self.stream = stream
+        self.every = every
+        self.start = time.perf_counter()
+        self.files = 0
+        self.pages = 0
+        self.errors = 0
+        self.skipped = 0
+        self.stage_seconds = {}
+
+    def add_stage(self, stage, seconds):
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def record(self, record):
+        self.files += 1
+        self.pages += record["page_count"]
+        if record.get("error"):
+            self.errors += 1
+        for stage, seconds in record["timings"].items():
+            self.add_stage(stage, seconds)
+        if self.files % self.every == 0:
+            self.report()
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        print(
+            f"{self.files} files ({self.errors} errors, {self.skipped} skipped), {self.pages} pages "
+            f"in {elapsed:.1f}s: {self.files / elapsed:.2f} files/s, {self.pages / elapsed:.2f} pages/s",
+            file=self.stream,
+        )
+
+    def summary(self):
+        self.report()
+        print("Time per stage (summed over workers):", file=self.stream)
+        for stage, seconds in sorted(self.stage_seconds.items()):
+            print(f"  {stage:<10} {seconds:10.2f}s", file=self.stream)
+
+
+def run(inputs, output, fmt='jsonl', lang='eng', workers=None, retry_errors=False, progress=None, index=None):
+    """Extract text from every input, skipping ones already in the manifest.
+
+    Args:
+        inputs: Files, directories or zip/tar archives
+        output: JSONL file (fmt='jsonl') or output directory (fmt='text')
+        fmt: 'jsonl' or 'text'
+        lang: Language code for OCR
+        workers: Process count (default: number of CPU cores)
+        retry_errors: Re-run inputs that previously failed
+        progress: Progress tracker (default: a new one writing to stderr)
+        index: search_index.SearchIndex to add each extracted document to
+
+    Returns:
+        The Progress tracker with totals for the run
+    """
+    workers = workers or os.cpu_count() or 1
+    progress = progress or Progress()
+    writer = ResultWriter(output, fmt)
+    done = load_manifest(writer.manifest_path, retry_errors)
+    in_flight = deque()
+
+    def drain(limit):
+        while len(in_flight) > limit:
+            record = in_flight.popleft().result()
+            # Index before the manifest entry, which makes a resumed run skip the input
+            if index is not None and "error" not in record:
+                start = time.perf_counter()
+                index.add(record["sha256"], record["source"], record["pages"])
+                progress.add_stage('index', time.perf_counter() - start)
+            start = time.perf_counter()
+            writer.write(record)
+            progress.add_stage('write', time.perf_counter() - start)
+            progress.record(record)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            walk = iter_inputs(inputs)
+            while True:
+                start = time.perf_counter()
+                item = next(walk, None)
+                progress.add_stage('walk', time.perf_counter() - start)
+                if item is None:
+                    break
+                if item[0] in done:
+                    progress.skipped += 1
+                    continue
+                in_flight.append(executor.submit(process_input, *item, lang))
+                # Keep the pool busy without holding every archive member in memory
+                drain(2 * workers)
+            drain(0)
+    finally:
+        writer.close()
+    progress.summary()
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk OCR for images and PDFs in directories and zip/tar archives.")
+    parser.add_argument('inputs', nargs='+', help="Files, directories or zip/tar archives")
+    parser.add_argument('-o', '--output', required=True, help="JSONL file, or output directory with --format text")
+    parser.add_argument('--format', choices=['jsonl', 'text'], default='jsonl', help="Output format (default: jsonl)")
+    parser.add_argument('--lang', default='eng', help="Tesseract language code (default: eng)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--retry-errors', action='store_true', help="Re-run inputs recorded with an error")
+    parser.add_argument('--index', default=None, help="Also add extracted text to this search index file")
+    args = parser.parse_args(argv)
+
+    index = None
+    if args.index:
+        from search_index import SearchIndex
+
+        index = SearchIndex(args.index)
+    try:
+        progress = run(args.inputs, args.output, fmt=args.format, lang=args.lang,
+                       workers=args.workers, retry_errors=args.retry_errors, index=index)
+    finally:
+        if index is not None:
+            index.close()
+    return 1 if progress.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Compare OCR latency and accuracy with and without preprocessing.
+
+Runs Tesseract over a fixed set of synthetic camera-style photos (or your
+own images) twice: once on the raw pixels and once after the
+ocr_backend.Preprocessor pipeline.
+
+    python benchmarks/bench_preprocess.py
+    python benchmarks/bench_preprocess.py --images samples/ --json preprocess.json
+
+With --images, each image needs a ground-truth text file next to it with
+the same name (receipt.jpg -> receipt.txt).
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+
+from benchmarks.corpus import char_accuracy, image_set
+from ocr_backend import Preprocessor, _run_tesseract
+
+
+def load_images(directory):
+    samples = []
+    for path in sorted(glob.glob(os.path.join(directory, '*'))):
+        stem, ext = os.path.splitext(path)
+        if ext.lower() == '.txt' or not os.path.exists(stem + '.txt'):
+            continue
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        with open(stem + '.txt', 'r', encoding='utf-8') as f:
+            samples.append((os.path.basename(path), image, f.read()))
+    return samples
+
+
+def run_mode(samples, lang, preprocessor, repeat):
+    latencies = []
+    accuracies = []
+    stage_seconds = {}
+    for _, image, truth in samples:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            pixels = image
+            if preprocessor is not None:
+                pixels, timings = preprocessor.run(image)
+                for stage, seconds in timings.items():
+                    stage_seconds.setdefault(stage, []).append(seconds)
+            text, _ = _run_tesseract(pixels, lang)
+            latencies.append(time.perf_counter() - start)
+        accuracies.append(char_accuracy(text, truth))
+    return {
+        "latency_p50": statistics.median(latencies),
+        "latency_mean": statistics.fmean(latencies),
+        "accuracy_mean": statistics.fmean(accuracies),
+        "stages_mean": {stage: statistics.fmean(values) for stage, values in stage_seconds.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', help="Directory of images with matching .txt ground truth")
+    parser.add_argument('--lang', default='eng', help="Tesseract language code (default: eng)")
+    parser.add_argument('--repeat', type=int, default=1, help="OCR passes per image (default: 1)")
+    parser.add_argument('--json', help="Also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    samples = load_images(args.images) if args.images else image_set()
+    results = {
+        "images": len(samples),
+        "raw": run_mode(samples, args.lang, None, args.repeat),
+        "preprocessed": run_mode(samples, args.lang, Preprocessor(), args.repeat),
+    }
+
+    print(f"{len(samples)} images, lang={args.lang}")
+    print(f"{'mode':<14}{'p50 latency':>14}{'mean latency':>15}{'char accuracy':>16}")
+    for mode in ('raw', 'preprocessed'):
+        r = results[mode]
+        print(f"{mode:<14}{r['latency_p50'] * 1000:>12.0f}ms{r['latency_mean'] * 1000:>13.0f}ms{r['accuracy_mean']:>16.3f}")
+    print("Preprocessing stages (mean per image):")
+    for stage, seconds in results['preprocessed']['stages_mean'].items():
+        print(f"  {stage:<10}{seconds * 1000:>8.1f}ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Diff two benchmark result files from benchmarks/run.py.
+
+    python benchmarks/compare.py base.json head.json [--threshold 10]
+
+Exits with status 1 if any metric got worse by more than the threshold
+(in percent), so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+# Metric name -> True if higher is better
+METRICS = {
+    'p50_ms': False,
+    'p99_ms': False,
+    'throughput_per_s': True,
+    'peak_rss_mb': False,
+    'char_accuracy': True,
+}
+
+
+def compare(base, head, threshold):
+    """Return (rows, regressions) comparing two result dicts."""
+    rows = []
+    regressions = []
+    for stage in sorted(set(base['stages']) | set(head['stages'])):
+        old = base['stages'].get(stage, {})
+        new = head['stages'].get(stage, {})
+        for metric, higher_is_better in METRICS.items():
+            a, b = old.get(metric), new.get(metric)
+            if a is None or b is None:
+                continue
+            change = (b - a) / a * 100 if a else 0.0
+            worse = -change if higher_is_better else change
+            flag = worse > threshold
+            rows.append((stage, metric, a, b, change, flag))
+            if flag:
+                regressions.append((stage, metric))
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff two benchmark result files.")
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=10.0, help="Regression threshold in percent (default: 10)")
+    args = parser.parse_args(argv)
+
+    with open(args.base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.head, 'r', encoding='utf-8') as f:
+        head = json.load(f)
+
+    rows, regressions = compare(base, head, args.threshold)
+    print(f"base {base['meta'].get('commit')}  ->  head {head['meta'].get('commit')}")
+    for stage, metric, a, b, change, flag in rows:
+        print(f"{'!!' if flag else '  '} {stage:<26}{metric:<18}{a:>12.3f}{b:>12.3f}{change:>+9.1f}%")
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0f}%")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
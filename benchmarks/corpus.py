@@ -0,0 +1,373 @@
+"""Deterministic synthetic inputs and scoring helpers for the benchmarks.
+
+Everything here is generated from fixed seeds with no network access, so
+two runs on different commits measure exactly the same inputs.
+"""
+import io
+import os
+import unicodedata
+import wave
+
+import numpy as np
+import cv2
+from PIL import Image, ImageDraw, ImageFont
+
+SENTENCES = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Invoice 20417 is due on 14 March 2025.",
+    "Total amount payable: 1,284.50 EUR",
+    "Please keep this receipt for your records.",
+    "Store 118 - Main Street - Open 8am to 10pm",
+    "Thank you for shopping with us today!",
+    "Order reference: QX-5521-B7",
+    "Returns are accepted within 30 days.",
+]
+
+
+def render_text_image(lines, width=1240, height=1754, skew=0.0, lighting=0.0, noise=0.0,
+                      scale=1.0, jpeg_quality=None, seed=0):
+    """Render lines of black text on a white page with optional camera-like damage.
+
+    Args:
+        lines: Text lines to draw
+        width, height: Page size in pixels before scaling (default: A4 at 150 DPI)
+        skew: Rotation in degrees
+        lighting: Strength (0-1) of a dark gradient across the page
+        noise: Standard deviation of Gaussian pixel noise
+        scale: Final resize factor, e.g. 2.5 to mimic a 12 MP phone frame
+        jpeg_quality: Round-trip through JPEG at this quality when given
+        seed: Seed for the noise generator
+
+    Returns:
+        BGR uint8 image
+    """
+    page = np.full((height, width), 255, dtype=np.uint8)
+    y = 120
+    for line in lines:
+        cv2.putText(page, line, (80, y), cv2.FONT_HERSHEY_SIMPLEX, 1.1, 0, 2, cv2.LINE_AA)
+        y += 70
+
+    if skew:
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+        page = cv2.warpAffine(page, matrix, (width, height), borderValue=255)
+
+    image = page.astype(np.float32)
+    if lighting:
+        gradient = np.linspace(1.0, 1.0 - lighting, width, dtype=np.float32)
+        image *= gradient[None, :]
+    if noise:
+        rng = np.random.default_rng(seed)
+        image += rng.normal(0, noise, image.shape).astype(np.float32)
+    image = np.clip(image, 0, 255).astype(np.uint8)
+
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+    if jpeg_quality:
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        image = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+    return image
+
+
+# Sample text per OCR language; the default Pillow font covers Latin-1
+LANGUAGE_SENTENCES = {
+    'eng': SENTENCES,
+    'deu': [
+        "Die Rechnung ist bis zum 14. März fällig.",
+        "Bitte bewahren Sie diesen Beleg gut auf.",
+        "Gesamtbetrag: 1.284,50 Euro inklusive Steuer",
+        "Öffnungszeiten: Montag bis Samstag",
+    ],
+    'fra': [
+        "La facture est payable avant le 14 mars.",
+        "Merci de conserver ce reçu précieusement.",
+        "Montant total à régler : 1 284,50 euros",
+        "Les retours sont acceptés sous trente jours.",
+    ],
+    'spa': [
+        "La factura vence el 14 de marzo de 2025.",
+        "Por favor conserve este recibo.",
+        "Importe total: 1.284,50 euros con impuestos",
+        "Gracias por su compra, vuelva pronto.",
+    ],
+}
+
+
+# Fonts with wide Unicode coverage; BENCH_FONT overrides
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+
+def load_font(size):
+    """Return (font, unicode_ok). Falls back to Pillow's Latin-only default font."""
+    for path in [os.environ.get('BENCH_FONT')] + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return ImageFont.truetype(path, size), True
+    try:
+        return ImageFont.load_default(size=size), False
+    except TypeError:
+        # Pillow < 10.1 has no scalable default font
+        return ImageFont.load_default(), False
+
+
+def fold_ascii(text):
+    """Strip accents so text renders with an ASCII-only font."""
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+
+
+def render_font_image(lines, width=1240, font_size=36, line_gap=1.6, margin=60):
+    """Render lines with a TrueType font so accented characters come out right.
+
+    Without a Unicode font the lines are folded to ASCII first.
+
+    Returns:
+        (BGR uint8 image, the lines actually drawn)
+    """
+    font, unicode_ok = load_font(font_size)
+    if not unicode_ok:
+        lines = [fold_ascii(line) for line in lines]
+    height = int(margin * 2 + len(lines) * font_size * line_gap)
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    for i, line in enumerate(lines):
+        draw.text((margin, margin + i * font_size * line_gap), line, fill=0, font=font)
+    return cv2.cvtColor(np.asarray(page), cv2.COLOR_GRAY2BGR), lines
+
+
+def multilingual_image_set(langs=('eng', 'deu'), widths=(640, 1240, 2480), seed=99):
+    """Return (name, lang, image, ground_truth) samples at several resolutions."""
+    rng = np.random.default_rng(seed)
+    samples = []
+    for lang in langs:
+        sentences = LANGUAGE_SENTENCES[lang]
+        for width in widths:
+            lines = [sentences[j] for j in rng.permutation(len(sentences))[:4]]
+            image, lines = render_font_image(lines, width=width, font_size=max(12, width // 34))
+            samples.append((f"{lang}_{width}px", lang, image, "\n".join(lines)))
+    return samples
+
+
+def image_set(count=8, seed=1234):
+    """Return a fixed list of (name, image, ground_truth) camera-style samples."""
+    rng = np.random.default_rng(seed)
+    samples = []
+    for i in range(count):
+        lines = [SENTENCES[j] for j in rng.choice(len(SENTENCES), size=4, replace=False)]
+        image = render_text_image(
+            lines,
+            skew=float(rng.uniform(-6, 6)),
+            lighting=float(rng.uniform(0.2, 0.6)),
+            noise=float(rng.uniform(4, 12)),
+            scale=2.5,
+            jpeg_quality=85,
+            seed=seed + i,
+        )
+        samples.append((f"photo_{i:02d}", image, "\n".join(lines)))
+    return samples
+
+
+def sparse_photo(width=4000, height=3000, labels=3, seed=5):
+    """A large, mostly empty frame with a few small text labels, like a shelf photo.
+
+    Returns:
+        (BGR image, ground truth with labels in reading order)
+    """
+    rng = np.random.default_rng(seed)
+    frame = np.clip(rng.normal(225, 4, (height, width)), 0, 255).astype(np.uint8)
+    frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    placed = []
+    for i in range(labels):
+        lines = [SENTENCES[int(rng.integers(len(SENTENCES)))]]
+        label, lines = render_font_image(lines, width=900, font_size=30, margin=20)
+        x = int(rng.integers(0, width - label.shape[1]))
+        y = int(i * height / labels + rng.integers(0, height / labels - label.shape[0]))
+        frame[y:y + label.shape[0], x:x + label.shape[1]] = label
+        placed.append((y, x, lines[0]))
+    return frame, "\n".join(text for _, _, text in sorted(placed))
+
+
+def document_video(path, pages=3, seconds_per_page=4.0, fps=15, width=960, height=720, seed=11):
+    """Write a video of pages being slid under a fixed camera, one after another.
+
+    Each page slides in over the first quarter of its time, then lies
+    still under slight sensor noise. It stands in for a document-scanning
+    webcam in tests and benchmarks.
+
+    Returns:
+        List of ground-truth texts, one per page, in order
+    """
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not write video to {path}")
+    truths = []
+    frames_per_page = int(seconds_per_page * fps)
+    slide_frames = frames_per_page // 4
+    try:
+        for page_num in range(pages):
+            lines = [SENTENCES[j] for j in rng.choice(len(SENTENCES), size=5, replace=False)]
+            truths.append("\n".join(lines))
+            page = render_text_image(lines, width=1240, height=800)
+            scale = 0.9 * min(width / page.shape[1], height / page.shape[0])
+            page = cv2.resize(page, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            ph, pw = page.shape[:2]
+            x0, y0 = (width - pw) // 2, (height - ph) // 2
+            for i in range(frames_per_page):
+                frame = np.full((height, width, 3), 90, dtype=np.uint8)
+                offset = int(width * (1 - i / slide_frames)) if i < slide_frames else 0
+                x = x0 + offset
+                if x < width:
+                    visible = page[:, :width - x]
+                    frame[y0:y0 + ph, x:x + visible.shape[1]] = visible
+                noise = rng.integers(-4, 5, frame.shape, dtype=np.int16)
+                writer.write(np.clip(frame + noise, 0, 255).astype(np.uint8))
+    finally:
+        writer.release()
+    return truths
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def char_accuracy(predicted, truth):
+    """Character accuracy (1 - CER) after collapsing whitespace, floored at 0."""
+    predicted = " ".join(predicted.split())
+    truth = " ".join(truth.split())
+    if not truth:
+        return 1.0 if not predicted else 0.0
+    return max(0.0, 1.0 - edit_distance(predicted, truth) / len(truth))
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _write_pdf(page_objects):
+    """Serialise a minimal PDF.
+
+    Args:
+        page_objects: For each page, a (content_bytes, resources_dict_str, extra_objects)
+            tuple; extra_objects is a list of (placeholder, object_bytes) the
+            resources refer to by placeholder name.
+    """
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for content, resources, extras in page_objects:
+        for placeholder, body in extras:
+            objects.append(body)
+            resources = resources.replace(placeholder, f"{len(objects)} 0 R")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources {resources} /Contents {content_id} 0 R >>".encode()
+        )
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _page_lines(page_num, seed, count=20):
+    rng = np.random.default_rng(seed + page_num)
+    return [f"Page {page_num} line {i + 1}: {SENTENCES[j]}" for i, j in enumerate(rng.integers(0, len(SENTENCES), count))]
+
+
+def text_pdf(pages, seed=7):
+    """Build a PDF with a real text layer.
+
+    Returns:
+        (pdf_bytes, [ground truth text per page])
+    """
+    page_objects = []
+    truths = []
+    for page_num in range(1, pages + 1):
+        lines = _page_lines(page_num, seed)
+        truths.append("\n".join(lines))
+        body = " T* ".join(f"({_pdf_escape(line)}) Tj" for line in lines)
+        content = f"BT /F1 11 Tf 14 TL 54 740 Td {body} ET".encode('latin-1')
+        page_objects.append((content, "<< /Font << /F1 3 0 R >> >>", []))
+    return _write_pdf(page_objects), truths
+
+
+def scanned_pdf(pages, seed=7, width=1240):
+    """Build an image-only PDF: each page is one embedded JPEG scan, no text layer.
+
+    Returns:
+        (pdf_bytes, [ground truth text per page])
+    """
+    page_objects = []
+    truths = []
+    for page_num in range(1, pages + 1):
+        lines = _page_lines(page_num, seed, count=8)
+        image, lines = render_font_image(lines, width=width, font_size=width // 50)
+        truths.append("\n".join(lines))
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        ok, jpeg = cv2.imencode('.jpg', gray, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        jpeg = jpeg.tobytes()
+        h, w = gray.shape
+        xobject = (
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+            b"/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>\nstream\n" % (w, h, len(jpeg))
+            + jpeg + b"\nendstream"
+        )
+        draw_h = 612 * h / w
+        content = f"q 612 0 0 {draw_h:.2f} 0 {792 - draw_h:.2f} cm /Im0 Do Q".encode()
+        page_objects.append((content, "<< /XObject << /Im0 @IMG >> >>", [("@IMG", xobject)]))
+    return _write_pdf(page_objects), truths
+
+
+def tone_wav(seconds, sample_rate=16000, burst=3.0, gap=1.0, seed=3):
+    """Build a mono 16-bit WAV of noisy tone bursts separated by near-silence.
+
+    The bursts stand in for speech: they exercise voice-activity detection
+    and chunking without needing a recorded voice.
+
+    Returns:
+        (wav_bytes, number_of_bursts)
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    t = np.arange(total) / sample_rate
+    period = burst + gap
+    voiced = (t % period) < burst
+    frequency = 180 + 40 * np.sin(2 * np.pi * 0.5 * t)
+    signal = np.where(voiced, 6000 * np.sin(2 * np.pi * frequency * t), 0.0)
+    signal += rng.normal(0, 40, total)
+    samples = np.clip(signal, -32768, 32767).astype('<i2')
+
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return out.getvalue(), int(np.ceil(seconds / period))
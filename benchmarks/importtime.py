@@ -0,0 +1,127 @@
+"""Import-time profile and time-to-first-render for the Streamlit app.
+
+Every new Streamlit session script process pays for whatever app.py imports
+at the top level. This script measures that cost in fresh interpreters:
+
+  * import profile: `python -X importtime` for each heavy dependency and
+    backend module, reported as cumulative milliseconds
+  * first render: app.py run once through streamlit's AppTest with no
+    input, i.e. what a visitor waits for before the page appears, plus
+    which heavy modules that render pulled in
+
+    python benchmarks/importtime.py
+    python benchmarks/importtime.py --repeat 5 --target-ms 1000 --json importtime.json
+
+Exits with status 1 if the median first render is over --target-ms.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    'streamlit', 'cv2', 'numpy', 'PIL.Image', 'pytesseract', 'PyPDF2', 'speech_recognition',
+    'deep_translator', 'requests', 'imageio_ffmpeg', 'ocr_backend', 'speech', 'translation',
+]
+
+# Modules the first render should not need
+HEAVY = ['cv2', 'pytesseract', 'PyPDF2', 'speech_recognition', 'deep_translator', 'requests', 'ocr_backend', 'speech']
+
+# Median first render (streamlit import included) we hold app.py to
+TARGET_MS = 1000
+
+_RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+app.run()
+done = time.perf_counter()
+print(json.dumps({
+    'total_ms': (done - start) * 1000,
+    'script_ms': (done - imported) * 1000,
+    'errors': [str(e.value) for e in app.exception],
+    'loaded': [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+def import_profile(module):
+    """Return (cumulative_ms, [(self_ms, cumulative_ms, name), ...]) for one import."""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        return None, []
+    rows = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us) / 1000, int(cumulative_us) / 1000, name.rstrip()))
+    # The requested module is the last, outermost entry
+    return rows[-1][1] if rows else 0.0, rows
+
+
+def first_render(app_path):
+    """Render app.py once in a fresh interpreter and return the timings."""
+    process = subprocess.run(
+        [sys.executable, '-c', _RENDER_SCRIPT, app_path] + HEAVY,
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "render failed")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time profile and first render time for app.py.")
+    parser.add_argument('--app', default=os.path.join(ROOT, 'app.py'), help="Streamlit script (default: app.py)")
+    parser.add_argument('--repeat', type=int, default=3, help="First-render runs (default: 3)")
+    parser.add_argument('--top', type=int, default=5, help="Slowest nested imports to list per module (default: 5)")
+    parser.add_argument('--target-ms', type=float, default=TARGET_MS,
+                        help=f"Median first-render budget in ms (default: {TARGET_MS})")
+    parser.add_argument('--json', help="Also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = {'imports': {}, 'first_render': {}}
+    print(f"{'module':<22}{'cumulative':>12}  slowest nested imports")
+    for module in MODULES:
+        cumulative, rows = import_profile(module)
+        if cumulative is None:
+            print(f"{module:<22}{'missing':>12}")
+            continue
+        nested = sorted(rows[:-1], key=lambda row: row[0], reverse=True)[:args.top]
+        results['imports'][module] = cumulative
+        print(f"{module:<22}{cumulative:>10.0f}ms  " + ", ".join(f"{name.strip()} {ms:.0f}ms" for ms, _, name in nested))
+
+    renders = [first_render(args.app) for _ in range(args.repeat)]
+    total = statistics.median(r['total_ms'] for r in renders)
+    script = statistics.median(r['script_ms'] for r in renders)
+    loaded = renders[-1]['loaded']
+    results['first_render'] = {
+        'total_ms': total,
+        'script_ms': script,
+        'target_ms': args.target_ms,
+        'heavy_modules_loaded': loaded,
+        'errors': renders[-1]['errors'],
+    }
+    print(f"first render: {total:.0f}ms median ({script:.0f}ms in app.py), target {args.target_ms:.0f}ms")
+    print(f"heavy modules loaded on first render: {', '.join(loaded) or 'none'}")
+    for error in renders[-1]['errors']:
+        print(f"app error: {error}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 1 if total > args.target_ms else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,409 @@
+"""Offline benchmark suite for the OCR, PDF, speech, translation and search pipelines.
+
+Generates a deterministic synthetic corpus (see benchmarks/corpus.py), runs
+each pipeline stage in its own process and reports latency percentiles,
+throughput, peak RSS and character accuracy against ground truth.
+
+    python benchmarks/run.py                        # quick profile
+    python benchmarks/run.py --profile full --json results/$(git rev-parse --short HEAD).json
+    python benchmarks/run.py --stages pdf_text,speech
+    python benchmarks/compare.py old.json new.json  # diff two runs
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PROFILES = {
+    'quick': {
+        'image_langs': ['eng', 'deu'],
+        'image_widths': [640, 1240, 2480],
+        'photos': 4,
+        'text_pdf_pages': [1, 10, 100],
+        'scanned_pdf_pages': [1, 4],
+        'wav_seconds': [20, 120],
+        'translate_chars': 50_000,
+        'live_pages': 3,
+        'search_docs': 2_000,
+    },
+    'full': {
+        'image_langs': ['eng', 'deu', 'fra', 'spa'],
+        'image_widths': [640, 1240, 2480, 4960],
+        'photos': 8,
+        'text_pdf_pages': [1, 10, 100, 1000],
+        'scanned_pdf_pages': [1, 10, 100],
+        'wav_seconds': [60, 600, 3600],
+        'translate_chars': 500_000,
+        'live_pages': 6,
+        'search_docs': 20_000,
+    },
+}
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process and its children, in MB."""
+    import resource
+
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _timed_iter(iterable):
+    """Yield (item, seconds since the previous item) pairs."""
+    last = time.perf_counter()
+    for item in iterable:
+        now = time.perf_counter()
+        yield item, now - last
+        last = now
+
+
+def stage_ocr_image(profile):
+    from benchmarks.corpus import char_accuracy, multilingual_image_set
+    from ocr_backend import extract_text_from_image
+
+    samples = multilingual_image_set(profile['image_langs'], profile['image_widths'])
+    yield 'ready'
+    latencies, accuracies = [], []
+    for _, lang, image, truth in samples:
+        start = time.perf_counter()
+        text = extract_text_from_image(image, lang=lang, use_cache=False)
+        latencies.append(time.perf_counter() - start)
+        accuracies.append(char_accuracy(text, truth))
+    yield {'unit': 'image', 'latencies': latencies, 'accuracies': accuracies}
+
+
+def stage_ocr_photo(profile):
+    from benchmarks.corpus import char_accuracy, image_set
+    from ocr_backend import Preprocessor, extract_text_from_image
+
+    samples = image_set(profile['photos'])
+    preprocessor = Preprocessor()
+    yield 'ready'
+    latencies, accuracies = [], []
+    for _, image, truth in samples:
+        start = time.perf_counter()
+        text = extract_text_from_image(image, use_cache=False, preprocess=preprocessor)
+        latencies.append(time.perf_counter() - start)
+        accuracies.append(char_accuracy(text, truth))
+    yield {'unit': 'image', 'latencies': latencies, 'accuracies': accuracies}
+
+
+def stage_ocr_regions(profile, regions):
+    from benchmarks.corpus import char_accuracy, sparse_photo
+    from ocr_backend import extract_text_from_image
+
+    samples = [sparse_photo(seed=seed) for seed in range(profile['photos'])]
+    yield 'ready'
+    latencies, accuracies = [], []
+    for image, truth in samples:
+        start = time.perf_counter()
+        text = extract_text_from_image(image, use_cache=False, regions=regions)
+        latencies.append(time.perf_counter() - start)
+        accuracies.append(char_accuracy(text, truth))
+    yield {'unit': 'image', 'latencies': latencies, 'accuracies': accuracies}
+
+
+def _pdf_stage(pdf_bytes, truths):
+    from benchmarks.corpus import char_accuracy
+    from ocr_backend import iter_pdf_pages, ocr_cache
+
+    ocr_cache.clear()
+    latencies, pages = [], []
+    for page, seconds in _timed_iter(iter_pdf_pages(io.BytesIO(pdf_bytes))):
+        latencies.append(seconds)
+        pages.append(page)
+    # Score after timing: the edit distance is far slower than text extraction
+    accuracies = [char_accuracy(text, truths[page_num - 1]) for page_num, text in pages]
+    return {'unit': 'page', 'latencies': latencies, 'accuracies': accuracies}
+
+
+def stage_pdf_text(profile, pages):
+    from benchmarks.corpus import text_pdf
+
+    pdf_bytes, truths = text_pdf(pages)
+    yield 'ready'
+    yield _pdf_stage(pdf_bytes, truths)
+
+
+def stage_pdf_scanned(profile, pages):
+    from benchmarks.corpus import scanned_pdf
+
+    pdf_bytes, truths = scanned_pdf(pages)
+    yield 'ready'
+    yield _pdf_stage(pdf_bytes, truths)
+
+
+def stage_speech(profile, seconds):
+    import tempfile
+
+    from benchmarks.corpus import tone_wav
+    from speech import transcribe_file
+
+    wav_bytes, bursts = tone_wav(seconds)
+    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+        f.write(wav_bytes)
+        path = f.name
+    yield 'ready'
+    try:
+        # Offline stand-in recognizer: measures decoding, VAD and chunk scheduling
+        recognize = lambda audio, language: f"{len(audio.frame_data)}"
+        latencies = [s for _, s in _timed_iter(transcribe_file(path, recognizer=recognize))]
+    finally:
+        os.unlink(path)
+    yield {'unit': 'chunk', 'latencies': latencies, 'audio_seconds': seconds,
+           'expected_bursts': bursts, 'realtime_factor': seconds / max(sum(latencies), 1e-9)}
+
+
+def stage_translate(profile):
+    from benchmarks.corpus import SENTENCES
+    from translation import StubBackend, TranslationEngine
+
+    text = ""
+    i = 0
+    while len(text) < profile['translate_chars']:
+        text += SENTENCES[i % len(SENTENCES)] + (" " if i % 5 else "\n\n")
+        i += 1
+    engine = TranslationEngine(StubBackend(delay=0.02), max_workers=8)
+    yield 'ready'
+    latencies = []
+    for _ in range(2):
+        # Second pass measures the chunk cache
+        start = time.perf_counter()
+        engine.translate(text, 'fr')
+        latencies.append(time.perf_counter() - start)
+    yield {'unit': 'document', 'latencies': latencies, 'chars': len(text),
+           'cold_seconds': latencies[0], 'warm_seconds': latencies[1]}
+
+
+def stage_live_video(profile):
+    import tempfile
+
+    import cv2
+
+    from benchmarks.corpus import char_accuracy, document_video
+    from live_ocr import LiveOCR
+
+    with tempfile.NamedTemporaryFile(suffix='.avi', delete=False) as f:
+        path = f.name
+    truths = document_video(path, pages=profile['live_pages'])
+    yield 'ready'
+    latencies, texts = [], []
+    try:
+        capture = cv2.VideoCapture(path)
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        with LiveOCR() as live:
+            start = time.perf_counter()
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                begin = time.perf_counter()
+                result = live.feed(frame)
+                latencies.append(time.perf_counter() - begin)
+                if result is not None:
+                    texts.append(result[1])
+                # Deliver frames at the video's rate, like a camera would
+                delay = start + live.frames / fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            result = live.flush()
+            if result is not None:
+                texts.append(result[1])
+            stats = live.stats()
+        capture.release()
+    finally:
+        os.unlink(path)
+    # Each page scored against the closest text emitted for the whole video
+    accuracies = [max((char_accuracy(text, truth) for text in texts), default=0.0) for truth in truths]
+    yield {'unit': 'frame', 'latencies': latencies, 'accuracies': accuracies, 'pages': len(truths),
+           'ocr_runs': stats['ocr_runs'], 'emitted': stats['emitted']}
+
+
+def stage_search_index(profile):
+    import hashlib
+    import tempfile
+
+    from benchmarks.corpus import SENTENCES
+    from search_index import SearchIndex
+
+    docs = profile['search_docs']
+    with tempfile.TemporaryDirectory() as directory:
+        index = SearchIndex(os.path.join(directory, 'index.db'))
+        yield 'ready'
+        start = time.perf_counter()
+        for doc in range(docs):
+            # Three pages of 20 lines each, plus a reference that occurs in this document only
+            pages = [f"Reference DOC-{doc:06d}\n" + "\n".join(SENTENCES[(doc * 7 + page * 20 + i) % len(SENTENCES)]
+                                                          for i in range(20)) for page in range(3)]
+            index.add(hashlib.sha256(str(doc).encode()).hexdigest(), f"doc{doc}.pdf", pages)
+        index.flush()
+        ingest_seconds = time.perf_counter() - start
+        stats = index.stats()
+        queries = [f'"DOC-{doc:06d}"' for doc in range(0, docs, max(1, docs // 20))]
+        queries += ['invoice', '"quick brown fox"', 'invoice march "1,284.50 EUR"', 'nonexistentword']
+        latencies = []
+        for query in queries:
+            begin = time.perf_counter()
+            index.search(query, limit=20)
+            latencies.append(time.perf_counter() - begin)
+        index.close()
+    yield {'unit': 'query', 'latencies': latencies, 'documents': docs, 'ingest_seconds': ingest_seconds,
+           'pages_per_s': 3 * docs / ingest_seconds, 'segments': stats['segments'],
+           'postings_bytes': stats['postings_bytes']}
+
+
+def build_stages(profile):
+    """Return an ordered list of (name, function, extra_args)."""
+    stages = [
+        ('ocr_image', stage_ocr_image, ()),
+        ('ocr_photo_preprocessed', stage_ocr_photo, ()),
+        ('ocr_sparse_full', stage_ocr_regions, (False,)),
+        ('ocr_sparse_regions', stage_ocr_regions, (True,)),
+    ]
+    stages += [(f'pdf_text_{n}p', stage_pdf_text, (n,)) for n in profile['text_pdf_pages']]
+    stages += [(f'pdf_scanned_{n}p', stage_pdf_scanned, (n,)) for n in profile['scanned_pdf_pages']]
+    stages += [(f'speech_{s}s', stage_speech, (s,)) for s in profile['wav_seconds']]
+    stages.append(('translate', stage_translate, ()))
+    stages.append(('live_video', stage_live_video, ()))
+    stages.append(('search_index', stage_search_index, ()))
+    return stages
+
+
+def _run_in_child(function, profile, args, results):
+    try:
+        steps = function(profile, *args)
+        next(steps)
+        baseline = _peak_rss_mb()
+        start = time.perf_counter()
+        result = next(steps)
+        result['wall_seconds'] = time.perf_counter() - start
+        result['baseline_rss_mb'] = baseline
+        result['peak_rss_mb'] = _peak_rss_mb()
+        results.put(result)
+    except Exception as e:
+        results.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def run_stage(function, profile, args):
+    """Run one stage in a fresh process so peak RSS is attributable to it."""
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    process = ctx.Process(target=_run_in_child, args=(function, profile, args, results))
+    process.start()
+    while True:
+        # Polled, so a child killed by a crash or the OOM killer fails the stage instead of hanging the run
+        exited = not process.is_alive()
+        try:
+            result = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if exited:
+                result = {'error': f"Stage process exited with code {process.exitcode} without a result"}
+                break
+    process.join()
+    return result
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(result):
+    if 'error' in result:
+        return result
+    latencies = result.pop('latencies')
+    accuracies = result.pop('accuracies', None)
+    summary = {
+        'items': len(latencies),
+        'p50_ms': _ms(percentile(latencies, 50)),
+        'p90_ms': _ms(percentile(latencies, 90)),
+        'p99_ms': _ms(percentile(latencies, 99)),
+        # Measured time only; scoring against ground truth is excluded
+        'throughput_per_s': len(latencies) / sum(latencies) if sum(latencies) else None,
+    }
+    if accuracies:
+        summary['char_accuracy'] = statistics.fmean(accuracies)
+    summary.update(result)
+    return summary
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline OCR/PDF/speech benchmark suite.")
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='quick', help="Corpus size (default: quick)")
+    parser.add_argument('--stages', help="Comma-separated stage name prefixes to run (default: all)")
+    parser.add_argument('--json', help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    profile = PROFILES[args.profile]
+    prefixes = args.stages.split(',') if args.stages else None
+    results = {}
+    for name, function, extra in build_stages(profile):
+        if prefixes and not any(name.startswith(prefix) for prefix in prefixes):
+            continue
+        result = summarize(run_stage(function, profile, extra))
+        results[name] = result
+        _print_row(name, result)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'profile': args.profile,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'stages': results,
+    }
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return report
+
+
+def _print_row(name, result):
+    if 'error' in result:
+        print(f"{name:<26} ERROR {result['error']}")
+        return
+    if not result['items']:
+        print(f"{name:<26} no items")
+        return
+    accuracy = result.get('char_accuracy')
+    print(
+        f"{name:<26} n={result['items']:<5} p50={result['p50_ms']:>9.1f}ms p99={result['p99_ms']:>9.1f}ms "
+        f"{result['throughput_per_s']:>9.1f}/s rss={result['peak_rss_mb']:>7.1f}MB"
+        + (f" acc={accuracy:.3f}" if accuracy is not None else "")
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,507 @@
+"""Background jobs for long-running extraction work.
+
+Work is submitted to one process-wide JobQueue and runs on a bounded
+thread pool instead of inside the Streamlit script run, so a long video
+doesn't block the page or hold a server thread. Each job gets an ID and
+exposes progress counters and partial results that the UI can poll.
+
+Jobs live in this module, not in a Streamlit session, so a rerun or a
+browser refresh can re-attach to a job by its ID or by its input key.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+from uploads import SpooledUpload
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+CANCELLED = 'cancelled'
+
+
+class JobCancelled(Exception):
+    """Raised inside a work function when its job has been cancelled."""
+
+
+class Job:
+    """One unit of background work, its progress and its outcome.
+
+    The work function receives the job as its first argument and calls
+    update() to report progress and partial results. update() is also where
+    cancellation takes effect.
+
+    Attributes:
+        id: Job ID
+        label: Short description for the UI
+        key: Input key used to find the job again (or None)
+        status: QUEUED, RUNNING, DONE, ERROR or CANCELLED
+        done, total: Progress counters; total is None when unknown
+        result: Return value of the work function once DONE
+        error: The exception raised by the work function once ERROR
+    """
+
+    def __init__(self, job_id, label='', key=None):
+        self.id = job_id
+        self.label = label
+        self.key = key
+        self.status = QUEUED
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._partial = []
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._future = None
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def cancelled(self):
+        """True once cancel() was called, even while the work is still winding down."""
+        return self._cancel.is_set()
+
+    @property
+    def progress(self):
+        """Fraction complete, or None when the total is unknown."""
+        if not self.total:
+            return None
+        return min(1.0, self.done / self.total)
+
+    @property
+    def elapsed(self):
+        """Seconds spent running so far (or in total, once finished)."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def update(self, done=None, total=None, partial=None):
+        """Report progress from inside the work function.
+
+        Args:
+            done: Units of work finished so far
+            total: Total units of work, if known
+            partial: A partial result to append (e.g. one page of text)
+
+        Raises:
+            JobCancelled: if the job has been cancelled
+        """
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+        with self._lock:
+            if done is not None:
+                self.done = done
+            if total is not None:
+                self.total = total
+            if partial is not None:
+                self._partial.append(partial)
+
+    @property
+    def partial_count(self):
+        return len(self._partial)
+
+    def partial_results(self, start=0, stop=None):
+        """Return a copy of the partial results reported so far, or a slice of them."""
+        with self._lock:
+            return self._partial[start:stop]
+
+    def cancel(self):
+        """Ask the job to stop. Queued jobs never start; running ones stop at their next update()."""
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self._finish(CANCELLED)
+
+    def _finish(self, status, result=None, error=None):
+        with self._lock:
+            self.result = result
+            self.error = error
+            self.finished = time.time()
+            self.status = status
+
+
+class JobQueue:
+    """Run work functions on a shared, bounded pool and keep track of them.
+
+    Submitting with a key that already has a job returns that job's ID, so
+    repeated reruns with the same input never start duplicate work. Finished
+    jobs are kept (oldest dropped first) until keep_finished is exceeded.
+
+    Args:
+        max_workers: Jobs run at the same time
+        max_pending: Queued plus running jobs allowed before submit() refuses
+        keep_finished: Finished jobs to remember for re-attaching
+    """
+
+    def __init__(self, max_workers=2, max_pending=32, keep_finished=64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts):
+        """Build a job key from input bytes and parameters."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part if isinstance(part, (bytes, bytearray, memoryview)) else str(part).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def submit(self, fn, *args, label='', key=None, replace=False, **kwargs):
+        """Queue fn(job, *args, **kwargs) and return the job ID.
+
+        Args:
+            fn: Work function; gets the Job as its first argument
+            label: Short description for the UI
+            key: Input key; an existing job with this key is reused
+            replace: Start over if the existing job for key has finished
+
+        Raises:
+            RuntimeError: if max_pending jobs are already queued or running
+        """
+        with self._lock:
+            existing = self._jobs.get(self._keys.get(key)) if key is not None else None
+            if existing is not None and (existing.active or not replace):
+                return existing.id
+            if sum(1 for job in self._jobs.values() if job.active) >= self.max_pending:
+                raise RuntimeError(f"Too many jobs in progress ({self.max_pending}). Please try again shortly.")
+            job = Job(uuid.uuid4().hex[:12], label, key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._keys[key] = job.id
+            self._evict()
+        job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        """Return the Job for an ID, or None if unknown or forgotten."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def find(self, key):
+        """Return the Job last submitted with this key, or None."""
+        with self._lock:
+            return self._jobs.get(self._keys.get(key))
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def stats(self):
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, ERROR, CANCELLED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        counts['workers'] = self.max_workers
+        return counts
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job, fn, args, kwargs):
+        if job._cancel.is_set():
+            job._finish(CANCELLED)
+            return
+        job.started = time.time()
+        job.status = RUNNING
+        try:
+            with metrics.timer(f'job_{getattr(fn, "__name__", "work")}'):
+                result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            job._finish(CANCELLED)
+        except Exception as e:
+            job._finish(ERROR, error=e)
+        else:
+            job._finish(DONE, result=result)
+        finally:
+            with self._lock:
+                self._evict()
+
+    def _evict(self):
+        # Caller holds the lock. Only finished jobs are dropped, oldest first.
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            job = self._jobs.pop(job_id)
+            if job.key is not None and self._keys.get(job.key) == job_id:
+                del self._keys[job.key]
+
+
+# Shared queue for the app. Work functions below import their backends
+# lazily so importing this module stays cheap.
+job_queue = JobQueue(
+    max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('JOB_MAX_PENDING', 32)),
+    keep_finished=int(os.environ.get('JOB_KEEP_FINISHED', 64)),
+)
+
+# Live camera sessions run until stopped, so they get threads of their own
+# instead of holding job_queue's workers. Sessions past the limit are refused,
+# not queued behind ones that never end.
+LIVE_OCR_MAX_SESSIONS = int(os.environ.get('LIVE_OCR_MAX_SESSIONS', 2))
+live_queue = JobQueue(
+    max_workers=LIVE_OCR_MAX_SESSIONS,
+    max_pending=LIVE_OCR_MAX_SESSIONS,
+    keep_finished=int(os.environ.get('JOB_KEEP_FINISHED', 64)),
+)
+
+
+def ocr_image_job(job, data, lang='eng', preprocess=None, regions=False, name='image'):
+    """OCR one encoded image.
+
+    With lang='auto' the language detection (see ocr_backend.detect_language)
+    is reported as the partial result. name is what search hits show.
+    """
+    from ocr_backend import AUTO_LANG, extract_text_auto, extract_text_from_image
+    from search_index import index_document
+
+    job.update(0, 1)
+    if lang == AUTO_LANG:
+        text, detection = extract_text_auto(data, preprocess=preprocess, regions=regions)
+        job.update(1, 1, partial=detection)
+    else:
+        text = extract_text_from_image(data, lang=lang, preprocess=preprocess, regions=regions)
+        job.update(1, 1)
+    index_document(hashlib.sha256(data).hexdigest(), name, [text or ""])
+    return text or ""
+
+
+def pdf_job(job, upload, lang='eng', name=None):
+    """Extract a PDF page by page; each page is reported as a partial result.
+
+    The upload (bytes or a file object) is spooled to disk first, so the
+    PDF is parsed from a file rather than from another copy in memory.
+    name is what search hits show (default: the upload's name).
+
+    Returns:
+        The list of page texts (the same objects as the partial results);
+        format_pages() joins them for download
+    """
+    from ocr_backend import count_pdf_pages, iter_pdf_pages
+    from search_index import index_document
+
+    with SpooledUpload(upload, suffix='.pdf') as spooled, spooled.open() as pdf_file:
+        try:
+            total = count_pdf_pages(pdf_file)
+        except Exception:
+            # iter_pdf_pages raises a proper error for unreadable files
+            total = None
+        job.update(0, total)
+        pdf_file.seek(0)
+        with closing(iter_pdf_pages(pdf_file, lang=lang)) as pages:
+            for page_num, page_text in pages:
+                job.update(page_num, partial=page_text)
+    if not job.cancelled:
+        index_document(spooled.sha256, name or getattr(upload, 'name', None) or "document.pdf",
+                        job.partial_results())
+    # Pages are kept once, as the partial results
+    return job.partial_results()
+
+
+def format_pages(pages, first_page=1):
+    """Join page texts in the same layout as ocr_backend.extract_text_from_pdf."""
+    return "".join(f"\n--- Page {page_num} ---\n{text}" for page_num, text in enumerate(pages, start=first_page))
+
+
+def ocr_batch_job(job, uploads, lang='eng', preprocess=None, regions=False, workers=None):
+    """OCR many images, or zip/tar archives of them, in the shared OCR process pool.
+
+    Each file's record (see batch_ocr.process_input, plus 'index', its
+    position in upload order) is reported as a partial result as soon as
+    it is done. The total is known once every archive has been read.
+
+    Args:
+        uploads: File objects with a name, such as Streamlit's UploadedFile
+        workers: Files this batch may keep busy in the pool at once
+            (default: ocr_backend.OCR_PROCESS_WORKERS)
+
+    Returns:
+        The list of records, in completion order
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait
+    from concurrent.futures.process import BrokenProcessPool
+
+    from batch_ocr import iter_file_object, process_input
+    from ocr_backend import OCR_PROCESS_WORKERS, discard_process_pool, process_pool
+    from search_index import shared_index
+
+    workers = workers or OCR_PROCESS_WORKERS
+    inputs = (item for upload in uploads for item in iter_file_object(upload.name, _own_handle(upload)))
+    indexes = {}
+    job.update(0)
+
+    search = shared_index()
+
+    def collect():
+        finished, _ = wait(indexes, return_when=FIRST_COMPLETED)
+        for future in finished:
+            record = future.result()
+            record['index'] = indexes.pop(future)
+            if search is not None and 'error' not in record:
+                search.add(record['sha256'], record['source'], record['pages'])
+            job.update(job.done + 1, partial=record)
+
+    # PDFs inside a batch are OCR'd page by page in their worker (process_input),
+    # so a batch never uses more than the pool's processes
+    executor = process_pool()
+    try:
+        submitted = 0
+        for item in inputs:
+            indexes[executor.submit(process_input, *item, lang, preprocess, regions)] = submitted
+            submitted += 1
+            # Keep every worker busy without reading whole archives into memory
+            while len(indexes) >= 2 * workers:
+                collect()
+        job.update(total=submitted)
+        while indexes:
+            collect()
+    except BrokenProcessPool:
+        discard_process_pool(executor)
+        raise
+    finally:
+        # The pool is shared: only this batch's queued files are cancelled
+        for future in indexes:
+            future.cancel()
+        if search is not None:
+            search.flush()
+    return job.partial_results()
+
+
+def _own_handle(upload):
+    # Read Streamlit's in-memory upload through a handle of our own: the
+    # buffer is shared, not copied, and the page keeps its read position
+    if isinstance(upload, io.BytesIO):
+        return io.BytesIO(upload.getvalue())
+    return upload
+
+
+def _record_text(record):
+    pages = record.get('pages') or []
+    if record['kind'] == 'image':
+        return "".join(pages)
+    return format_pages(pages)
+
+
+def format_batch(records):
+    """Join batch records into one text with a section per file, in upload order."""
+    parts = []
+    for record in sorted(records, key=lambda r: r['index']):
+        parts.append(f"\n===== {record['source']} =====\n")
+        parts.append(f"[error] {record['error']}\n" if record.get('error') else _record_text(record))
+    return "".join(parts)
+
+
+def batch_jsonl(records):
+    """Return batch records as JSON lines, in upload order."""
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in sorted(records, key=lambda r: r['index']))
+
+
+def batch_zip(records):
+    """Return a zip with one .txt per file plus the records as manifest.jsonl."""
+    import zipfile
+
+    from batch_ocr import MANIFEST_NAME, text_file_name
+
+    buffer = io.BytesIO()
+    names = set()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for record in sorted(records, key=lambda r: r['index']):
+            if record.get('error'):
+                continue
+            name = text_file_name(record['source'])
+            if name in names:
+                # The same file name uploaded twice
+                name = f"{record['index']}_{name}"
+            names.add(name)
+            archive.writestr(name, _record_text(record))
+        archive.writestr(MANIFEST_NAME, batch_jsonl(records))
+    return buffer.getvalue()
+
+
+def live_ocr_job(job, source=0, lang='eng', preprocess=None):
+    """OCR a camera, or a video file standing in for one, until cancelled.
+
+    Every change of the text in view is reported as a partial result, a
+    dict with frame, seconds and text. Cancelling is how the stream ends;
+    the text read until then stays in partial_results(). Submit it to
+    live_queue, not job_queue, which it would hold a worker of until stopped.
+    """
+    from live_ocr import LiveOCR, iter_live_text
+
+    live = LiveOCR(lang=lang, preprocess=preprocess)
+    for index, seconds, text in iter_live_text(source, live=live, stop=lambda: job.cancelled):
+        job.update(live.emitted, partial={'frame': index, 'seconds': round(seconds, 2), 'text': text})
+    return job.partial_results()
+
+
+def transcribe_job(job, upload, suffix, language='en-US', recognizer='google', media=False):
+    """Transcribe an audio file, or the soundtrack of a video with media=True.
+
+    The upload (bytes or a file object) is spooled to a temporary file,
+    which the decoders stream from. Each recognized chunk is reported as a
+    partial result.
+
+    Raises:
+        speech_recognition.UnknownValueError: if no speech was recognized
+    """
+    import speech_recognition as sr
+    from speech import transcribe_file, transcribe_media
+
+    transcribe = transcribe_media if media else transcribe_file
+    parts = []
+    with SpooledUpload(upload, suffix=suffix) as spooled:
+        chunks = transcribe(spooled.path, language=language, recognizer=recognizer)
+        with closing(chunks):
+            for index, text in chunks:
+                if text.strip():
+                    parts.append(text.strip())
+                job.update(index + 1, partial=text.strip() or None)
+    if not parts:
+        raise sr.UnknownValueError()
+    return " ".join(parts)
+
+
+def install_languages_job(job, langs):
+    """Install Tesseract language models from the mirror and warm them up.
+
+    Returns:
+        {lang: seconds the warm-up took}
+    """
+    from ocr_backend import tessdata_store
+
+    job.update(0, len(langs))
+    warmed = {}
+    for done, lang in enumerate(langs, 1):
+        tessdata_store.install(lang)
+        warmed[lang] = tessdata_store.warm_up(lang)
+        job.update(done)
+    return warmed
+
+
+def translate_job(job, text, target):
+    """Translate text with the shared translation engine."""
+    from translation import translate_text
+
+    return translate_text(text, target)
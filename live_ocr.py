@@ -0,0 +1,253 @@
+"""Continuous OCR from a webcam or a recorded video, with change detection.
+
+Examples:
+    python live_ocr.py                          # default webcam
+    python live_ocr.py --source 1 --lang deu    # second camera
+    python live_ocr.py --source scan.mp4        # a recording stands in for the camera
+
+Each frame is shrunk to a small grayscale thumbnail. The thumbnail is
+compared with the previous frame (is the picture holding still?) and with
+the last frame that was OCR'd (is this a new scene?). Tesseract runs only
+for a new scene that has held still for a few frames, e.g. a page that
+was put down once the hand is gone. OCR runs on a background thread, so
+the frame loop keeps its rate on one core. A result is emitted only when
+the recognized text differs from the previous one.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+
+class ChangeDetector:
+    """Decide for each frame whether it is worth an OCR pass.
+
+    Args:
+        thumb_size: (width, height) of the thumbnail frames are compared at
+        motion_threshold: Mean absolute difference (0-255) from the
+            previous thumbnail below which a frame counts as still
+        change_threshold: Mean absolute difference from the last OCR'd
+            thumbnail above which the scene counts as new. A frame that
+            moved this much since the last OCR also makes the scene new:
+            swapping two similar-looking pages changes little once the
+            view is still again, but always moves a lot on the way.
+        stable_frames: Consecutive still frames needed before OCR
+    """
+
+    def __init__(self, thumb_size=(64, 48), motion_threshold=3.0, change_threshold=6.0, stable_frames=5):
+        self.thumb_size = thumb_size
+        self.motion_threshold = motion_threshold
+        self.change_threshold = change_threshold
+        self.stable_frames = stable_frames
+        self.still = 0
+        self.motion = 0.0
+        self._previous = None
+        self._processed = None
+        self._disturbed = False
+
+    def update(self, frame):
+        """Take the next frame; return True if it is still and shows a new scene."""
+        thumb = self._thumbnail(frame)
+        self.motion = 255.0 if self._previous is None else cv2.mean(cv2.absdiff(thumb, self._previous))[0]
+        self._previous = thumb
+        self.still = self.still + 1 if self.motion < self.motion_threshold else 0
+        if self.motion > self.change_threshold:
+            self._disturbed = True
+        if self.still < self.stable_frames:
+            return False
+        return (self._processed is None or self._disturbed
+                or cv2.mean(cv2.absdiff(thumb, self._processed))[0] > self.change_threshold)
+
+    def mark_processed(self):
+        """Remember the current frame as the last one sent to OCR."""
+        self._processed = self._previous
+        self._disturbed = False
+
+    def _thumbnail(self, frame):
+        # Shrink first: converting and blurring the thumbnail is nearly free
+        small = cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGRA2GRAY if small.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+        # Blur away sensor noise so it doesn't count as motion
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+
+class LiveOCR:
+    """Feed frames in; get text out only when it changes.
+
+    OCR runs on one background thread. While it is busy, frames are still
+    checked for changes but not queued, so the caller's frame loop never
+    waits on Tesseract.
+
+    Args:
+        lang: Language code for OCR (default: 'eng')
+        config: Extra Tesseract config flags (default: '')
+        preprocess: Preprocessor, True for the default one, or None to skip
+        detector: ChangeDetector (default: a new one with default settings)
+        ocr: Callable(frame) -> text, replacing Tesseract (e.g. in tests)
+    """
+
+    def __init__(self, lang='eng', config='', preprocess=None, detector=None, ocr=None):
+        self.lang = lang
+        self.config = config
+        self.preprocess = preprocess
+        self.detector = detector or ChangeDetector()
+        self._ocr = ocr or self._tesseract
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-ocr")
+        self._pending = None
+        self._last = None
+        self.frames = 0
+        self.ocr_runs = 0
+        self.emitted = 0
+        self.frame_seconds = 0.0
+        self.max_frame_seconds = 0.0
+
+    def feed(self, frame):
+        """Process one frame.
+
+        Returns:
+            (frame_index, text) if OCR of an earlier frame finished with new
+            text, else None. frame_index is the frame the text came from.
+        """
+        start = time.perf_counter()
+        result = self._collect(wait=False)
+        if self.detector.update(frame) and self._pending is None:
+            self.detector.mark_processed()
+            self.ocr_runs += 1
+            self._pending = (self.frames, self._executor.submit(self._ocr, frame))
+        self.frames += 1
+        seconds = time.perf_counter() - start
+        self.frame_seconds += seconds
+        self.max_frame_seconds = max(self.max_frame_seconds, seconds)
+        return result
+
+    def flush(self):
+        """Wait for OCR in progress; return its (frame_index, text) if the text is new."""
+        return self._collect(wait=True)
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'ocr_runs': self.ocr_runs,
+            'emitted': self.emitted,
+            'mean_frame_ms': 1000 * self.frame_seconds / self.frames if self.frames else 0.0,
+            'max_frame_ms': 1000 * self.max_frame_seconds,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _collect(self, wait):
+        if self._pending is None:
+            return None
+        index, future = self._pending
+        if not wait and not future.done():
+            return None
+        self._pending = None
+        text = (future.result() or "").strip()
+        # Compare ignoring layout whitespace, which jitters between frames
+        normalized = " ".join(text.split())
+        if normalized == self._last:
+            return None
+        self._last = normalized
+        self.emitted += 1
+        return index, text
+
+    def _tesseract(self, frame):
+        from ocr_backend import extract_text_from_image
+
+        # Camera frames never repeat exactly, so caching them only evicts useful entries
+        return extract_text_from_image(frame, lang=self.lang, config=self.config,
+                                       use_cache=False, preprocess=self.preprocess)
+
+
+def iter_live_text(source=0, lang='eng', config='', preprocess=None, realtime=True, max_frames=None,
+                   stop=None, detector=None, ocr=None, live=None):
+    """Yield text from a camera or video file whenever it changes.
+
+    Args:
+        source: Camera index, or path to a video file standing in for one
+        realtime: For video files, deliver frames at the file's frame rate
+            like a camera would; False reads them as fast as possible
+        max_frames: Stop after this many frames (default: until the
+            stream ends or the caller stops iterating)
+        stop: Callable checked before every frame; return True to end
+            the stream (e.g. from another thread)
+        detector, ocr: See LiveOCR
+        live: LiveOCR to use, e.g. to read its stats() afterwards
+
+    Yields:
+        (frame_index, seconds, text) where seconds is the frame's position
+        in the video, or the time since the camera opened
+    """
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise Exception(f"Could not open video source {source!r}. Make sure it's connected and not used by another app.")
+    is_file = isinstance(source, str)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    live = live or LiveOCR(lang=lang, config=config, preprocess=preprocess, detector=detector, ocr=ocr)
+
+    def position(index):
+        return index / fps if is_file else time.perf_counter() - opened
+
+    opened = time.perf_counter()
+    try:
+        index = 0
+        while (max_frames is None or index < max_frames) and not (stop and stop()):
+            ok, frame = capture.read()
+            if not ok:
+                break
+            result = live.feed(frame)
+            if result is not None:
+                yield result[0], position(result[0]), result[1]
+            index += 1
+            if is_file and realtime:
+                delay = opened + index / fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        result = live.flush()
+        if result is not None:
+            yield result[0], position(result[0]), result[1]
+    finally:
+        capture.release()
+        live.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Continuous OCR from a webcam or a video file.")
+    parser.add_argument('--source', default='0', help="Camera index or video file (default: 0)")
+    parser.add_argument('--lang', default='eng', help="Tesseract language code (default: eng)")
+    parser.add_argument('--preprocess', action='store_true', help="Clean up frames before OCR")
+    parser.add_argument('--fast', action='store_true', help="Read video files as fast as possible, not in real time")
+    parser.add_argument('--max-frames', type=int, default=None, help="Stop after this many frames")
+    parser.add_argument('--stable-frames', type=int, default=5, help="Still frames needed before OCR (default: 5)")
+    args = parser.parse_args(argv)
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    live = LiveOCR(lang=args.lang, preprocess=args.preprocess or None,
+                   detector=ChangeDetector(stable_frames=args.stable_frames))
+    try:
+        for index, seconds, text in iter_live_text(source, realtime=not args.fast, max_frames=args.max_frames, live=live):
+            print(f"--- frame {index} ({seconds:.1f}s) ---\n{text}\n", flush=True)
+    except KeyboardInterrupt:
+        pass
+    stats = live.stats()
+    print(
+        f"{stats['frames']} frames, {stats['ocr_runs']} OCR runs, {stats['emitted']} results; "
+        f"{stats['mean_frame_ms']:.2f} ms per frame (max {stats['max_frame_ms']:.2f} ms)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""Per-stage timers and counters for the extraction pipeline.
+
+Metrics are off by default. Set METRICS_ENABLED=1 (or call
+metrics.enable()) to turn them on. While they are off, timer() returns a
+shared no-op context manager and inc()/observe() return after a single
+flag check, so instrumented code costs next to nothing.
+
+    from metrics import metrics
+
+    with metrics.timer('tesseract'):
+        text = run_ocr(pixels)
+    metrics.inc('chars_out_total', len(text), stage='ocr')
+
+render() returns the Prometheus text exposition format; the HTTP API
+serves it at /metrics. Set METRICS_FILE to also write it to a file every
+METRICS_FILE_INTERVAL seconds, for node_exporter's textfile collector.
+
+Values are per process. Work done inside process pools (scanned PDF
+pages, batch_ocr workers) is not counted.
+"""
+import bisect
+import os
+import tempfile
+import threading
+import time
+
+PREFIX = 'text_extractor'
+
+# Upper bounds in seconds, from a cached lookup up to a long transcription
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    'stage_seconds': "Time spent in each pipeline stage",
+    'errors_total': "Errors by stage and exception type",
+    'bytes_in_total': "Input bytes by kind",
+    'pages_total': "PDF pages by how their text was obtained",
+    'chars_out_total': "Characters of text produced, by stage",
+    'cache_lookups_total': "OCR cache lookups by result",
+    'audio_seconds_total': "Seconds of audio sent to speech recognition",
+}
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe('stage_seconds', time.perf_counter() - self.start, stage=self.stage)
+        if exc_type is not None:
+            self.metrics.inc('errors_total', stage=self.stage, type=exc_type.__name__)
+        return False
+
+
+class Metrics:
+    """Thread-safe counters and histograms with Prometheus text output.
+
+    Args:
+        enabled: Record anything at all (default: False)
+        prefix: Prepended to every metric name
+        buckets: Histogram bucket upper bounds, in seconds
+    """
+
+    def __init__(self, enabled=False, prefix=PREFIX, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._writer = None
+
+    def timer(self, stage):
+        """Context manager timing a stage; exceptions are counted in errors_total."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one value (usually seconds) in a histogram."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (last one is +Inf), then sum and count
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {full} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{full}{_labels(labels)} {_number(value)}")
+        for name in sorted({name for name, _ in histograms}):
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {full} histogram")
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    lines.append(f"{full}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{full}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{full}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_textfile(self, path):
+        """Write render() to path atomically."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def enable(self, textfile=None, interval=15.0):
+        """Start recording; with textfile, also write it every interval seconds."""
+        self.enabled = True
+        if textfile and self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, args=(textfile, interval),
+                                            name="metrics-writer", daemon=True)
+            self._writer.start()
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _write_loop(self, path, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.write_textfile(path)
+            except OSError:
+                # Keep collecting; the next write may succeed
+                pass
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Shared instance used across the pipeline
+metrics = Metrics()
+if os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes', 'on'):
+    metrics.enable(textfile=os.environ.get('METRICS_FILE') or None,
+                   interval=float(os.environ.get('METRICS_FILE_INTERVAL', 15)))
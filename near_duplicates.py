@@ -0,0 +1,309 @@
+"""Perceptual hashes and a near-duplicate index for reusing OCR results.
+
+A page photographed twice, or re-uploaded after recompression, hashes
+differently byte for byte, so the content-addressed OCR cache misses.
+Its difference hash (dHash) barely moves, provided the hash is taken
+over the page content rather than the whole frame:
+
+    hashes = image_hashes(pixels)
+    key = near_duplicate_index.find(hashes, domain, accept=same_page)  # None if nothing close
+    ...                                                                 # reuse the result under key
+    near_duplicate_index.add(hashes, cache_key, domain)
+
+image_hashes() crops to the ink's bounding box, which takes out
+differences in framing, then returns two dHashes. The 64-bit one is
+looked up with multi-index hashing. It is split into four 16-bit chunks,
+and two hashes within distance r agree to within r // 4 bits on at least
+one chunk (pigeonhole). Each chunk has a sorted table, so a lookup is a
+few binary searches plus an exact distance check on the handful of
+candidates, which stays well under a millisecond with millions of
+entries. The 256-bit hash then verifies the match: pages that share a
+layout can have close 64-bit hashes, but their 256-bit hashes are far
+apart.
+
+Neither hash sees small differences: two invoices from one template that
+differ only in the number and total hash the same. A match is therefore
+only a candidate. same_content() (through find's accept callback, here
+same_page) then compares the candidates' ink maps with this image's
+pixel by pixel, and any cluster of ink found on one page but not the
+other rules the match out. Even so, a changed comma in small print can
+get lost in a re-capture's noise, which is why reuse is opt-in (see
+ocr_backend.near_duplicate_index).
+"""
+import base64
+import threading
+import zlib
+from itertools import combinations
+
+import cv2
+import numpy as np
+
+# Longest side of the thumbnail the ink box is found on
+HASH_MAX_SIDE = 512
+
+CHUNKS = 4
+CHUNK_BITS = 16
+
+# Entries added since the last rebuild are scanned linearly; past this many, the sorted tables are rebuilt
+TAIL_SIZE = 4096
+
+# Width the page content is scaled to for same_content
+INK_MAP_WIDTH = 1024
+
+
+def image_hashes(pixels):
+    """Return (coarse, fine) difference hashes of the page content in an image.
+
+    Args:
+        pixels: Grayscale, BGR or BGRA image as a NumPy array
+
+    Returns:
+        (coarse, fine): a 64-bit int and 32 bytes (256 bits)
+    """
+    small = pixels
+    scale = 2 * HASH_MAX_SIDE / max(pixels.shape[:2])
+    if scale < 1:
+        # Interpolating is cheap; INTER_AREA over a whole 12 MP frame would cost more than the rest
+        small = cv2.resize(pixels, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+    if max(small.shape[:2]) > HASH_MAX_SIDE:
+        small = cv2.resize(small, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGRA2GRAY if small.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+
+    _, ink = cv2.threshold(cv2.GaussianBlur(small, (3, 3), 0), 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    x, y, w, h = cv2.boundingRect(ink)
+    if w > 1 and h > 1:
+        small = small[y:y + h, x:x + w]
+    coarse = np.packbits(_dhash_bits(small, 8)).view('>u8')[0]
+    return int(coarse), np.packbits(_dhash_bits(small, 16)).tobytes()
+
+
+def ink_map(pixels):
+    """Return the page content of an image as a boolean ink mask, INK_MAP_WIDTH wide.
+
+    The image is cropped to its ink's bounding box like in image_hashes,
+    so re-captures with other framing line up pixel for pixel.
+    """
+    small = pixels
+    scale = 2 * INK_MAP_WIDTH / max(pixels.shape[:2])
+    if scale < 1:
+        small = cv2.resize(pixels, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGRA2GRAY if small.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    _, ink = cv2.threshold(cv2.GaussianBlur(small, (3, 3), 0), 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    x, y, w, h = cv2.boundingRect(ink)
+    if w > 1 and h > 1:
+        small = small[y:y + h, x:x + w]
+    height = max(1, round(small.shape[0] * INK_MAP_WIDTH / small.shape[1]))
+    small = cv2.resize(small, (INK_MAP_WIDTH, height), interpolation=cv2.INTER_AREA)
+    _, ink = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    return ink.astype(bool)
+
+
+def same_content(a, b, tolerance=2, block=8, max_block_pixels=10):
+    """Return True if two ink maps show the same page.
+
+    Ink on one page counts as matched if the other page has ink within
+    tolerance pixels, which absorbs small misalignment between captures.
+    The pages differ if more than max_block_pixels unmatched ink pixels
+    fall into one block x block cell: re-capture noise scatters, but a
+    changed character leaves a cluster. Pages whose aspect ratios differ
+    by more than 2% never match.
+    """
+    if a is None or b is None or a.shape[1] != b.shape[1] or abs(a.shape[0] - b.shape[0]) > 0.02 * a.shape[0]:
+        return False
+    if a.shape != b.shape:
+        b = cv2.resize(b.astype(np.uint8), (a.shape[1], a.shape[0]), interpolation=cv2.INTER_NEAREST).astype(bool)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * tolerance + 1, 2 * tolerance + 1))
+    near_a = cv2.dilate(a.astype(np.uint8), kernel).astype(bool)
+    near_b = cv2.dilate(b.astype(np.uint8), kernel).astype(bool)
+    unmatched = (a & ~near_b) | (b & ~near_a)
+    # Pad the last partial row and column of cells, so no ink escapes the check
+    unmatched = np.pad(unmatched, ((0, -unmatched.shape[0] % block), (0, -unmatched.shape[1] % block)))
+    cells = unmatched.reshape(unmatched.shape[0] // block, block, -1, block).sum(axis=(1, 3))
+    return int(cells.max()) <= max_block_pixels
+
+
+def encode_ink_map(ink):
+    """Pack an ink map into a short string, for storing next to a cached result."""
+    packed = zlib.compress(np.packbits(ink).tobytes())
+    return f"{ink.shape[0]},{ink.shape[1]}," + base64.b64encode(packed).decode('ascii')
+
+
+def decode_ink_map(text):
+    rows, cols, packed = text.split(',', 2)
+    bits = np.unpackbits(np.frombuffer(zlib.decompress(base64.b64decode(packed)), dtype=np.uint8))
+    return bits[:int(rows) * int(cols)].reshape(int(rows), int(cols)).astype(bool)
+
+
+def _dhash_bits(gray, size):
+    # One bit per horizontally adjacent pair: is the right cell brighter?
+    cells = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return (cells[:, 1:] > cells[:, :-1]).ravel()
+
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    _BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values):
+        return _BYTE_BITS[values.view(np.uint8)].reshape(values.shape + (-1,)).sum(axis=-1)
+
+
+class NearDuplicateIndex:
+    """Map perceptual hashes of processed images to their OCR cache keys.
+
+    Args:
+        max_distance: Bits the 64-bit hashes may differ by to be candidates
+            (default: 6). Lookups stay fastest below 8; up to 15 works.
+        verify_distance: Bits the 256-bit hashes may differ by for a
+            candidate to count as the same page (default: 40)
+        max_entries: Oldest entries are dropped past this many
+
+    Thread-safe. Entries live in memory, about 100 bytes each.
+    """
+
+    def __init__(self, max_distance=6, verify_distance=40, max_entries=1_000_000):
+        if not 0 <= max_distance < 4 * CHUNKS:
+            raise ValueError(f"max_distance must be between 0 and {4 * CHUNKS - 1}")
+        self.max_distance = max_distance
+        self.verify_distance = verify_distance
+        self.max_entries = max_entries
+        # Each chunk value is probed together with every value within this many bits of it
+        self._probe_masks = np.array(
+            [sum(1 << bit for bit in bits)
+             for radius in range(max_distance // CHUNKS + 1)
+             for bits in combinations(range(CHUNK_BITS), radius)],
+            dtype=np.uint16,
+        )
+        self._lock = threading.Lock()
+        self._domains = {}
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self._reset(0)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, hashes, key, domain=''):
+        """Remember that the image with these hashes has its result under key.
+
+        Args:
+            hashes: (coarse, fine) from image_hashes
+            key: Hex SHA-256 cache key of the stored result
+            domain: Settings the result depends on (language, config, ...);
+                find() only returns entries from the same domain
+        """
+        coarse, fine = hashes
+        with self._lock:
+            if self._size == len(self._coarse):
+                self._grow()
+            i = self._size
+            self._coarse[i] = coarse
+            self._fine[i] = np.frombuffer(fine, dtype=np.uint64)
+            self._keys[i] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+            self._domain_ids[i] = self._domains.setdefault(domain, len(self._domains))
+            self._size += 1
+            if self._size > self.max_entries:
+                # Drop a tenth at once, so the tables aren't rebuilt on every add
+                self._drop_oldest(self._size - self.max_entries + self.max_entries // 10)
+            elif self._size - self._indexed > TAIL_SIZE:
+                self._rebuild()
+
+    def find(self, hashes, domain='', accept=None):
+        """Return the key of the closest verified near-duplicate, or None.
+
+        Args:
+            accept: Callable(key) -> bool that confirms a candidate, e.g.
+                by comparing content. Candidates are tried closest first,
+                and the first one accepted is returned.
+        """
+        coarse, fine = hashes
+        with self._lock:
+            domain_id = self._domains.get(domain)
+            candidates = np.empty(0, dtype=np.int64)
+            if domain_id is not None:
+                candidates = self._candidates(coarse)
+                candidates = candidates[self._domain_ids[candidates] == domain_id]
+                distance = _popcount(self._coarse[candidates] ^ np.uint64(coarse))
+                candidates = np.unique(candidates[distance <= self.max_distance])
+            fine_distance = _popcount(self._fine[candidates] ^ np.frombuffer(fine, dtype=np.uint64)).sum(axis=1)
+            order = np.argsort(fine_distance, kind='stable')
+            verified = [self._keys[candidates[i]].tobytes().hex() for i in order
+                        if fine_distance[i] <= self.verify_distance]
+        # Outside the lock: accept may be slow
+        key = next((key for key in verified if accept is None or accept(key)), None)
+        with self._lock:
+            if key is None:
+                self.misses += 1
+                self.rejected += bool(len(candidates))
+            else:
+                self.hits += 1
+        return key
+
+    def stats(self):
+        """Return entry and lookup counters; rejected counts lookups whose candidates all failed verification."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._domains.clear()
+            self._reset(0)
+
+    def _reset(self, capacity):
+        self._size = 0
+        self._coarse = np.zeros(capacity, dtype=np.uint64)
+        self._fine = np.zeros((capacity, 4), dtype=np.uint64)
+        self._keys = np.zeros((capacity, 32), dtype=np.uint8)
+        self._domain_ids = np.zeros(capacity, dtype=np.uint32)
+        self._rebuild()
+
+    def _grow(self):
+        capacity = max(1024, 2 * len(self._coarse))
+        self._coarse = np.resize(self._coarse, capacity)
+        self._fine = np.resize(self._fine, (capacity, 4))
+        self._keys = np.resize(self._keys, (capacity, 32))
+        self._domain_ids = np.resize(self._domain_ids, capacity)
+
+    def _drop_oldest(self, count):
+        keep = slice(count, self._size)
+        self._size -= count
+        self._coarse[:self._size] = self._coarse[keep]
+        self._fine[:self._size] = self._fine[keep]
+        self._keys[:self._size] = self._keys[keep]
+        self._domain_ids[:self._size] = self._domain_ids[keep]
+        self._rebuild()
+
+    def _chunk(self, values, j):
+        return ((values >> np.uint64(j * CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.uint16)
+
+    def _rebuild(self):
+        # Per chunk: the entries' chunk values, sorted, and the entry each came from
+        self._indexed = self._size
+        self._tables = []
+        coarse = self._coarse[:self._size]
+        for j in range(CHUNKS):
+            values = self._chunk(coarse, j)
+            order = np.argsort(values, kind='stable').astype(np.uint32)
+            self._tables.append((values[order], order))
+
+    def _candidates(self, coarse):
+        coarse = np.uint64(coarse)
+        found = [np.arange(self._indexed, self._size)]
+        for j, (values, ids) in enumerate(self._tables):
+            probes = self._chunk(coarse, j) ^ self._probe_masks
+            starts = np.searchsorted(values, probes, side='left')
+            ends = np.searchsorted(values, probes, side='right')
+            found += [ids[start:end] for start, end in zip(starts, ends) if end > start]
+        # An entry matching on several chunks shows up more than once, which is harmless
+        return np.concatenate(found).astype(np.int64)
@@ -7,6 +7,28 @@ import os
 import pytesseract
 import PyPDF2
 import platform
+import hashlib
+import json
+import multiprocessing
+import threading
+import time
+import shlex
+import re
+import subprocess
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import metrics
+from near_duplicates import NearDuplicateIndex, decode_ink_map, encode_ink_map, image_hashes, ink_map, same_content
+
+# tesserocr links libtesseract directly so models stay loaded between calls.
+# It is in requirements.txt but needs libtesseract to build; without it every OCR
+# call starts a tesseract process.
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
 
 # Set up Tesseract OCR path based on platform
 # For Streamlit Cloud (Linux), Tesseract is installed via packages.txt
@@ -16,6 +38,916 @@ if platform.system() == 'Windows':
     os.environ['TESSDATA_PREFIX'] = r"C:\Program Files\Tesseract-OCR\tessdata"
 # For Linux/Cloud deployment, tesseract is in PATH, no need to set explicitly
 
+# TESSDATA_DIR points Tesseract at a model directory of our own, e.g. a writable
+# one that TessdataStore installs into, instead of the system-wide tessdata
+if os.environ.get('TESSDATA_DIR'):
+    os.environ['TESSDATA_PREFIX'] = os.environ['TESSDATA_DIR']
+
+
+class OCRCache:
+    """Content-addressed cache for OCR results.
+
+    Entries are keyed by a hash of the image bytes plus the OCR language and
+    Tesseract config. A bounded in-memory LRU tier is always used; an optional
+    on-disk tier keeps results across restarts and is trimmed by total size.
+
+    Args:
+        max_entries: Maximum number of results kept in memory
+        disk_dir: Directory for the on-disk tier (default: None, memory only)
+        max_disk_bytes: Size budget for the on-disk tier
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None, max_disk_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    @staticmethod
+    def make_key(data, lang='eng', config=''):
+        """Build a cache key from image bytes, language and Tesseract config."""
+        digest = hashlib.sha256(data)
+        digest.update(b"\0" + lang.encode() + b"\0" + config.encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached text for key, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += entry[1]
+                metrics.inc('cache_lookups_total', result='memory_hit')
+                return entry[0]
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                metrics.inc('cache_lookups_total', result='miss')
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self.saved_seconds += entry[1]
+            self._remember(key, entry)
+        metrics.inc('cache_lookups_total', result='disk_hit')
+        return entry[0]
+
+    def put(self, key, text, seconds=0.0):
+        """Store text for key; seconds is the OCR time the entry saves on a hit."""
+        entry = (text, seconds)
+        with self._lock:
+            self._remember(key, entry)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+
+    def stats(self):
+        """Return hit/miss counters and the Tesseract time saved by hits."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self.disk_dir:
+                for path, _, _ in self._disk_entries():
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self._disk_bytes = 0
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + ".json")
+
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Touch the file so eviction treats it as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return data["text"], data.get("seconds", 0.0)
+
+    def _write_disk(self, key, entry):
+        path = self._disk_path(key)
+        payload = json.dumps({"text": entry[0], "seconds": entry[1]}).encode('utf-8')
+        tmp_fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(tmp_fd, 'wb') as f:
+                f.write(payload)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self._disk_bytes += len(payload) - previous
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        # Oldest entries (by last use) go first until we are back under budget
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+
+# Shared cache used by extract_text. Set OCR_CACHE_DIR to enable the disk tier.
+ocr_cache = OCRCache(
+    max_entries=int(os.environ.get('OCR_CACHE_ENTRIES', 256)),
+    disk_dir=os.environ.get('OCR_CACHE_DIR') or None,
+    max_disk_bytes=int(os.environ.get('OCR_CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+)
+
+
+# Set OCR_NEAR_DUPLICATES=1 to let re-captures of an already processed page reuse its cached text
+# (see near_duplicates.py). Off by default: pages that differ in a character or two can still be
+# mistaken for each other, which hands one document another's text.
+near_duplicate_index = None
+if os.environ.get('OCR_NEAR_DUPLICATES', '0').lower() in ('1', 'true', 'yes', 'on'):
+    near_duplicate_index = NearDuplicateIndex(
+        max_distance=int(os.environ.get('OCR_NEAR_DUPLICATE_DISTANCE', 6)),
+        verify_distance=int(os.environ.get('OCR_NEAR_DUPLICATE_VERIFY', 40)),
+        max_entries=int(os.environ.get('OCR_NEAR_DUPLICATE_ENTRIES', 1_000_000)),
+    )
+
+
+class TesseractEngine:
+    """Pool of warm Tesseract instances, kept per language.
+
+    With tesserocr installed, each worker is a libtesseract handle that
+    loads its .traineddata once and is then reused, so small images do not
+    pay the model load on every call. Requests go to an idle worker; a new
+    one is started only while the language is below max_workers. Workers
+    idle for longer than idle_timeout are shut down. Without tesserocr, or
+    for config flags tesserocr cannot express, calls fall back to
+    pytesseract.
+
+    Args:
+        max_workers: Maximum warm workers per language
+        idle_timeout: Seconds before an unused worker is shut down
+    """
+
+    def __init__(self, max_workers=2, idle_timeout=300.0):
+        self.max_workers = max_workers
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._busy = {}
+        self._cond = threading.Condition()
+        self._reaper = None
+
+    @property
+    def available(self):
+        return tesserocr is not None
+
+    def image_to_string(self, pixels, lang='eng', config=''):
+        """Run OCR on a NumPy array, reusing a warm worker when possible."""
+        return self._recognize(pixels, lang, config, 'text')
+
+    def image_to_data(self, pixels, lang='eng', config=''):
+        """Run OCR and return Tesseract's TSV word data (boxes and confidences)."""
+        return self._recognize(pixels, lang, config, 'tsv')
+
+    def _recognize(self, pixels, lang, config, output):
+        options = _parse_tesseract_config(config)
+        if not self.available or options is None:
+            if output == 'tsv':
+                return pytesseract.image_to_data(pixels, lang=lang, config=config)
+            return pytesseract.image_to_string(pixels, lang=lang, config=config)
+        
+        api = self._acquire(lang)
+        variables = options.get('variables', {})
+        try:
+            api.SetPageSegMode(options.get('psm', tesserocr.PSM.AUTO))
+            for name, value in variables.items():
+                api.SetVariable(name, value)
+            api.SetImage(Image.fromarray(pixels))
+            if output == 'tsv':
+                return api.GetTSVText(0)
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+            # Variables stick to the handle, so don't hand it to the next caller
+            self._release(lang, api, reuse=not variables)
+
+    def detect_script(self, pixels):
+        """Run Tesseract orientation and script detection (needs osd.traineddata).
+        
+        Returns:
+            Dict with script, script_conf, rotate (degrees clockwise that
+            make the text upright) and orientation_conf
+        """
+        if not self.available:
+            osd = pytesseract.image_to_osd(pixels, config='--psm 0', output_type=pytesseract.Output.DICT)
+            return {
+                'script': osd['script'],
+                'script_conf': float(osd['script_conf']),
+                'rotate': int(osd['rotate']),
+                'orientation_conf': float(osd['orientation_conf']),
+            }
+        
+        api = self._acquire('osd')
+        try:
+            api.SetPageSegMode(tesserocr.PSM.OSD_ONLY)
+            api.SetImage(Image.fromarray(pixels))
+            osd = api.DetectOrientationScript()
+        finally:
+            api.Clear()
+            self._release('osd', api)
+        if not osd:
+            raise RuntimeError("Too few characters for script detection")
+        return {
+            'script': osd['script_name'],
+            'script_conf': float(osd['script_conf']),
+            'rotate': (360 - int(osd['orient_deg'])) % 360,
+            'orientation_conf': float(osd['orient_conf']),
+        }
+
+    def preload(self, langs):
+        """Start one warm worker for each language ahead of the first request."""
+        for lang in langs:
+            self._release(lang, self._acquire(lang))
+
+    def evict_idle(self, max_idle=None):
+        """Shut down workers that have been idle longer than max_idle seconds."""
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        cutoff = time.monotonic() - max_idle
+        expired = []
+        with self._cond:
+            for lang, idle in self._idle.items():
+                keep = [(api, used) for api, used in idle if used >= cutoff]
+                expired.extend(api for api, used in idle if used < cutoff)
+                self._idle[lang] = keep
+        for api in expired:
+            api.End()
+        return len(expired)
+
+    def stats(self):
+        """Return the number of idle and busy workers per language."""
+        with self._cond:
+            langs = set(self._idle) | set(self._busy)
+            return {
+                lang: {"idle": len(self._idle.get(lang, [])), "busy": self._busy.get(lang, 0)}
+                for lang in sorted(langs)
+            }
+
+    def close(self):
+        """Shut down every idle worker."""
+        self.evict_idle(max_idle=-1)
+
+    def _acquire(self, lang):
+        with self._cond:
+            while True:
+                idle = self._idle.setdefault(lang, [])
+                if idle:
+                    api, _ = idle.pop()
+                    self._busy[lang] = self._busy.get(lang, 0) + 1
+                    return api
+                if len(idle) + self._busy.get(lang, 0) < self.max_workers:
+                    # Reserve the slot, then load the model outside the lock
+                    self._busy[lang] = self._busy.get(lang, 0) + 1
+                    break
+                self._cond.wait()
+        try:
+            return self._start_worker(lang)
+        except Exception:
+            with self._cond:
+                self._busy[lang] -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, lang, api, reuse=True):
+        with self._cond:
+            self._busy[lang] -= 1
+            if reuse:
+                self._idle.setdefault(lang, []).append((api, time.monotonic()))
+            self._cond.notify()
+        if reuse:
+            self._start_reaper()
+        else:
+            api.End()
+
+    def _start_worker(self, lang):
+        kwargs = {'lang': lang}
+        if os.environ.get('TESSDATA_PREFIX'):
+            kwargs['path'] = os.environ['TESSDATA_PREFIX']
+        try:
+            return tesserocr.PyTessBaseAPI(**kwargs)
+        except RuntimeError as e:
+            # Keep the wording the UI checks for when a model is missing
+            raise RuntimeError(f"Failed loading language '{lang}': {lang}.traineddata not found or invalid ({e})")
+
+    def _start_reaper(self):
+        if self._reaper is not None or self.idle_timeout is None:
+            return
+        with self._cond:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap, name="tesseract-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(max(self.idle_timeout / 2, 1.0))
+            self.evict_idle()
+
+
+def _parse_tesseract_config(config):
+    """Translate pytesseract config flags into tesserocr settings.
+
+    Returns None when the config uses flags tesserocr cannot apply to an
+    already-initialised handle (for example --oem), so the caller can fall
+    back to pytesseract.
+    """
+    options = {}
+    tokens = shlex.split(config or '')
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token == '--psm' and i + 1 < len(tokens) and tokens[i + 1].isdigit():
+            options['psm'] = int(tokens[i + 1])
+            i += 2
+        elif token == '-c' and i + 1 < len(tokens) and '=' in tokens[i + 1]:
+            name, value = tokens[i + 1].split('=', 1)
+            options.setdefault('variables', {})[name] = value
+            i += 2
+        else:
+            return None
+    return options
+
+
+# Shared engine used for every OCR call in this process
+tesseract_engine = TesseractEngine(
+    max_workers=int(os.environ.get('OCR_ENGINE_WORKERS', 2)),
+    idle_timeout=float(os.environ.get('OCR_ENGINE_IDLE_SECONDS', 300)),
+)
+
+
+# Where models are installed from: a directory or an http(s) base URL
+TESSDATA_MIRROR = os.environ.get('TESSDATA_MIRROR', 'https://github.com/tesseract-ocr/tessdata/raw/main')
+
+# Languages installed and warmed up at startup (see prefetch_models), e.g. "eng,osd,deu"
+TESSDATA_PREFETCH = [lang.strip() for lang in os.environ.get('TESSDATA_PREFETCH', '').split(',') if lang.strip()]
+
+# Usual install locations, for a tesseract too old to report its own
+_SYSTEM_TESSDATA_DIRS = (
+    '/usr/share/tesseract-ocr/5/tessdata',
+    '/usr/share/tesseract-ocr/4.00/tessdata',
+    '/usr/share/tessdata',
+    '/usr/local/share/tessdata',
+    '/opt/homebrew/share/tessdata',
+)
+
+
+def resolve_tessdata_dir():
+    """Return the directory Tesseract loads language models from.
+    
+    TESSDATA_PREFIX (which TESSDATA_DIR sets) wins. Otherwise the
+    directory tesseract reports with --list-langs, then the first usual
+    install location that exists. None if none of them turns one up.
+    """
+    if os.environ.get('TESSDATA_PREFIX'):
+        return os.environ['TESSDATA_PREFIX']
+    try:
+        listing = subprocess.run([pytesseract.pytesseract.tesseract_cmd, '--list-langs'],
+                                 capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        listing = ''
+    # 'List of available languages in "/usr/share/tesseract-ocr/5/tessdata/" (3):'
+    match = re.search(r'"(.+?)"', listing.split('\n', 1)[0])
+    if match:
+        return match.group(1).rstrip('/\\')
+    return next((path for path in _SYSTEM_TESSDATA_DIRS if os.path.isdir(path)), None)
+
+
+class TessdataStore:
+    """Tesseract language models in one directory: install, prefetch, warm up.
+    
+    Models are copied from a mirror: a directory (a shared copy of
+    tessdata, or a test fixture) or an http(s) base URL. A mirror can list
+    checksums in a SHA256SUMS file, one "<hex>  <lang>.traineddata" line
+    per model as sha256sum writes them. A listed model must match its
+    checksum, and so must one given in checksums. Without a checksum (the
+    default GitHub mirror has no SHA256SUMS) a download is only checked
+    for a plausible size and traineddata header, which catches an error
+    page or a file cut off before its last component, but not a tampered
+    model.
+    
+    Downloads are written to a temporary file in the model directory and
+    renamed into place, so Tesseract never loads half a model. New models
+    work without a restart.
+    
+    Args:
+        directory: Model directory (default: resolve_tessdata_dir(), looked
+            up on first use)
+        mirror: Directory or http(s) base URL holding <lang>.traineddata
+        checksums: {lang: SHA-256 hex digest} to verify installs against
+        timeout: Seconds to wait on the mirror before giving up
+    """
+    
+    def __init__(self, directory=None, mirror=TESSDATA_MIRROR, checksums=None, timeout=60):
+        self._directory = directory
+        self.mirror = mirror
+        self.checksums = dict(checksums or {})
+        self.timeout = timeout
+        self.last_prefetch = {}
+        self._mirror_sums = None
+        self._lock = threading.Lock()
+        self._lang_locks = {}
+    
+    @property
+    def directory(self):
+        if self._directory is None:
+            self._directory = resolve_tessdata_dir()
+            if self._directory is None:
+                raise RuntimeError("Could not find Tesseract's tessdata directory. Set TESSDATA_DIR.")
+        return self._directory
+    
+    def path(self, lang):
+        """Return where lang's model lives in the model directory."""
+        if not re.fullmatch(r'[A-Za-z0-9_-]+', lang):
+            raise ValueError(f"Invalid language code: {lang!r}")
+        return os.path.join(self.directory, f"{lang}.traineddata")
+    
+    def installed(self):
+        """Return the sorted language codes with a model in the directory."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(name[:-len('.traineddata')] for name in names if name.endswith('.traineddata'))
+    
+    def install(self, lang, force=False):
+        """Copy lang's model from the mirror unless it is installed already.
+        
+        Concurrent installs of the same language wait for each other;
+        different languages install in parallel.
+        
+        Returns:
+            Path of the installed model
+        
+        Raises:
+            ValueError: if the download fails its checksum or is not a model
+            OSError: if the mirror has no such model or the directory is
+                not writable (PermissionError)
+        """
+        global _installed_langs
+        path = self.path(lang)
+        with self._lang_lock(lang):
+            if os.path.exists(path) and not force:
+                return path
+            expected = self.checksums.get(lang) or self._mirror_checksums().get(f"{lang}.traineddata")
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{lang}-", suffix='.tmp')
+            try:
+                digest = hashlib.sha256()
+                with metrics.timer('tessdata_install'), os.fdopen(fd, 'wb') as f:
+                    for chunk in self._fetch(f"{lang}.traineddata"):
+                        f.write(chunk)
+                        digest.update(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if expected and digest.hexdigest() != expected.lower():
+                    raise ValueError(f"Checksum mismatch for {lang}.traineddata from {self.mirror}: "
+                                     f"expected {expected}, got {digest.hexdigest()}")
+                _check_traineddata(tmp_path, lang)
+                # mkstemp creates the file private to us; models are read by every tesseract
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        # Tesseract lists languages from the directory; look again next time
+        _installed_langs = None
+        return path
+    
+    def warm_up(self, lang):
+        """Load lang's model with a tiny OCR call, so the first real request doesn't.
+        
+        With tesserocr the loaded model stays in a tesseract_engine worker.
+        Without it, every call starts tesseract, and warming up only gets
+        the model file into the OS page cache.
+        
+        Returns:
+            Seconds the call took
+        """
+        start = time.perf_counter()
+        with metrics.timer('model_warm_up'):
+            if lang == 'osd':
+                # OSD needs more text than a tiny image holds; loading the model is the slow part
+                if tesseract_engine.available:
+                    tesseract_engine.preload([lang])
+            else:
+                tesseract_engine.image_to_string(_warm_up_image(), lang=lang, config='--psm 7')
+        return time.perf_counter() - start
+    
+    def prefetch(self, langs, warm=True, max_workers=4):
+        """Install, and optionally warm up, several languages concurrently.
+        
+        Returns:
+            {lang: None, or the exception that language failed with};
+            also kept in last_prefetch
+        """
+        def prefetch_one(lang):
+            self.install(lang)
+            if warm:
+                self.warm_up(lang)
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tessdata") as pool:
+            futures = {lang: pool.submit(prefetch_one, lang) for lang in langs}
+        results = {lang: future.exception() for lang, future in futures.items()}
+        for lang, error in results.items():
+            if error is not None:
+                metrics.inc('errors_total', stage='tessdata_prefetch', type=type(error).__name__)
+        self.last_prefetch = results
+        return results
+    
+    def _lang_lock(self, lang):
+        with self._lock:
+            return self._lang_locks.setdefault(lang, threading.Lock())
+    
+    def _is_url(self):
+        return self.mirror.startswith(('http://', 'https://'))
+    
+    def _fetch(self, name, chunk_size=1024 * 1024):
+        """Yield the mirror's copy of name in chunks."""
+        if self._is_url():
+            import requests
+            
+            url = f"{self.mirror.rstrip('/')}/{name}"
+            with requests.get(url, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 404:
+                    raise FileNotFoundError(f"{name} not found at {url}")
+                response.raise_for_status()
+                yield from response.iter_content(chunk_size)
+            return
+        with open(os.path.join(self.mirror, name), 'rb') as f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+    
+    def _mirror_checksums(self):
+        """Parse the mirror's SHA256SUMS once; {} if it has none."""
+        if self._mirror_sums is None:
+            try:
+                listing = b''.join(self._fetch('SHA256SUMS')).decode('utf-8')
+            except OSError:
+                listing = ''
+            sums = {}
+            for line in listing.splitlines():
+                parts = line.split()
+                if len(parts) == 2:
+                    # sha256sum marks binary mode with a leading '*'
+                    sums[parts[1].lstrip('*')] = parts[0].lower()
+            self._mirror_sums = sums
+        return self._mirror_sums
+
+
+# The smallest tessdata_fast models are a few hundred KB; error pages are far smaller
+_MIN_TRAINEDDATA_BYTES = 64 * 1024
+
+
+def _check_traineddata(path, lang):
+    """Raise ValueError unless path is laid out like a traineddata file.
+    
+    The header is an int32 entry count followed by one int64 offset per
+    entry: -1 for a missing component, otherwise increasing offsets inside
+    the file. This runs on every download, with or without a checksum.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.read(4)
+        count = int.from_bytes(header, 'little') if len(header) == 4 else 0
+        table = f.read(8 * count) if 0 < count <= 64 else b''
+    offsets = [int.from_bytes(table[i:i + 8], 'little', signed=True) for i in range(0, len(table), 8)]
+    present = [offset for offset in offsets if offset != -1]
+    valid = (
+        size >= _MIN_TRAINEDDATA_BYTES
+        and len(offsets) == count
+        and present
+        and all(offset == -1 or 4 + 8 * count <= offset < size for offset in offsets)
+        and present == sorted(set(present))
+    )
+    if not valid:
+        raise ValueError(f"{lang}.traineddata from the mirror is not a Tesseract model")
+
+
+_WARM_UP_IMAGE = None
+
+
+def _warm_up_image():
+    global _WARM_UP_IMAGE
+    if _WARM_UP_IMAGE is None:
+        image = np.full((48, 160), 255, dtype=np.uint8)
+        cv2.putText(image, "warm", (10, 34), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+        _WARM_UP_IMAGE = image
+    return _WARM_UP_IMAGE
+
+
+# Shared store for the directory Tesseract reads (TESSDATA_DIR to choose it)
+tessdata_store = TessdataStore()
+
+
+def prefetch_models(langs=None, warm=True):
+    """Install and warm up langs (default: TESSDATA_PREFETCH); see TessdataStore.prefetch.
+    
+    The app and the HTTP API call this on a background thread at startup.
+    """
+    return tessdata_store.prefetch(TESSDATA_PREFETCH if langs is None else langs, warm=warm)
+
+
+PREPROCESS_STAGES = ('grayscale', 'resize', 'deskew', 'binarize', 'crop')
+
+
+class Preprocessor:
+    """Configurable OpenCV/NumPy cleanup applied before Tesseract.
+    
+    Stages run in the order given and each one is timed:
+    
+    - grayscale: drop colour channels
+    - resize: downscale so the long side is at most a page at the target DPI
+    - deskew: straighten text rotated by up to max_skew degrees
+    - binarize: adaptive threshold to even out uneven lighting
+    - crop: trim empty borders around the text
+    
+    Args:
+        stages: Stage names to run (default: PREPROCESS_STAGES)
+        dpi: Target resolution for the resize stage
+        page_inches: Long side of the page the image is assumed to show (A4)
+        block_size: Neighbourhood size for adaptive thresholding (odd)
+        threshold_offset: Constant subtracted from the local mean when thresholding
+        max_skew: Largest rotation, in degrees, the deskew stage will correct
+        crop_margin: Pixels of padding kept around the cropped text
+    """
+
+    def __init__(self, stages=None, dpi=300, page_inches=11.69, block_size=31,
+                 threshold_offset=15, max_skew=15.0, crop_margin=10):
+        self.stages = tuple(stages if stages is not None else PREPROCESS_STAGES)
+        unknown = set(self.stages) - set(PREPROCESS_STAGES)
+        if unknown:
+            raise ValueError(f"Unknown preprocessing stage(s): {', '.join(sorted(unknown))}")
+        self.dpi = dpi
+        self.page_inches = page_inches
+        self.block_size = block_size | 1
+        self.threshold_offset = threshold_offset
+        self.max_skew = max_skew
+        self.crop_margin = crop_margin
+
+    def signature(self):
+        """Return a string identifying this configuration, for cache keys."""
+        return (f"pre:{','.join(self.stages)}:{self.dpi}:{self.page_inches}:{self.block_size}:"
+                f"{self.threshold_offset}:{self.max_skew}:{self.crop_margin}")
+
+    def run(self, pixels):
+        """Apply the configured stages.
+        
+        Returns:
+            (pixels, timings) where timings maps stage name to seconds
+        """
+        timings = {}
+        for stage in self.stages:
+            start = time.perf_counter()
+            pixels = getattr(self, '_' + stage)(pixels)
+            timings[stage] = time.perf_counter() - start
+        return pixels, timings
+
+    def _grayscale(self, pixels):
+        return _to_gray(pixels)
+
+    def _resize(self, pixels):
+        target = int(self.dpi * self.page_inches)
+        long_side = max(pixels.shape[:2])
+        if long_side <= target:
+            return pixels
+        scale = target / long_side
+        size = (max(1, round(pixels.shape[1] * scale)), max(1, round(pixels.shape[0] * scale)))
+        return cv2.resize(pixels, size, interpolation=cv2.INTER_AREA)
+
+    def _deskew(self, pixels):
+        gray = self._grayscale(pixels)
+        # Estimate the angle on a small copy; the rotation itself is full size
+        small = gray
+        if max(gray.shape) > 1000:
+            scale = 1000 / max(gray.shape)
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+        # Join characters into lines so minAreaRect follows the text direction
+        ink = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 3)))
+        coords = cv2.findNonZero(ink)
+        if coords is None or len(coords) < 50:
+            return pixels
+        angle = cv2.minAreaRect(coords)[-1]
+        if angle > 45:
+            angle -= 90
+        elif angle < -45:
+            angle += 90
+        if abs(angle) < 0.1 or abs(angle) > self.max_skew:
+            return pixels
+        h, w = pixels.shape[:2]
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        return cv2.warpAffine(pixels, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+    def _binarize(self, pixels):
+        # A small median blur keeps sensor noise from turning into specks
+        gray = cv2.medianBlur(self._grayscale(pixels), 3)
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                     self.block_size, self.threshold_offset)
+
+    def _crop(self, pixels):
+        gray = self._grayscale(pixels)
+        # Open the ink mask so isolated specks don't count as content
+        ink = cv2.morphologyEx((gray < 128).astype(np.uint8), cv2.MORPH_OPEN, np.ones((5, 5), np.uint8)) > 0
+        # Ignore rows/columns with only a few specks of noise
+        rows = np.flatnonzero(ink.sum(axis=1) > max(2, ink.shape[1] // 200))
+        cols = np.flatnonzero(ink.sum(axis=0) > max(2, ink.shape[0] // 200))
+        if rows.size == 0 or cols.size == 0:
+            return pixels
+        m = self.crop_margin
+        top, bottom = max(rows[0] - m, 0), min(rows[-1] + m + 1, pixels.shape[0])
+        left, right = max(cols[0] - m, 0), min(cols[-1] + m + 1, pixels.shape[1])
+        return pixels[top:bottom, left:right]
+
+
+def preprocess_image(image, preprocessor=None):
+    """Run the preprocessing pipeline on an image.
+    
+    Args:
+        image: NumPy array or PIL image
+        preprocessor: Preprocessor to use (default: all stages, default settings)
+    
+    Returns:
+        (pixels, timings) where timings maps stage name to seconds
+    """
+    return (preprocessor or Preprocessor()).run(_to_pixels(image))
+
+
+class OCRResult:
+    """Words, boxes and confidences from one Tesseract pass, stored compactly.
+    
+    Every field is a NumPy column with one entry per word, and all word
+    texts share a single string with an offsets array. There are no
+    per-word Python objects, so a dense page with thousands of words takes
+    a fraction of the memory of a list of dicts. Plain text is rebuilt
+    from the columns on demand.
+    
+    Attributes:
+        left, top, width, height: Word boxes in image pixels (int32)
+        conf: Word confidence, 0-100 (float32)
+        block, paragraph, line: Layout numbers from Tesseract (int32)
+    """
+
+    __slots__ = ('left', 'top', 'width', 'height', 'conf', 'block', 'paragraph', 'line',
+                 '_chars', '_offsets', '_text')
+
+    _INT_COLUMNS = ('block', 'paragraph', 'line', 'left', 'top', 'width', 'height')
+
+    def __init__(self, columns, words):
+        for name in self._INT_COLUMNS:
+            setattr(self, name, np.asarray(columns[name], dtype=np.int32))
+        self.conf = np.asarray(columns['conf'], dtype=np.float32)
+        self._chars = "".join(words)
+        self._offsets = np.zeros(len(words) + 1, dtype=np.int32)
+        np.cumsum([len(w) for w in words], out=self._offsets[1:])
+        self._text = None
+
+    @classmethod
+    def from_tsv(cls, tsv):
+        """Build a result from Tesseract TSV output (image_to_data / GetTSVText)."""
+        columns = {name: [] for name in cls._INT_COLUMNS + ('conf',)}
+        words = []
+        for row in tsv.splitlines():
+            fields = row.split('\t')
+            # Word rows are level 5; skip the header and layout-only rows
+            if len(fields) < 12 or fields[0] != '5' or not fields[11].strip():
+                continue
+            columns['block'].append(int(fields[2]))
+            columns['paragraph'].append(int(fields[3]))
+            columns['line'].append(int(fields[4]))
+            columns['left'].append(int(fields[6]))
+            columns['top'].append(int(fields[7]))
+            columns['width'].append(int(fields[8]))
+            columns['height'].append(int(fields[9]))
+            columns['conf'].append(float(fields[10]))
+            words.append(fields[11])
+        return cls(columns, words)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def word(self, i):
+        """Return the text of word i."""
+        return self._chars[self._offsets[i]:self._offsets[i + 1]]
+
+    @property
+    def words(self):
+        """All word texts, in Tesseract's reading order."""
+        return [self.word(i) for i in range(len(self))]
+
+    @property
+    def boxes(self):
+        """(n, 4) array of word boxes as x, y, width, height."""
+        return np.stack([self.left, self.top, self.width, self.height], axis=1)
+
+    @property
+    def text(self):
+        """Plain text: words joined by spaces, lines by newlines, blocks by blank lines."""
+        if self._text is None:
+            parts = []
+            for i in range(len(self)):
+                if i:
+                    if self.block[i] != self.block[i - 1] or self.paragraph[i] != self.paragraph[i - 1]:
+                        parts.append("\n\n")
+                    elif self.line[i] != self.line[i - 1]:
+                        parts.append("\n")
+                    else:
+                        parts.append(" ")
+                parts.append(self.word(i))
+            self._text = "".join(parts)
+        return self._text
+
+    def lines(self):
+        """Group words into lines.
+        
+        Returns:
+            List of (text, (x, y, w, h), mean confidence) tuples
+        """
+        if not len(self):
+            return []
+        keys = np.stack([self.block, self.paragraph, self.line], axis=1)
+        breaks = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+        result = []
+        for start, end in zip(np.r_[0, breaks], np.r_[breaks, len(self)]):
+            x0, y0 = self.left[start:end].min(), self.top[start:end].min()
+            x1 = (self.left[start:end] + self.width[start:end]).max()
+            y1 = (self.top[start:end] + self.height[start:end]).max()
+            text = " ".join(self.word(i) for i in range(start, end))
+            result.append((text, (int(x0), int(y0), int(x1 - x0), int(y1 - y0)), float(self.conf[start:end].mean())))
+        return result
+
+    def filter(self, min_conf):
+        """Return a new result keeping only words with confidence >= min_conf."""
+        keep = np.flatnonzero(self.conf >= min_conf)
+        columns = {name: getattr(self, name)[keep] for name in self._INT_COLUMNS + ('conf',)}
+        return OCRResult(columns, [self.word(i) for i in keep])
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the result, in bytes."""
+        arrays = sum(getattr(self, name).nbytes for name in self._INT_COLUMNS + ('conf',))
+        return arrays + self._offsets.nbytes + len(self._chars.encode('utf-8'))
+
 
 def capture_image():
     """Capture an image using webcam and save it."""
@@ -40,38 +972,748 @@ def capture_image():
     return image_path
 
 
-def extract_text(image_path, lang='eng'):
+def extract_text(image_path, lang='eng', config='', use_cache=True, preprocess=None):
     """Extract text from an image using Tesseract OCR.
     
+    Thin wrapper around extract_text_from_image for images on disk.
+    
     Args:
         image_path: Path to the image file
         lang: Language code for OCR (default: 'eng')
+        config: Extra Tesseract config flags (default: '')
+        use_cache: Look up and store the result in ocr_cache (default: True)
+        preprocess: Preprocessor, True for the default one, or None to skip
     """
     if not os.path.exists(image_path):
         raise FileNotFoundError(f"Image file '{image_path}' not found.")
     
-    image = cv2.imread(image_path)
-    if image is None:
-        raise ValueError("Error loading image. The file may be corrupted or not a valid image format.")
+    with open(image_path, 'rb') as f:
+        data = f.read()
     
-    text = pytesseract.image_to_string(image, lang=lang)
-    return text
+    return extract_text_from_image(data, lang=lang, config=config, use_cache=use_cache, preprocess=preprocess)
 
 
-def extract_text_from_pdf(pdf_file, lang='eng'):
-    """Extract text from a PDF file.
+def extract_text_from_image(image, lang='eng', config='', use_cache=True, preprocess=None, regions=False):
+    """Extract text from an in-memory image using Tesseract OCR.
+    
+    Pixels go straight to Tesseract without being written to or read back
+    from disk. Results are cached by image content, so reruns on the same
+    image skip Tesseract entirely. A re-capture of a page that was already
+    read (other framing or compression) reuses its result as well when
+    OCR_NEAR_DUPLICATES is set and the pages match pixel for pixel (see
+    near_duplicate_index).
+    
+    Args:
+        image: NumPy array, PIL image, or encoded image bytes (JPG, PNG, ...)
+        lang: Language code for OCR (default: 'eng'), a combined spec such
+            as 'eng+hin', or 'auto' to detect it (see extract_text_auto)
+        config: Extra Tesseract config flags (default: '')
+        use_cache: Look up and store the result in ocr_cache (default: True)
+        preprocess: Preprocessor, True for the default one, or None to skip
+        regions: Detect text regions first and OCR only those, in parallel
+            (default: False); best for large, mostly empty photos
+    """
+    return _extract(image, lang, config, use_cache, preprocess, regions)[0]
+
+
+def extract_text_auto(image, config='', use_cache=True, preprocess=None, regions=False):
+    """Detect the script, pick the OCR language, and extract text in one pass.
+    
+    Tesseract OSD runs on a small grayscale copy first (see
+    detect_language), which also fixes pages rotated by 90/180/270
+    degrees. The full OCR pass then runs once with the detected language.
+    If OSD is unsure, which usually means mixed scripts, or if regions is
+    set, each text region gets its own language instead.
+    
+    The detection is cached next to the text, so a cache hit returns both.
+    
+    Returns:
+        (text, detection) where detection is the dict from
+        detect_language, plus 'langs' listing every language used
+    """
+    return _extract(image, AUTO_LANG, config, use_cache, preprocess, regions)
+
+
+def _extract(image, lang, config, use_cache, preprocess, regions):
+    if preprocess is True:
+        preprocess = Preprocessor()
+    key_config = f"{config}|{preprocess.signature()}" if preprocess else config
+    if regions:
+        key_config += "|regions"
+    
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        data = bytes(image)
+        key = OCRCache.make_key(data, lang, key_config)
+        pixels = None
+        metrics.inc('bytes_in_total', len(data), kind='image')
+    else:
+        pixels = _to_pixels(image)
+        # Shape and dtype are part of the key: the same buffer can hold different images
+        key = OCRCache.make_key(pixels, lang, f"{key_config}|{pixels.shape}|{pixels.dtype}")
+    # The detection for lang='auto' is stored next to the text
+    detection_key = OCRCache.make_key(key.encode(), 'osd') if lang == AUTO_LANG else None
+    
+    if use_cache:
+        cached = ocr_cache.get(key)
+        if cached is not None:
+            if detection_key is None:
+                return cached, None
+            detection = ocr_cache.get(detection_key)
+            if detection is not None:
+                return cached, json.loads(detection)
+    
+    if pixels is None:
+        pixels = _decode(data)
+    hashes = None
+    if use_cache and near_duplicate_index is not None:
+        # The domain leaves out the shape: re-captures rarely match in size
+        domain = f"{lang}\0{key_config}"
+        with metrics.timer('phash'):
+            hashes = image_hashes(pixels)
+        reused = _near_duplicate_result(hashes, domain, lang, pixels)
+        if reused is not None:
+            # Store under this capture's key too, so an identical re-upload is an exact hit
+            ocr_cache.put(key, reused[0])
+            if detection_key is not None:
+                ocr_cache.put(detection_key, json.dumps(reused[1]))
+            return reused
+    text, seconds, detection = _recognize_pixels(pixels, lang, config, preprocess, regions)
+    if use_cache:
+        ocr_cache.put(key, text, seconds)
+        if detection_key is not None:
+            ocr_cache.put(detection_key, json.dumps(detection))
+        if hashes is not None:
+            with metrics.timer('ink_map'):
+                ocr_cache.put(_ink_map_key(key), encode_ink_map(ink_map(pixels)))
+            near_duplicate_index.add(hashes, key, domain)
+    metrics.inc('chars_out_total', len(text), stage='ocr')
+    return text, detection
+
+
+def _ink_map_key(key):
+    return OCRCache.make_key(key.encode(), 'ink')
+
+
+def _near_duplicate_result(hashes, domain, lang, pixels):
+    """Return (text, detection) cached for a near-duplicate image, or None.
+
+    A hash match alone is never enough: the matched page's stored ink map
+    has to agree with this image's (see near_duplicates.same_content).
+    """
+    page = []
+
+    def same_page(match):
+        stored = ocr_cache.get(_ink_map_key(match))
+        if stored is None:
+            # Evicted from the cache since; nothing to compare with
+            return False
+        if not page:
+            with metrics.timer('ink_map'):
+                page.append(ink_map(pixels))
+        if same_content(page[0], decode_ink_map(stored)):
+            return True
+        metrics.inc('near_duplicate_rejected_total')
+        return False
+
+    match = near_duplicate_index.find(hashes, domain, accept=same_page)
+    if match is None:
+        return None
+    text = ocr_cache.get(match)
+    if text is None:
+        return None
+    if lang != AUTO_LANG:
+        return text, None
+    detection = ocr_cache.get(OCRCache.make_key(match.encode(), 'osd'))
+    return (text, json.loads(detection)) if detection is not None else None
+
+
+def extract_data_from_image(image, lang='eng', config='', use_cache=True):
+    """Extract words with boxes, layout and confidences in a single OCR pass.
+    
+    Args:
+        image: NumPy array, PIL image, or encoded image bytes (JPG, PNG, ...)
+        lang: Language code for OCR (default: 'eng'), or 'auto' to use the
+            language from detect_language; boxes are then relative to the
+            image turned upright
+        config: Extra Tesseract config flags (default: '')
+        use_cache: Look up and store the result in ocr_cache (default: True)
+    
+    Returns:
+        OCRResult; use .text for the plain text
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        data = bytes(image)
+        pixels = _decode(data)
+        key_config = f"{config}|tsv"
+    else:
+        pixels = data = _to_pixels(image)
+        key_config = f"{config}|tsv|{pixels.shape}|{pixels.dtype}"
+    if lang == AUTO_LANG:
+        detection = detect_language(pixels, use_cache=use_cache)
+        lang = detection['lang']
+        if detection['rotate']:
+            pixels = _rotate(pixels, detection['rotate'])
+            key_config += f"|rotate{detection['rotate']}"
+    key = OCRCache.make_key(data, lang, key_config)
+    
+    # The cache keeps the raw TSV; parsing it is cheap next to OCR
+    tsv = ocr_cache.get(key) if use_cache else None
+    if tsv is None:
+        start = time.perf_counter()
+        with metrics.timer('tesseract_data'):
+            tsv = tesseract_engine.image_to_data(pixels, lang=lang, config=config)
+        if use_cache:
+            ocr_cache.put(key, tsv, time.perf_counter() - start)
+    return OCRResult.from_tsv(tsv)
+
+
+def _to_pixels(image):
+    """Return a C-contiguous NumPy array for a PIL image or array-like."""
+    if isinstance(image, Image.Image):
+        if image.mode not in ('L', 'RGB', 'RGBA'):
+            image = image.convert('RGB')
+        return np.ascontiguousarray(np.asarray(image))
+    if isinstance(image, np.ndarray):
+        return np.ascontiguousarray(image)
+    raise TypeError(f"Unsupported image type: {type(image).__name__}")
+
+
+def _ocr_image_data(data, lang='eng', config='', preprocess=None, regions=False):
+    """Decode encoded image bytes and run Tesseract on them.
+    
+    Kept at module level so it can be shipped to worker processes.
+    
+    Returns:
+        (text, seconds) where seconds is the time spent in Tesseract
+    """
+    try:
+        return _ocr_pixels(_decode(data), lang, config, preprocess, regions)
+    except pytesseract.TesseractNotFoundError as e:
+        # Its constructor takes no message, so it can't be unpickled; sent back
+        # from a worker it would break the shared pool for every caller
+        raise RuntimeError(str(e)) from None
+
+
+def _decode(data):
+    with metrics.timer('decode'):
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Error loading image. The file may be corrupted or not a valid image format.")
+    return image
+
+
+def _ocr_pixels(pixels, lang='eng', config='', preprocess=None, regions=False):
+    """Optionally preprocess, then OCR the whole image or its text regions."""
+    text, seconds, _ = _recognize_pixels(pixels, lang, config, preprocess, regions)
+    return text, seconds
+
+
+def _recognize_pixels(pixels, lang, config, preprocess, regions):
+    """Like _ocr_pixels, but also return the language detection for lang='auto' (else None)."""
+    if preprocess:
+        pixels, timings = preprocess.run(pixels)
+        for stage, seconds in timings.items():
+            metrics.observe('stage_seconds', seconds, stage=f'preprocess_{stage}')
+    if lang == AUTO_LANG:
+        return _ocr_auto(pixels, config, regions)
+    if regions:
+        text, seconds = _ocr_regions(pixels, lang, config)
+    else:
+        text, seconds = _run_tesseract(pixels, lang, config)
+    return text, seconds, None
+
+
+def _run_tesseract(pixels, lang='eng', config=''):
+    """Run Tesseract on decoded pixels and time it."""
+    start = time.perf_counter()
+    with metrics.timer('tesseract'):
+        text = tesseract_engine.image_to_string(pixels, lang=lang, config=config)
+    return text, time.perf_counter() - start
+
+
+# lang value that detects the script and picks the model per image
+AUTO_LANG = 'auto'
+
+# Tesseract OSD script name -> traineddata. Latin covers too many languages
+# to choose from by script alone, so it (and anything unlisted) uses the default.
+SCRIPT_LANGS = {
+    'Arabic': 'ara',
+    'Bengali': 'ben',
+    'Cyrillic': 'rus',
+    'Devanagari': 'hin',
+    'Greek': 'ell',
+    'Gujarati': 'guj',
+    'Gurmukhi': 'pan',
+    'Han': 'chi_sim',
+    'Hangul': 'kor',
+    'Hebrew': 'heb',
+    'Hiragana': 'jpn',
+    'Japanese': 'jpn',
+    'Kannada': 'kan',
+    'Katakana': 'jpn',
+    'Korean': 'kor',
+    'Malayalam': 'mal',
+    'Tamil': 'tam',
+    'Telugu': 'tel',
+    'Thai': 'tha',
+}
+
+# OSD script/orientation confidence below which a detection is not trusted
+AUTO_MIN_CONFIDENCE = 1.0
+
+_installed_langs = None
+
+
+def available_languages():
+    """Return the set of installed Tesseract languages, or None if unknown."""
+    global _installed_langs
+    if _installed_langs is None:
+        try:
+            _installed_langs = frozenset(pytesseract.get_languages(config=''))
+        except (pytesseract.TesseractError, OSError):
+            return None
+    return _installed_langs
+
+
+def detect_language(image, default='eng', max_side=1600, use_cache=True):
+    """Detect the script and orientation of an image with Tesseract OSD.
+    
+    OSD runs on a grayscale copy downscaled to max_side, which costs a
+    fraction of a full OCR pass. Needs osd.traineddata; without it, or when
+    the image has too little text, the default language is returned with
+    confident set to False.
+    
+    Args:
+        image: NumPy array, PIL image, or encoded image bytes (JPG, PNG, ...)
+        default: Language for Latin, unknown or uninstalled scripts
+        max_side: Long side of the copy OSD runs on
+        use_cache: Look up and store the detection in ocr_cache (default: True)
+    
+    Returns:
+        Dict with lang (Tesseract language to OCR with), script,
+        confidence, rotate (degrees clockwise that make the text upright)
+        and confident
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        data = bytes(image)
+        key = OCRCache.make_key(data, 'osd', f"{default}|{max_side}")
+        pixels = None
+    else:
+        pixels = _to_pixels(image)
+        key = OCRCache.make_key(pixels, 'osd', f"{default}|{max_side}|{pixels.shape}|{pixels.dtype}")
+    
+    cached = ocr_cache.get(key) if use_cache else None
+    if cached is not None:
+        return json.loads(cached)
+    if pixels is None:
+        pixels = _decode(data)
+    detection = _detect_pixels(pixels, default, max_side)
+    if use_cache:
+        ocr_cache.put(key, json.dumps(detection))
+    return detection
+
+
+def _detect_pixels(pixels, default='eng', max_side=1600):
+    gray = _to_gray(pixels)
+    scale = min(1.0, max_side / max(gray.shape))
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    try:
+        with metrics.timer('osd'):
+            osd = tesseract_engine.detect_script(np.ascontiguousarray(gray))
+    except (pytesseract.TesseractError, RuntimeError):
+        # No osd.traineddata, or too few characters to tell
+        return {'lang': default, 'script': None, 'confidence': 0.0, 'rotate': 0, 'confident': False}
+    
+    lang = SCRIPT_LANGS.get(osd['script'], default)
+    installed = available_languages()
+    if installed is not None and lang not in installed:
+        lang = default
+    return {
+        'lang': lang,
+        'script': osd['script'],
+        'confidence': osd['script_conf'],
+        'rotate': osd['rotate'] if osd['orientation_conf'] >= AUTO_MIN_CONFIDENCE else 0,
+        'confident': osd['script_conf'] >= AUTO_MIN_CONFIDENCE,
+    }
+
+
+_ROTATIONS = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+def _rotate(pixels, degrees):
+    """Rotate clockwise by a multiple of 90 degrees."""
+    code = _ROTATIONS.get(degrees % 360)
+    return pixels if code is None else cv2.rotate(pixels, code)
+
+
+def _ocr_auto(pixels, config='', regions=False, default='eng'):
+    """Detect the script, then OCR once with the matching language.
+    
+    When OSD is unsure of the script (usually mixed scripts) or regions is
+    set, each text region is detected and OCR'd with its own language.
+    Regions OSD cannot place are read with every language found elsewhere
+    on the page combined (e.g. 'eng+hin').
+    
+    Returns:
+        (text, seconds, detection) where detection is the page-level
+        result of _detect_pixels plus 'langs', the languages used
+    """
+    start = time.perf_counter()
+    detection = _detect_pixels(pixels, default)
+    if detection['rotate']:
+        pixels = _rotate(pixels, detection['rotate'])
+    
+    # A confident single script, or no OSD at all: one full pass
+    if not regions and (detection['confident'] or detection['script'] is None):
+        text, _ = _run_tesseract(pixels, detection['lang'], config)
+        detection['langs'] = [detection['lang']]
+        return text, time.perf_counter() - start, detection
+    
+    with metrics.timer('region_detect'):
+        boxes = detect_text_regions(pixels)
+    crops = [np.ascontiguousarray(pixels[y:y + h, x:x + w]) for x, y, w, h in boxes]
+    if not crops:
+        detection['langs'] = []
+        return "", time.perf_counter() - start, detection
+    
+    workers = min(len(crops), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-region") as executor:
+        found = list(executor.map(lambda crop: _detect_pixels(crop, default), crops))
+        sure = [d['lang'] for d in found if d['confident']]
+        if detection['confident']:
+            sure.append(detection['lang'])
+        combined = '+'.join(dict.fromkeys(sure)) or detection['lang']
+        langs = [d['lang'] if d['confident'] else combined for d in found]
+        # Each crop is one block of text
+        region_config = config or '--psm 6'
+        texts = list(executor.map(lambda crop, lang: _run_tesseract(crop, lang, region_config)[0], crops, langs))
+    detection['langs'] = list(dict.fromkeys(langs))
+    text = "\n".join(t.strip() for t in texts if t.strip())
+    return text, time.perf_counter() - start, detection
+
+
+def detect_text_regions(image, max_side=1600, min_height=8, padding=8):
+    """Find text blocks in an image with OpenCV morphology (CPU only).
+    
+    The image is analysed on a downscaled copy. Strong local gradients are
+    joined horizontally into lines, turned into boxes, and overlapping
+    boxes are merged into blocks.
+    
+    Args:
+        image: NumPy array or PIL image
+        max_side: Long side of the copy used for detection
+        min_height: Smallest text height to keep, in detection pixels
+        padding: Pixels added around each box, in full-size pixels
+    
+    Returns:
+        List of (x, y, w, h) boxes in full-size coordinates, in reading
+        order. An empty list means the image looks blank.
+    """
+    gray = _to_gray(_to_pixels(image))
+    h, w = gray.shape
+    scale = min(1.0, max_side / max(h, w))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    
+    gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    otsu, _ = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    # A floor on the threshold keeps sensor noise on blank frames from counting as text
+    edges = cv2.threshold(gradient, max(otsu, 25), 255, cv2.THRESH_BINARY)[1]
+    join = max(9, small.shape[1] // 100)
+    lines = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (join, 1)))
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    
+    boxes = []
+    for contour in contours:
+        x, y, bw, bh = cv2.boundingRect(contour)
+        if bh < min_height or bw < bh or bh > small.shape[0] * 0.5:
+            continue
+        if cv2.countNonZero(edges[y:y + bh, x:x + bw]) < 0.15 * bw * bh:
+            continue
+        x0 = max(int(x / scale) - padding, 0)
+        y0 = max(int(y / scale) - padding, 0)
+        x1 = min(int((x + bw) / scale) + padding, w)
+        y1 = min(int((y + bh) / scale) + padding, h)
+        boxes.append((x0, y0, x1 - x0, y1 - y0))
+    
+    return _reading_order(_merge_boxes(boxes))
+
+
+def _to_gray(pixels):
+    if pixels.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if pixels.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        return cv2.cvtColor(pixels, code)
+    return pixels
+
+
+def _merge_boxes(boxes):
+    """Merge overlapping boxes until none overlap."""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for box in boxes:
+            x, y, w, h = box
+            for i, (ox, oy, ow, oh) in enumerate(result):
+                if x < ox + ow and ox < x + w and y < oy + oh and oy < y + h:
+                    nx, ny = min(x, ox), min(y, oy)
+                    result[i] = (nx, ny, max(x + w, ox + ow) - nx, max(y + h, oy + oh) - ny)
+                    merged = True
+                    break
+            else:
+                result.append(box)
+        boxes = result
+    return boxes
+
+
+def _reading_order(boxes):
+    """Sort boxes top-to-bottom in rows, then left-to-right within a row."""
+    rows = []
+    for box in sorted(boxes, key=lambda b: b[1]):
+        center = box[1] + box[3] / 2
+        for row in rows:
+            top, bottom = row[0][1], row[0][1] + row[0][3]
+            if top <= center <= bottom:
+                row.append(box)
+                break
+        else:
+            rows.append([box])
+    return [box for row in rows for box in sorted(row, key=lambda b: b[0])]
+
+
+def _ocr_regions(pixels, lang='eng', config='', max_workers=None, max_coverage=0.6):
+    """OCR the detected text regions of an image concurrently.
+    
+    Blank images return '' without calling Tesseract. When the regions
+    cover most of the image, a single full-image pass is cheaper and is
+    used instead.
+    
+    Returns:
+        (text, seconds) with region texts joined in reading order
+    """
+    start = time.perf_counter()
+    with metrics.timer('region_detect'):
+        boxes = detect_text_regions(pixels)
+    if not boxes:
+        return "", time.perf_counter() - start
+    
+    covered = sum(w * h for _, _, w, h in boxes)
+    if covered > max_coverage * pixels.shape[0] * pixels.shape[1]:
+        text, _ = _run_tesseract(pixels, lang, config)
+        return text, time.perf_counter() - start
+    
+    # Each crop is one block of text
+    region_config = config or '--psm 6'
+    crops = [np.ascontiguousarray(pixels[y:y + h, x:x + w]) for x, y, w, h in boxes]
+    workers = max_workers or min(len(crops), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-region") as executor:
+        texts = list(executor.map(lambda crop: _run_tesseract(crop, lang, region_config)[0], crops))
+    text = "\n".join(t.strip() for t in texts if t.strip())
+    return text, time.perf_counter() - start
+
+
+# Size of the one OCR process pool shared by PDFs, batches and the API (default: CPU cores)
+OCR_PROCESS_WORKERS = int(os.environ.get('OCR_PROCESS_WORKERS', 0)) or os.cpu_count() or 1
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def process_pool():
+    """Return the OCR process pool shared by every caller, starting it on first use.
+    
+    Workers come from forkserver (spawn where that is missing), never a
+    plain fork: the callers are Streamlit, job and API threads, and a forked
+    child would inherit whatever locks those threads hold. One pool keeps
+    the OCR process count at OCR_PROCESS_WORKERS however many documents run
+    at once.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _process_pool = ProcessPoolExecutor(max_workers=OCR_PROCESS_WORKERS,
+                                                mp_context=multiprocessing.get_context(method))
+        return _process_pool
+
+
+def discard_process_pool(pool):
+    """Drop a pool that broke (a worker died) so the next caller starts a fresh one."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _PageOCR:
+    """OCR work for one scanned PDF page: cached texts plus pending futures."""
+
+    def __init__(self, fallback_text):
+        self.fallback_text = fallback_text
+        self.parts = []
+
+    def add(self, key, value):
+        self.parts.append((key, value))
+
+    def result(self):
+        texts = []
+        for key, value in self.parts:
+            if isinstance(value, str):
+                texts.append(value)
+            else:
+                text, seconds = value.result()
+                ocr_cache.put(key, text, seconds)
+                texts.append(text)
+        text = "\n".join(t.strip() for t in texts if t.strip())
+        # Keep whatever the text layer had if OCR found nothing better
+        return text or self.fallback_text
+
+    def cancel(self):
+        for _, value in self.parts:
+            if not isinstance(value, str):
+                value.cancel()
+
+
+def iter_pdf_pages(pdf_file, lang='eng', ocr_fallback=True, max_workers=None):
+    """Stream text from a PDF one page at a time.
+    
+    The PDF is parsed once; each page is extracted only when the caller
+    asks for it. Pages with a text layer take the fast path. Pages without
+    one (scans) have their page images sent through the same Tesseract path
+    as extract_text, spread over the shared process_pool(). Pages are
+    always yielded in document order.
     
     Args:
         pdf_file: PDF file object
         lang: Language code for OCR (default: 'eng')
+        ocr_fallback: OCR pages that have no text layer (default: True)
+        max_workers: Images this document may keep busy in the pool at once
+            (default: OCR_PROCESS_WORKERS); 1 runs OCR in the calling
+            process without the pool
+    
+    Yields:
+        (page_number, text) tuples, with 1-based page numbers
     """
-    text = ""
+    max_workers = max_workers or OCR_PROCESS_WORKERS
+    executor = None
+    # Pages waiting to be yielded; OCR may run ahead by a bounded amount
+    pending = deque()
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += f"\n--- Page {page_num + 1} ---\n"
-            text += page.extract_text()
-        return text
+        if metrics.enabled and hasattr(pdf_file, 'seek'):
+            position = pdf_file.tell()
+            metrics.inc('bytes_in_total', pdf_file.seek(0, os.SEEK_END) - position, kind='pdf')
+            pdf_file.seek(position)
+        with metrics.timer('pdf_open'):
+            pdf_reader = PyPDF2.PdfReader(pdf_file)
+        for page_num, page in enumerate(_iter_page_objects(pdf_reader), start=1):
+            with metrics.timer('pdf_page_parse'):
+                text = page.extract_text() or ""
+                images = page.images if ocr_fallback and not text.strip() else []
+            if not images:
+                metrics.inc('pages_total', source='text_layer' if text.strip() else 'empty')
+                pending.append((page_num, text))
+            else:
+                metrics.inc('pages_total', source='ocr')
+                page_ocr = _PageOCR(text)
+                for image in images:
+                    key = OCRCache.make_key(image.data, lang)
+                    cached = ocr_cache.get(key)
+                    if cached is None and max_workers == 1:
+                        cached, seconds = _ocr_image_data(image.data, lang)
+                        ocr_cache.put(key, cached, seconds)
+                    elif cached is None:
+                        if executor is None:
+                            executor = process_pool()
+                        cached = executor.submit(_ocr_image_data, image.data, lang)
+                    page_ocr.add(key, cached)
+                # Without a pool every part is already text, so resolve now
+                pending.append((page_num, page_ocr.result() if executor is None else page_ocr))
+            
+            while pending and (isinstance(pending[0][1], str) or len(pending) > 2 * max_workers):
+                yield _resolve_page(pending.popleft())
+        
+        while pending:
+            yield _resolve_page(pending.popleft())
+    except BrokenProcessPool as e:
+        discard_process_pool(executor)
+        raise Exception(f"Error reading PDF: {str(e)}")
     except Exception as e:
         raise Exception(f"Error reading PDF: {str(e)}")
+    finally:
+        # The pool is shared: only this document's queued work is cancelled
+        for _, value in pending:
+            if isinstance(value, _PageOCR):
+                value.cancel()
+
+
+# Page attributes a /Page takes from its /Pages ancestors unless it sets them itself
+_INHERITED_PAGE_ATTRIBUTES = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+
+def _iter_page_objects(pdf_reader):
+    """Yield the pages of a PdfReader while walking the page tree.
+    
+    PdfReader.pages builds the list of every page before returning the
+    first one, which takes seconds on very long documents. Walking the
+    tree lazily keeps the time to the first page independent of length.
+    """
+    return _walk_page_tree(pdf_reader, pdf_reader.trailer['/Root'].get_object()['/Pages'], {})
+
+
+def _walk_page_tree(pdf_reader, node, inherited, reference=None):
+    node = node.get_object()
+    if node.get('/Type', '/Pages') == '/Pages':
+        inherited = {**inherited, **{name: node[name] for name in _INHERITED_PAGE_ATTRIBUTES if name in node}}
+        for kid in node['/Kids']:
+            yield from _walk_page_tree(pdf_reader, kid, inherited,
+                                       kid if isinstance(kid, PyPDF2.generic.IndirectObject) else None)
+    elif node['/Type'] == '/Page':
+        for name, value in inherited.items():
+            if name not in node:
+                node[PyPDF2.generic.NameObject(name)] = value
+        page = PyPDF2.PageObject(pdf_reader, reference)
+        page.update(node)
+        yield page
+
+
+def count_pdf_pages(pdf_file):
+    """Return the number of pages in a PDF without loading every page.
+    
+    Raises:
+        PyPDF2.errors.PdfReadError: if the file is not a readable PDF
+    """
+    pdf_reader = PyPDF2.PdfReader(pdf_file)
+    try:
+        # The page tree root records the total
+        return int(pdf_reader.trailer['/Root']['/Pages']['/Count'])
+    except (KeyError, TypeError, ValueError):
+        return len(pdf_reader.pages)
+
+
+def _resolve_page(entry):
+    page_num, value = entry
+    if isinstance(value, _PageOCR):
+        value = value.result()
+    return page_num, value
+
+
+def extract_text_from_pdf(pdf_file, lang='eng', ocr_fallback=True, max_workers=None):
+    """Extract text from a PDF file.
+    
+    Args:
+        pdf_file: PDF file object
+        lang: Language code for OCR (default: 'eng')
+        ocr_fallback: OCR pages that have no text layer (default: True)
+        max_workers: Images OCR'd at once (default: OCR_PROCESS_WORKERS)
+    """
+    parts = []
+    for page_num, page_text in iter_pdf_pages(pdf_file, lang=lang, ocr_fallback=ocr_fallback, max_workers=max_workers):
+        parts.append(f"\n--- Page {page_num} ---\n")
+        parts.append(page_text)
+    return "".join(parts)
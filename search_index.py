@@ -0,0 +1,518 @@
+"""Persistent full-text index over extracted documents.
+
+    python search_index.py index.db 'invoice "INV-2024-0042"'
+    python search_index.py index.db --stats
+
+    index = SearchIndex('index.db')
+    index.add(sha256, 'scan.pdf', pages)       # no-op if sha256 is indexed already
+    index.flush()
+    index.search('"net 30" acme')              # [{'name': ..., 'page': 3, ...}, ...]
+
+Documents are keyed by the SHA-256 of their content, so ingesting a file
+again does nothing. Text is split into lowercase word tokens. Each term
+has a posting list with one entry per page it occurs on, holding the
+token positions, so phrase queries work and hits point at a page.
+
+Posting lists are delta-encoded NumPy arrays, zlib-compressed and stored
+in SQLite. Page numbers and counts are compressed apart from positions,
+so a plain term query never decompresses positions. Added documents are
+buffered and written by flush() as a new segment, an append that leaves
+existing postings untouched. Once MERGE_FACTOR segments of one size pile
+up, they are merged into one segment of the next size, so a term is
+never spread over more than a few dozen rows. Reads and writes from
+several processes are safe; SQLite serializes the writers.
+
+Set SEARCH_INDEX_PATH to have the app, the HTTP API and background jobs
+add everything they extract (see index_document).
+"""
+import argparse
+import atexit
+import json
+import os
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from metrics import metrics
+
+# Index file the app, API and jobs add to (default: none)
+SEARCH_INDEX_PATH = os.environ.get('SEARCH_INDEX_PATH') or None
+
+# Segments of one level merged into one of the next level
+MERGE_FACTOR = 8
+
+TOKEN_RE = re.compile(r'\w+')
+# A quoted phrase, or a bare word (which may itself split into a phrase, e.g. INV-2024-0042)
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+SNIPPET_CHARS = 160
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY, sha256 TEXT UNIQUE NOT NULL, name TEXT, pages INTEGER, added REAL);
+CREATE TABLE IF NOT EXISTS pages (
+    doc INTEGER, page INTEGER, text BLOB, PRIMARY KEY (doc, page)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY, level INTEGER, first_doc INTEGER, last_doc INTEGER);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT, segment INTEGER, data BLOB, PRIMARY KEY (term, segment)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_by_segment ON postings (segment);
+"""
+
+
+def tokenize(text):
+    """Return the lowercase word tokens of text, in order."""
+    return TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    """An inverted index with per-page postings in one SQLite file.
+
+    Args:
+        path: Index file; created if missing
+        flush_docs: Documents buffered before add() flushes by itself
+        store_text: Keep compressed page texts, for snippets in hits
+
+    Thread-safe.
+    """
+
+    def __init__(self, path, flush_docs=64, store_text=True):
+        self.path = path
+        self.flush_docs = flush_docs
+        self.store_text = store_text
+        self._pending = []
+        self._pending_hashes = set()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def has(self, sha256):
+        """Return True if a document with this content hash is indexed or pending."""
+        with self._lock:
+            if sha256 in self._pending_hashes:
+                return True
+            return self._db.execute("SELECT 1 FROM documents WHERE sha256 = ?", (sha256,)).fetchone() is not None
+
+    def add(self, sha256, name, pages):
+        """Queue a document's page texts for indexing.
+
+        Args:
+            sha256: Hex SHA-256 of the document's content (the file bytes)
+            name: Name shown in hits, e.g. the file name
+            pages: Page texts in page order; an image is one page
+
+        Returns:
+            False if the document is indexed already, else True
+        """
+        with self._lock:
+            if self.has(sha256):
+                return False
+            self._pending.append((sha256, name, [page or "" for page in pages]))
+            self._pending_hashes.add(sha256)
+            if len(self._pending) >= self.flush_docs:
+                self.flush()
+            return True
+
+    def flush(self):
+        """Write queued documents as a new segment, then merge segments if due."""
+        with self._lock:
+            if not self._pending:
+                return
+            with metrics.timer('index_write'):
+                self._write_segment(self._pending)
+            self._pending = []
+            self._pending_hashes.clear()
+            while self._merge_once():
+                pass
+
+    def search(self, query, limit=20):
+        """Find pages that contain every word and phrase in query.
+
+        Quoted text is a phrase; so is a bare word that splits into
+        several tokens, such as INV-2024-0042. Matching ignores case and
+        punctuation. Queued documents are flushed first.
+
+        Returns:
+            Up to limit hits, most matches first, then newest first. Each
+            is a dict with name, sha256, page, score (occurrences of the
+            query terms on the page) and snippet ('' without store_text).
+        """
+        phrases = [tokenize(quoted or word) for quoted, word in QUERY_RE.findall(query)]
+        phrases = [phrase for phrase in phrases if phrase]
+        if not phrases:
+            return []
+        with self._lock:
+            self.flush()
+            postings = {}
+            candidates = None
+            # Rarest terms first, so the candidate set shrinks fastest
+            for term in sorted({term for phrase in phrases for term in phrase}, key=self._postings_size):
+                postings[term] = self._load(term)
+                keys = postings[term].keys
+                candidates = keys if candidates is None else np.intersect1d(candidates, keys, assume_unique=True)
+                if not len(candidates):
+                    return []
+
+            for phrase in phrases:
+                if len(phrase) > 1:
+                    candidates = _phrase_matches(candidates, [postings[term] for term in phrase])
+                    if not len(candidates):
+                        return []
+
+            scores = sum(postings[term].counts_at(candidates) for term in postings)
+            # Most matches first, then newest (highest document id)
+            order = np.lexsort((-candidates, -scores))[:limit]
+            return [self._hit(int(candidates[i]), int(scores[i]), phrases[0]) for i in order]
+
+    def stats(self):
+        with self._lock:
+            documents, pages = self._db.execute("SELECT COUNT(*), COALESCE(SUM(pages), 0) FROM documents").fetchone()
+            segments = self._db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            postings_bytes = self._db.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM postings").fetchone()[0]
+            return {
+                "documents": documents,
+                "pages": pages,
+                "pending": len(self._pending),
+                "segments": segments,
+                "postings_bytes": postings_bytes,
+                "file_bytes": os.path.getsize(self.path),
+            }
+
+    def optimize(self):
+        """Flush, then merge every segment into one, for the fastest queries."""
+        with self._lock:
+            self.flush()
+            segments = self._segments()
+            if len(segments) > 1:
+                self._merge([segment_id for segment_id, _ in segments], max(level for _, level in segments) + 1)
+
+    def close(self):
+        with self._lock:
+            if self._db is None:
+                return
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _write_segment(self, documents):
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            terms = {}
+            first_doc = last_doc = None
+            for sha256, name, pages in documents:
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO documents (sha256, name, pages, added) VALUES (?, ?, ?, ?)",
+                    (sha256, name, len(pages), time.time()))
+                if not cursor.rowcount:
+                    # Another process indexed the same content meanwhile
+                    continue
+                doc_id = cursor.lastrowid
+                first_doc = doc_id if first_doc is None else first_doc
+                last_doc = doc_id
+                for page_num, text in enumerate(pages, 1):
+                    if self.store_text:
+                        db.execute("INSERT INTO pages (doc, page, text) VALUES (?, ?, ?)",
+                                   (doc_id, page_num, zlib.compress(text.encode('utf-8'))))
+                    page_terms = {}
+                    for position, token in enumerate(tokenize(text)):
+                        page_terms.setdefault(token, []).append(position)
+                    for term, positions in page_terms.items():
+                        docs, page_nums, counts, all_positions = terms.setdefault(term, ([], [], [], []))
+                        docs.append(doc_id)
+                        page_nums.append(page_num)
+                        counts.append(len(positions))
+                        all_positions.extend(positions)
+            if first_doc is not None:
+                segment_id = db.execute("INSERT INTO segments (level, first_doc, last_doc) VALUES (0, ?, ?)",
+                                        (first_doc, last_doc)).lastrowid
+                db.executemany("INSERT INTO postings (term, segment, data) VALUES (?, ?, ?)",
+                               ((term, segment_id, data) for term, data in _encode_terms(terms)))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _segments(self):
+        """Return [(segment_id, level)] in document order."""
+        return self._db.execute("SELECT id, level FROM segments ORDER BY first_doc").fetchall()
+
+    def _merge_once(self):
+        # Only neighbours in document order are merged, so segments never overlap
+        segments = self._segments()
+        for i in range(len(segments) - MERGE_FACTOR + 1):
+            run = segments[i:i + MERGE_FACTOR]
+            level = run[0][1]
+            if all(segment_level == level for _, segment_level in run):
+                self._merge([segment_id for segment_id, _ in run], level + 1)
+                return True
+        return False
+
+    def _merge(self, segment_ids, level):
+        with metrics.timer('index_merge'):
+            self._merge_segments(segment_ids, level)
+
+    def _merge_segments(self, segment_ids, level):
+        db = self._db
+        marks = ",".join("?" * len(segment_ids))
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            found, first_doc, last_doc = db.execute(
+                f"SELECT COUNT(*), MIN(first_doc), MAX(last_doc) FROM segments WHERE id IN ({marks})",
+                segment_ids).fetchone()
+            if found < len(segment_ids):
+                # Another process merged them first
+                db.execute("ROLLBACK")
+                return
+            order = {segment_id: position for position, (segment_id,) in enumerate(db.execute(
+                f"SELECT id FROM segments WHERE id IN ({marks}) ORDER BY first_doc", segment_ids))}
+            terms = {}
+            for term, segment_id, data in db.execute(
+                    f"SELECT term, segment, data FROM postings WHERE segment IN ({marks})", segment_ids):
+                terms.setdefault(term, []).append((order[segment_id], data))
+            merged_id = db.execute("INSERT INTO segments (level, first_doc, last_doc) VALUES (?, ?, ?)",
+                                   (level, first_doc, last_doc)).lastrowid
+
+            # Most terms are rare and sit in one segment only; their postings are copied as they are
+            spread = {}
+            for term, blobs in terms.items():
+                if len(blobs) > 1:
+                    parts = [(*_decode(data), _position_deltas(data)) for _, data in sorted(blobs, key=lambda blob: blob[0])]
+                    spread[term] = [np.concatenate(arrays) for arrays in zip(*parts)]
+            db.executemany("INSERT INTO postings (term, segment, data) VALUES (?, ?, ?)",
+                           ((term, merged_id, blobs[0][1]) for term, blobs in sorted(terms.items()) if len(blobs) == 1))
+            db.executemany("INSERT INTO postings (term, segment, data) VALUES (?, ?, ?)",
+                           ((term, merged_id, data) for term, data in _encode_terms(spread, position_deltas=True)))
+            db.execute(f"DELETE FROM postings WHERE segment IN ({marks})", segment_ids)
+            db.execute(f"DELETE FROM segments WHERE id IN ({marks})", segment_ids)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _postings_size(self, term):
+        return self._db.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM postings WHERE term = ?",
+                                (term,)).fetchone()[0]
+
+    def _load(self, term):
+        rows = self._db.execute(
+            "SELECT p.data FROM postings p JOIN segments s ON s.id = p.segment WHERE p.term = ? ORDER BY s.first_doc",
+            (term,)).fetchall()
+        return _Postings([data for (data,) in rows])
+
+    def _hit(self, key, score, first_phrase):
+        doc_id, page = key >> 32, key & 0xFFFFFFFF
+        name, sha256 = self._db.execute("SELECT name, sha256 FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        row = self._db.execute("SELECT text FROM pages WHERE doc = ? AND page = ?", (doc_id, page)).fetchone()
+        snippet = _snippet(zlib.decompress(row[0]).decode('utf-8'), first_phrase) if row else ""
+        return {'name': name, 'sha256': sha256, 'page': page, 'score': score, 'snippet': snippet}
+
+
+class _Postings:
+    """One term's postings across segments: (doc, page) keys, counts and, on demand, positions."""
+
+    def __init__(self, blobs):
+        self._blobs = blobs
+        parts = [_decode(blob) for blob in blobs]
+        docs = np.concatenate([part[0] for part in parts]) if parts else np.empty(0, dtype=np.int64)
+        pages = np.concatenate([part[1] for part in parts]) if parts else np.empty(0, dtype=np.int64)
+        self.counts = np.concatenate([part[2] for part in parts]) if parts else np.empty(0, dtype=np.int64)
+        # (doc, page) in one sortable int64
+        self.keys = (docs << 32) | pages
+        self._positions = None
+
+    def counts_at(self, keys):
+        return self.counts[np.searchsorted(self.keys, keys)]
+
+    def positions_at(self, indexes):
+        """Return (owners, positions): every position on the entries at indexes, and which of indexes it is on."""
+        if self._positions is None:
+            self._positions = np.concatenate([_decode(blob, positions=True)[3] for blob in self._blobs])
+            self._offsets = np.cumsum(self.counts) - self.counts
+        counts = self.counts[indexes]
+        owners = np.repeat(np.arange(len(indexes)), counts)
+        within = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return owners, self._positions[self._offsets[indexes][owners] + within]
+
+
+def _phrase_matches(candidates, postings):
+    """Keep the candidate pages where the terms occur next to each other, in order."""
+    # Shift each term's positions back by its place in the phrase; a (candidate, start) every term has is a match
+    starts = None
+    for offset, term in enumerate(postings):
+        owners, positions = term.positions_at(term.keys.searchsorted(candidates))
+        keep = positions >= offset
+        keys = (owners[keep] << 32) | (positions[keep] - offset)
+        starts = keys if starts is None else np.intersect1d(starts, keys, assume_unique=True)
+    return candidates[np.unique(starts >> 32)]
+
+
+def _snippet(text, phrase):
+    match = re.search(r'\W+'.join(re.escape(term) for term in phrase), text, re.IGNORECASE)
+    if match is None:
+        return text[:SNIPPET_CHARS].strip()
+    start = max(0, match.start() - SNIPPET_CHARS // 2)
+    snippet = " ".join(text[start:start + SNIPPET_CHARS].split())
+    return ("…" if start else "") + snippet + ("…" if start + SNIPPET_CHARS < len(text) else "")
+
+
+_DTYPES = (np.uint8, np.uint16, np.uint32, np.uint64)
+_DTYPE_LIMITS = [np.iinfo(dtype).max for dtype in _DTYPES[:-1]]
+
+# Flag in the dtype byte: values are stored as they are. Setting up zlib costs more than it saves on a few bytes.
+_RAW = 0x80
+_RAW_BYTES = 64
+
+
+def _pack(code, data):
+    if len(data) < _RAW_BYTES:
+        return bytes([code | _RAW]) + data
+    return bytes([code]) + zlib.compress(data)
+
+
+def _unpack(blob):
+    """Return the integers stored by _pack: 1 byte of _DTYPES index, then the values, usually zlib-compressed."""
+    data = blob[1:] if blob[0] & _RAW else zlib.decompress(blob[1:])
+    return np.frombuffer(data, dtype=_DTYPES[blob[0] & ~_RAW]).astype(np.int64)
+
+
+def _encode_terms(terms, position_deltas=False):
+    """Encode postings; yield (term, blob) for each item of terms.
+
+    Each value of terms is (docs, pages, counts, positions), entries
+    sorted by (doc, page) and positions concatenated in entry order.
+    With position_deltas, positions are encoded already (as from
+    _position_deltas), which saves a merge from decoding them.
+
+    Blob layout: entry count and head size (uint32 each), then the head
+    (doc deltas, pages and counts, compressed together), then positions.
+    Each run's first doc and each entry's first position are absolute,
+    the others are deltas. Terms are encoded all at once, so a term costs
+    a few slices and two zlib calls, not a round of NumPy calls.
+    """
+    if not terms:
+        return
+    # In key order, so inserts walk SQLite's B-tree once instead of jumping around it
+    names = sorted(terms)
+    columns = [np.concatenate([np.asarray(terms[name][column], dtype=np.int64) for name in names])
+               for column in range(4)]
+    docs, pages, counts, positions = columns
+    bounds = np.cumsum([0] + [len(terms[name][0]) for name in names])
+    starts = bounds[:-1]
+    position_bounds = np.concatenate([[0], np.cumsum(counts)])
+
+    doc_deltas = np.diff(docs, prepend=0)
+    doc_deltas[starts] = docs[starts]
+    if not position_deltas:
+        entry_starts = position_bounds[:-1]
+        encoded = np.diff(positions, prepend=0)
+        encoded[entry_starts] = positions[entry_starts]
+        positions = encoded
+
+    # Narrowest dtype per term, for the head and the positions separately
+    head_codes = np.searchsorted(_DTYPE_LIMITS, np.maximum.reduceat(
+        np.maximum(np.maximum(doc_deltas, pages), counts), starts)).tolist()
+    position_codes = np.searchsorted(_DTYPE_LIMITS, np.maximum.reduceat(
+        positions, position_bounds[starts])).tolist()
+    heads = {code: [column.astype(_DTYPES[code]) for column in (doc_deltas, pages, counts)] for code in set(head_codes)}
+    deltas = {code: positions.astype(_DTYPES[code]) for code in set(position_codes)}
+
+    bounds = bounds.tolist()
+    position_bounds = position_bounds.tolist()
+    for i, name in enumerate(names):
+        start, end = bounds[i], bounds[i + 1]
+        head = _pack(head_codes[i], b"".join(column[start:end].tobytes() for column in heads[head_codes[i]]))
+        body = _pack(position_codes[i], deltas[position_codes[i]][position_bounds[start]:position_bounds[end]].tobytes())
+        yield name, struct.pack('<II', end - start, len(head)) + head + body
+
+
+def _decode(blob, positions=False):
+    """Return (docs, pages, counts) from _encode_terms, plus positions if asked for."""
+    count, head_size = struct.unpack_from('<II', blob)
+    head = _unpack(blob[8:8 + head_size])
+    docs, pages, counts = np.cumsum(head[:count]), head[count:2 * count], head[2 * count:]
+    if not positions:
+        return docs, pages, counts
+    deltas = _position_deltas(blob)
+    sums = np.cumsum(deltas)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return docs, pages, counts, sums - np.repeat(sums[starts] - deltas[starts], counts)
+
+
+def _position_deltas(blob):
+    count, head_size = struct.unpack_from('<II', blob)
+    return _unpack(blob[8 + head_size:])
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_index(path=None):
+    """Return this process's SearchIndex for path (default: SEARCH_INDEX_PATH), or None if neither is set.
+
+    Queued documents are flushed when the interpreter exits.
+    """
+    path = path or SEARCH_INDEX_PATH
+    if not path:
+        return None
+    with _shared_lock:
+        index = _shared.get(path)
+        if index is None:
+            index = _shared[path] = SearchIndex(path)
+            atexit.register(index.close)
+        return index
+
+
+def index_document(sha256, name, pages):
+    """Add a finished document to the shared index right away; does nothing unless SEARCH_INDEX_PATH is set."""
+    index = shared_index()
+    if index is not None:
+        index.add(sha256, name, pages)
+        index.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the full-text index of extracted documents.")
+    parser.add_argument('index', help="Index file")
+    parser.add_argument('query', nargs='?', help='Words and "quoted phrases" that must all be on the page')
+    parser.add_argument('-n', '--limit', type=int, default=20, help="Maximum hits (default: 20)")
+    parser.add_argument('--json', action='store_true', help="Print hits as JSON lines")
+    parser.add_argument('--stats', action='store_true', help="Print index statistics")
+    parser.add_argument('--optimize', action='store_true', help="Merge all segments into one")
+    args = parser.parse_args(argv)
+
+    with SearchIndex(args.index) as index:
+        if args.optimize:
+            index.optimize()
+        if args.stats:
+            print(json.dumps(index.stats()))
+        if args.query:
+            start = time.perf_counter()
+            hits = index.search(args.query, limit=args.limit)
+            for hit in hits:
+                if args.json:
+                    print(json.dumps(hit, ensure_ascii=False))
+                else:
+                    print(f"{hit['name']} p.{hit['page']} ({hit['score']}): {hit['snippet']}")
+            print(f"{len(hits)} hits in {1000 * (time.perf_counter() - start):.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
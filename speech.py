@@ -0,0 +1,320 @@
+import os
+import subprocess
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import speech_recognition as sr
+
+from metrics import metrics
+
+# Voice-activity detection defaults
+FRAME_MS = 30
+MIN_SILENCE_SECONDS = 0.5
+MIN_CHUNK_SECONDS = 5.0
+MAX_CHUNK_SECONDS = 30.0
+MIN_ENERGY_THRESHOLD = 300
+NOISE_RATIO = 3.0
+# The noise floor is a low percentile of recent frame energies, so it can
+# fall as well as rise and is not fooled by audio that starts mid-speech
+NOISE_WINDOW_SECONDS = 10.0
+NOISE_PERCENTILE = 10
+
+# Rate media audio is resampled to; plenty for speech recognizers
+MEDIA_SAMPLE_RATE = 16000
+
+
+class GoogleRecognizer:
+    """Recognize speech with the Google Web Speech API (online)."""
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+
+    def __call__(self, audio_data, language):
+        return self.recognizer.recognize_google(audio_data, language=language)
+
+
+class SphinxRecognizer:
+    """Recognize speech with CMU PocketSphinx (offline, needs pocketsphinx)."""
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+
+    def __call__(self, audio_data, language):
+        return self.recognizer.recognize_sphinx(audio_data, language=language)
+
+
+RECOGNIZERS = {
+    "google": GoogleRecognizer,
+    "sphinx": SphinxRecognizer,
+}
+
+
+def get_recognizer(recognizer):
+    """Resolve a recognizer name from RECOGNIZERS, or pass a callable through."""
+    if callable(recognizer):
+        return recognizer
+    try:
+        return RECOGNIZERS[recognizer]()
+    except KeyError:
+        raise ValueError(f"Unknown speech recognizer '{recognizer}'. Choose from: {', '.join(RECOGNIZERS)}")
+
+
+def frame_energy(frame, sample_width):
+    """Return the RMS energy of a block of little-endian PCM samples."""
+    if sample_width == 1:
+        # Centred and scaled to the 16-bit range, like the wider formats below
+        samples = (np.frombuffer(frame, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif sample_width == 2:
+        samples = np.frombuffer(frame, dtype='<i2')
+    elif sample_width == 3:
+        raw = np.frombuffer(frame[:len(frame) - len(frame) % 3], dtype=np.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int8).astype(np.int32) << 16)) >> 8
+    else:
+        samples = np.frombuffer(frame, dtype='<i4') >> 16
+    if samples.size == 0:
+        return 0.0
+    samples = samples.astype(np.float64)
+    return float(np.sqrt(np.mean(samples * samples)))
+
+
+def split_on_silence(blocks, sample_rate, sample_width, frame_ms=FRAME_MS,
+                     energy_threshold=None, min_silence=MIN_SILENCE_SECONDS,
+                     min_chunk=MIN_CHUNK_SECONDS, max_chunk=MAX_CHUNK_SECONDS):
+    """Cut a stream of mono PCM into speech chunks at silence boundaries.
+
+    Uses energy-based voice-activity detection: frames louder than the
+    threshold count as speech. When no threshold is given it adapts to the
+    background noise floor: a low percentile of the last few seconds of
+    frame energies, taken when those seconds hold both quiet and loud
+    frames. Until then MIN_ENERGY_THRESHOLD alone decides. A chunk is
+    closed once it is at least min_chunk seconds long and followed by
+    min_silence seconds of silence, or when it reaches max_chunk seconds.
+    Chunks with no speech at all are dropped.
+
+    Args:
+        blocks: Iterable of raw PCM byte blocks of any size
+        sample_rate: Samples per second
+        sample_width: Bytes per sample
+        frame_ms: VAD frame length in milliseconds
+        energy_threshold: Fixed RMS threshold (default: adaptive)
+        min_silence: Seconds of silence that may end a chunk
+        min_chunk: Minimum chunk length before a silence cut, in seconds
+        max_chunk: Hard upper bound on chunk length, in seconds
+
+    Yields:
+        speech_recognition.AudioData chunks, in order
+    """
+    frame_bytes = max(1, int(sample_rate * frame_ms / 1000)) * sample_width
+    frame_seconds = frame_bytes / (sample_rate * sample_width)
+    recent = deque(maxlen=max(1, round(NOISE_WINDOW_SECONDS / frame_seconds)))
+    noise_floor = 0.0
+    frames = 0
+
+    chunk = bytearray()
+    chunk_has_speech = False
+    silence = 0.0
+    pending = b""
+
+    for block in blocks:
+        pending += block
+        usable = len(pending) - len(pending) % frame_bytes
+        for offset in range(0, usable, frame_bytes):
+            frame = pending[offset:offset + frame_bytes]
+            energy = frame_energy(frame, sample_width)
+            frames += 1
+
+            if energy_threshold is not None:
+                threshold = energy_threshold
+            else:
+                recent.append(energy)
+                # Re-estimated every 10 frames; the floor moves slowly and the percentile is not free
+                if len(recent) == recent.maxlen and frames % 10 == 0:
+                    low, high = np.percentile(recent, (NOISE_PERCENTILE, 100 - NOISE_PERCENTILE))
+                    # A window without quiet and loud frames (one long sound) says nothing about the floor
+                    if high > low * NOISE_RATIO:
+                        noise_floor = low
+                threshold = max(MIN_ENERGY_THRESHOLD, noise_floor * NOISE_RATIO)
+
+            if energy > threshold:
+                chunk_has_speech = True
+                silence = 0.0
+            else:
+                silence += frame_seconds
+            chunk += frame
+
+            duration = len(chunk) / (sample_rate * sample_width)
+            if (duration >= min_chunk and silence >= min_silence) or duration >= max_chunk:
+                if chunk_has_speech:
+                    yield sr.AudioData(bytes(chunk), sample_rate, sample_width)
+                chunk = bytearray()
+                chunk_has_speech = False
+                silence = 0.0
+        pending = pending[usable:]
+
+    chunk += pending
+    if chunk_has_speech and chunk:
+        yield sr.AudioData(bytes(chunk), sample_rate, sample_width)
+
+
+def transcribe_chunks(chunks, language='en-US', recognizer='google', max_workers=4):
+    """Recognize audio chunks concurrently and yield results in order.
+
+    At most 2 * max_workers chunks are in flight, so memory stays bounded
+    no matter how long the input is. Chunks the recognizer cannot make out
+    come back as empty strings instead of failing the whole transcript.
+
+    Args:
+        chunks: Iterable of speech_recognition.AudioData
+        language: Recognition language, e.g. 'en-US'
+        recognizer: Name from RECOGNIZERS or a callable (audio_data, language) -> text
+        max_workers: Maximum concurrent recognition calls
+
+    Yields:
+        (chunk_index, text) tuples, in chunk order
+    """
+    recognize = get_recognizer(recognizer)
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speech") as executor:
+        try:
+            for index, chunk in enumerate(chunks):
+                in_flight.append((index, executor.submit(_recognize_chunk, recognize, chunk, language)))
+                if len(in_flight) >= 2 * max_workers:
+                    index, future = in_flight.popleft()
+                    yield index, future.result()
+            while in_flight:
+                index, future = in_flight.popleft()
+                yield index, future.result()
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
+
+def _recognize_chunk(recognize, audio_data, language):
+    metrics.inc('audio_seconds_total', len(audio_data.frame_data) / (audio_data.sample_rate * audio_data.sample_width))
+    try:
+        with metrics.timer('speech_recognize'):
+            text = recognize(audio_data, language)
+    except sr.UnknownValueError:
+        return ""
+    metrics.inc('chars_out_total', len(text), stage='speech')
+    return text
+
+
+def iter_audio_file(path, block_seconds=1.0):
+    """Read an audio file (WAV, AIFF or FLAC) as mono PCM blocks.
+
+    Yields:
+        (sample_rate, sample_width, block) tuples
+    """
+    with sr.AudioFile(path) as source:
+        block_frames = max(1, int(source.SAMPLE_RATE * block_seconds))
+        while True:
+            block = source.stream.read(block_frames)
+            if not block:
+                break
+            yield source.SAMPLE_RATE, source.SAMPLE_WIDTH, block
+
+
+def iter_media_audio(path, sample_rate=MEDIA_SAMPLE_RATE, block_seconds=1.0):
+    """Decode the audio track of a video or audio file as it plays.
+
+    ffmpeg (from imageio-ffmpeg) decodes and resamples to mono 16-bit PCM
+    and writes it to a pipe, so nothing is written to disk. ffmpeg keeps
+    decoding the next window while the caller works on the current one.
+
+    Args:
+        path: Path to any media file ffmpeg can read
+        sample_rate: Output sample rate in Hz (default: MEDIA_SAMPLE_RATE)
+        block_seconds: Length of each yielded block in seconds
+
+    Yields:
+        Raw PCM blocks (mono, 16-bit little-endian)
+    """
+    import imageio_ffmpeg
+
+    command = [
+        imageio_ffmpeg.get_ffmpeg_exe(), '-nostdin', '-loglevel', 'error',
+        '-i', path, '-vn', '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', '-',
+    ]
+    block_bytes = int(sample_rate * block_seconds) * 2
+    # stderr goes to a file: a pipe nobody reads while stdout streams could fill up and stall ffmpeg
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+        try:
+            while True:
+                with metrics.timer('audio_decode'):
+                    block = process.stdout.read(block_bytes)
+                if not block:
+                    break
+                yield block
+            process.wait()
+            if process.returncode != 0:
+                # Also after some audio came out: a cut-off track must not pass for a short one
+                errors.seek(0)
+                error = errors.read().decode('utf-8', 'replace').strip()[-2000:]
+                raise RuntimeError(f"Could not decode audio: {error or 'ffmpeg exited with code ' + str(process.returncode)}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+
+def transcribe_file(path, language='en-US', recognizer='google', max_workers=4, **vad_options):
+    """Stream-transcribe an audio file in bounded memory.
+
+    The file is read in small blocks, cut into chunks at silences and the
+    chunks are recognized concurrently.
+
+    Args:
+        path: Path to a WAV, AIFF or FLAC file
+        language: Recognition language, e.g. 'en-US'
+        recognizer: Name from RECOGNIZERS or a callable (audio_data, language) -> text
+        max_workers: Maximum concurrent recognition calls
+        **vad_options: Extra keyword arguments for split_on_silence
+
+    Yields:
+        (chunk_index, text) tuples, in order, as soon as each is ready
+    """
+    if metrics.enabled:
+        metrics.inc('bytes_in_total', os.path.getsize(path), kind='audio')
+    blocks = iter_audio_file(path)
+    first = next(blocks, None)
+    if first is None:
+        return
+    sample_rate, sample_width, _ = first
+
+    def pcm():
+        yield first[2]
+        for _, _, block in blocks:
+            yield block
+
+    chunks = split_on_silence(pcm(), sample_rate, sample_width, **vad_options)
+    yield from transcribe_chunks(chunks, language, recognizer, max_workers)
+
+
+def transcribe_media(path, language='en-US', recognizer='google', max_workers=4,
+                     sample_rate=MEDIA_SAMPLE_RATE, **vad_options):
+    """Stream-transcribe the soundtrack of a video (or any media file).
+
+    Audio is decoded window by window and fed straight into chunking and
+    recognition, so the first text arrives after the first speech chunk
+    rather than after the whole soundtrack has been extracted.
+
+    Args:
+        path: Path to a video or audio file
+        language: Recognition language, e.g. 'en-US'
+        recognizer: Name from RECOGNIZERS or a callable (audio_data, language) -> text
+        max_workers: Maximum concurrent recognition calls
+        sample_rate: Rate to resample the soundtrack to, in Hz
+        **vad_options: Extra keyword arguments for split_on_silence
+
+    Yields:
+        (chunk_index, text) tuples, in order, as soon as each is ready
+    """
+    if metrics.enabled:
+        metrics.inc('bytes_in_total', os.path.getsize(path), kind='media')
+    chunks = split_on_silence(iter_media_audio(path, sample_rate), sample_rate, 2, **vad_options)
+    yield from transcribe_chunks(chunks, language, recognizer, max_workers)
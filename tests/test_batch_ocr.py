@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_ocr  # noqa: E402
+import ocr_backend  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    # Threads instead of worker processes, so the fake OCR below is what runs
+    monkeypatch.setattr(batch_ocr, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(ocr_backend, 'extract_text_from_image',
+                        lambda data, **kwargs: f"scanned text {data.decode()}")
+
+
+def test_text_format_with_index(tmp_path, fake_ocr):
+    scans = tmp_path / "scans"
+    scans.mkdir()
+    (scans / "a.png").write_bytes(b"alpha")
+    (scans / "b.png").write_bytes(b"beta")
+    out = tmp_path / "out"
+
+    with SearchIndex(str(tmp_path / "index.db")) as index:
+        progress = batch_ocr.run([str(scans)], str(out), fmt='text', workers=2, index=index)
+        hits = index.search('"scanned text beta"')
+
+    assert progress.files == 2 and progress.errors == 0
+    assert [hit['name'] for hit in hits] == [str(scans / "b.png")]
+    with open(out / batch_ocr.MANIFEST_NAME, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert all("pages" not in record for record in records)
+    outputs = {record["source"]: record["output"] for record in records}
+    assert (out / outputs[str(scans / "b.png")]).read_text(encoding='utf-8') == "\n--- Page 1 ---\nscanned text beta"
+
+
+def test_write_leaves_record_alone(tmp_path):
+    writer = batch_ocr.ResultWriter(str(tmp_path / "out"), 'text')
+    record = {"source": "a.png", "pages": ["text"]}
+    writer.write(record)
+    writer.close()
+    assert record == {"source": "a.png", "pages": ["text"]}
+
+
+def test_unreadable_file_is_an_error_record(tmp_path):
+    record = batch_ocr.process_input(str(tmp_path / "gone.png"), 'image', str(tmp_path / "gone.png"), None, 'eng')
+    assert record["error"].startswith("FileNotFoundError")
+    assert record["page_count"] == 0
+
+
+def test_corrupt_archive_does_not_stop_the_run(tmp_path, fake_ocr):
+    scans = tmp_path / "scans"
+    scans.mkdir()
+    with zipfile.ZipFile(scans / "a.zip", 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("first.png", b"first")
+        archive.writestr("second.png", b"second" * 1000)
+    # Damage the second member's compressed data, after the first member was read
+    data = bytearray((scans / "a.zip").read_bytes())
+    start = data.index(b"second.png") + len("second.png")
+    data[start:start + 20] = bytes(20)
+    (scans / "a.zip").write_bytes(bytes(data))
+    (scans / "b.png").write_bytes(b"beta")
+    out = tmp_path / "out.jsonl"
+
+    progress = batch_ocr.run([str(scans), str(tmp_path / "missing.png")], str(out), workers=2)
+
+    with open(out, encoding='utf-8') as f:
+        records = {record["source"]: record for record in (json.loads(line) for line in f)}
+    assert progress.files == 4 and progress.errors == 2
+    assert records[str(scans / "a.zip") + "!first.png"]["pages"] == ["scanned text first"]
+    assert "error" in records[str(scans / "a.zip")]
+    assert records[str(scans / "b.png")]["pages"] == ["scanned text beta"]
+    assert records[str(tmp_path / "missing.png")]["error"].startswith("FileNotFoundError")
@@ -0,0 +1,49 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import speech  # noqa: E402
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=3000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return amplitude * np.sin(2 * np.pi * 440 * t)
+
+
+def quiet(seconds, rng):
+    return rng.normal(0, 20, int(seconds * RATE))
+
+
+def chunk_seconds(samples, sample_width=2):
+    if sample_width == 1:
+        data = (samples / 256 + 128).astype(np.uint8).tobytes()
+    else:
+        data = samples.astype('<i2').tobytes()
+    chunks = speech.split_on_silence([data], RATE, sample_width)
+    return [len(chunk.frame_data) / (RATE * sample_width) for chunk in chunks]
+
+
+def test_audio_that_starts_with_speech():
+    rng = np.random.default_rng(0)
+    bursts = np.concatenate([np.concatenate([tone(1), quiet(0.3, rng)]) for _ in range(40)])
+
+    assert chunk_seconds(tone(12)) == [12.0]
+    # 52 s with gaps too short to cut at: split at the 30 s limit, with or without a silent lead-in
+    assert len(chunk_seconds(bursts)) == 2
+    assert len(chunk_seconds(np.concatenate([quiet(0.3, rng), bursts]))) == 2
+
+
+def test_long_pauses_end_chunks():
+    rng = np.random.default_rng(1)
+    speech_and_pauses = np.concatenate([np.concatenate([tone(6), quiet(1, rng)]) for _ in range(5)])
+    assert len(chunk_seconds(speech_and_pauses)) == 5
+
+
+def test_8bit_audio_is_on_the_16bit_scale():
+    assert speech.frame_energy(bytes([128 + 100, 128 - 100]), 1) == 100 * 256
+    assert chunk_seconds(tone(6), sample_width=1) == [6.0]
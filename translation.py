@@ -0,0 +1,216 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+
+# Google Translate rejects requests over 5000 characters; leave some headroom
+MAX_CHUNK_CHARS = 4500
+
+_PARAGRAPH_BREAK = re.compile(r'(\n\s*\n)')
+_SENTENCE_END = re.compile(r'(?<=[.!?।。！？])(\s+)')
+
+
+class GoogleBackend:
+    """Translate through Google Translate via deep_translator."""
+
+    def __init__(self, source='auto'):
+        self.source = source
+
+    def __call__(self, text, target):
+        from deep_translator import GoogleTranslator
+        return GoogleTranslator(source=self.source, target=target).translate(text)
+
+
+class StubBackend:
+    """Offline stand-in translator for tests and benchmarks.
+
+    Args:
+        delay: Seconds to sleep per call, to mimic a network round-trip
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, text, target):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return f"[{target}] {text}"
+
+
+def split_text(text, max_chars=MAX_CHUNK_CHARS):
+    """Split text into chunks of at most max_chars characters.
+
+    Chunks break on paragraph boundaries where possible, then on sentence
+    boundaries, then on whitespace. Joining the chunks gives back the
+    original text exactly.
+
+    Args:
+        text: Text to split
+        max_chars: Upper bound on chunk length (default: MAX_CHUNK_CHARS)
+    """
+    chunks = []
+    current = ""
+    for piece in _split_pieces(text, max_chars):
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_pieces(text, max_chars):
+    # Paragraphs (with their trailing break), then sentences, then words
+    for paragraph in _join_separators(_PARAGRAPH_BREAK.split(text)):
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        for sentence in _join_separators(_SENTENCE_END.split(paragraph)):
+            if len(sentence) <= max_chars:
+                yield sentence
+                continue
+            yield from _split_hard(sentence, max_chars)
+
+
+def _join_separators(parts):
+    # re.split with a capture group alternates content and separator
+    for i in range(0, len(parts), 2):
+        piece = parts[i] + (parts[i + 1] if i + 1 < len(parts) else "")
+        if piece:
+            yield piece
+
+
+def _split_hard(text, max_chars):
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        else:
+            cut += 1
+        yield text[:cut]
+        text = text[cut:]
+    if text:
+        yield text
+
+
+class TranslationEngine:
+    """Translate long text in provider-sized chunks on a bounded thread pool.
+
+    Each translated chunk is cached by (chunk hash, target language), so
+    re-translating a document, or translating it after a rerun, only pays
+    for chunks that have not been seen before.
+
+    Args:
+        backend: Callable (text, target) -> translated text (default: GoogleBackend)
+        max_workers: Maximum concurrent provider requests
+        max_chunk_chars: Upper bound on characters per provider request
+        cache_entries: Maximum number of cached chunk translations
+    """
+
+    def __init__(self, backend=None, max_workers=4, max_chunk_chars=MAX_CHUNK_CHARS, cache_entries=2048):
+        self.backend = backend or GoogleBackend()
+        self.max_workers = max_workers
+        self.max_chunk_chars = max_chunk_chars
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.hits = 0
+        self.misses = 0
+
+    def translate(self, text, target):
+        """Translate text into the target language code."""
+        if not text.strip():
+            return text
+
+        chunks = split_text(text, self.max_chunk_chars)
+        results = [None] * len(chunks)
+        todo = {}
+        for i, chunk in enumerate(chunks):
+            core = chunk.strip()
+            if not core:
+                results[i] = chunk
+                continue
+            key = (hashlib.sha256(core.encode('utf-8')).hexdigest(), target)
+            cached = self._get(key)
+            if cached is not None:
+                results[i] = _reattach(chunk, cached)
+            else:
+                todo.setdefault(key, (core, []))[1].append(i)
+
+        if todo:
+            futures = {
+                key: self._pool().submit(self._request, core, target)
+                for key, (core, _) in todo.items()
+            }
+            for key, future in futures.items():
+                translated = future.result() or ""
+                self._put(key, translated)
+                for i in todo[key][1]:
+                    results[i] = _reattach(chunks[i], translated)
+
+        translated = "".join(results)
+        metrics.inc('chars_out_total', len(translated), stage='translate')
+        return translated
+
+    def stats(self):
+        """Return chunk cache hit/miss counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
+
+    def _request(self, text, target):
+        with metrics.timer('translate_request'):
+            return self.backend(text, target)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="translate")
+            return self._executor
+
+    def _get(self, key):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _put(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+
+def _reattach(chunk, translated):
+    # Providers drop surrounding whitespace; put the original back
+    core = chunk.strip()
+    start = chunk.index(core)
+    return chunk[:start] + translated + chunk[start + len(core):]
+
+
+default_engine = TranslationEngine()
+
+
+def translate_text(text, target, engine=None):
+    """Translate text with the shared engine (or the one given).
+
+    Args:
+        text: Text to translate
+        target: Target language code, e.g. 'fr'
+        engine: TranslationEngine to use (default: default_engine)
+    """
+    return (engine or default_engine).translate(text, target)
@@ -0,0 +1,125 @@
+"""Spool uploads to temporary files so backends read from disk, not memory.
+
+    with SpooledUpload(uploaded_file, suffix='.mp4') as upload:
+        transcribe_media(upload.path)
+
+The copy is written in fixed-size chunks, so spooling holds at most one
+chunk beyond the source itself. Backends then get a path, a file handle
+or a read-only memory map instead of another in-memory copy.
+
+The temporary file is removed when the with block exits or close() is
+called, including when spooling fails part way. Files that are never
+closed are removed when the object is garbage collected, or at the
+latest when the interpreter exits.
+"""
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+import weakref
+from contextlib import contextmanager
+
+CHUNK_SIZE = 1024 * 1024
+
+# Where spooled uploads go (default: the system temp directory)
+SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR') or None
+
+
+class SpooledUpload:
+    """A temporary on-disk copy of an upload.
+
+    Args:
+        source: bytes-like object, file object (including Streamlit's
+            UploadedFile and Starlette's UploadFile.file) or file path
+        suffix: File name suffix, e.g. '.mp4'; some backends pick a
+            decoder by extension
+        chunk_size: Bytes copied at a time
+        dir: Directory for the temporary file (default: UPLOAD_SPOOL_DIR)
+
+    Attributes:
+        path: Path of the temporary file
+        size: Size in bytes
+        sha256: Hex digest of the content, computed while copying
+    """
+
+    def __init__(self, source, suffix='', chunk_size=CHUNK_SIZE, dir=SPOOL_DIR):
+        fd, self.path = tempfile.mkstemp(suffix=suffix, prefix='upload-', dir=dir)
+        # Registered before the copy, so a failed copy is removed as well
+        self._finalizer = weakref.finalize(self, _remove, self.path)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in _chunks(source, chunk_size):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        except BaseException:
+            self.close()
+            raise
+        self.size = size
+        self.sha256 = digest.hexdigest()
+
+    @property
+    def closed(self):
+        return not self._finalizer.alive
+
+    def open(self):
+        """Open the spooled file for binary reading; the caller closes it."""
+        return open(self.path, 'rb')
+
+    @contextmanager
+    def map(self):
+        """Memory-map the spooled file read-only for the duration of the block."""
+        if not self.size:
+            # mmap refuses empty files
+            yield memoryview(b'')
+            return
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+    def close(self):
+        """Remove the temporary file. Safe to call more than once."""
+        self._finalizer()
+
+    def __fspath__(self):
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __repr__(self):
+        state = 'closed' if self.closed else f'{self.size} bytes'
+        return f"<SpooledUpload {self.path} ({state})>"
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _chunks(source, chunk_size):
+    """Yield the content of source in chunks of at most chunk_size bytes."""
+    if isinstance(source, io.BytesIO):
+        # getvalue() shares the buffer; getbuffer() and read() would copy it.
+        # Slicing also leaves the read position alone for other readers.
+        source = source.getvalue()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        with memoryview(source) as view:
+            for start in range(0, view.nbytes, chunk_size):
+                yield view[start:start + chunk_size]
+        return
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+        return
+    if getattr(source, 'seekable', lambda: hasattr(source, 'seek'))():
+        source.seek(0)
+    yield from iter(lambda: source.read(chunk_size), b'')